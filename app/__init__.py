@@ -1,4 +1,4 @@
-from flask import Flask
+from flask import Flask, request
 import logging
 import os
 
@@ -6,10 +6,36 @@ def create_app():
     app = Flask(__name__)
     app.logger.setLevel(logging.DEBUG)
     
-    from app.routes import questions, answers, collectives
+    from app.routes import questions, answers, collectives, metrics
     app.register_blueprint(questions.bp)
     app.register_blueprint(answers.bp)
     app.register_blueprint(collectives.bp)
+    app.register_blueprint(metrics.bp)
+
+    from app.scrapers.prefetch import foreground, start_prefetch_scheduler
+    from app.utils.metrics import start_request_cost, request_cost, observe_api_request
+    from app.utils.deadline import start_request_deadline
+
+    @app.before_request
+    def enter_foreground():
+        foreground.enter()
+        start_request_cost()
+        start_request_deadline(request.args.get('timeout', type=float))
+
+    @app.after_request
+    def report_upstream_cost(response):
+        cost = request_cost.get()
+        if cost is not None:
+            # Streamed responses only report what was spent before the first item
+            response.headers[metrics.UPSTREAM_COST_HEADER] = cost.header()
+            observe_api_request(request.endpoint or 'unknown', response.status_code, cost)
+        return response
+
+    @app.teardown_request
+    def leave_foreground(error):
+        foreground.leave()
+
+    start_prefetch_scheduler()
     
     @app.route('/')
     def home():
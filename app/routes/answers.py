@@ -1,19 +1,39 @@
-from flask import Blueprint, jsonify, request
-from bs4 import BeautifulSoup
+from itertools import chain
+from flask import Blueprint, request
 import logging
 
-from app.utils import make_request_with_retries, parse_date
-from app.scrapers import scrape_answer_by_id, scrape_answers_from_question_soup
+from app.utils import parse_date, gather_until_deadline, run_on_engine, iterate_on_engine
+from app.scrapers import async_scrape_answer_by_id, async_scrape_answers_by_question_id, async_resolve_last_activity_dates
+from app.scrapers.answers import ANSWER_FIELDS, MINIMAL_ANSWER_FIELDS
+from app.scrapers.entity_store import lookup_answers, lookup_question_answers
+from app.scrapers.prefetch import question_log
+from app.routes.responses import (
+    wants_stream, json_response, ndjson_response, cached_response, finish_response, continuation_ids, with_continuation
+)
+from app.utils.fields import parse_field_filter, project_fields, wants_field
 
 logger = logging.getLogger(__name__)
 
 bp = Blueprint('answers', __name__)
+bp.after_request(finish_response)
+
+
+def _include_last_activity():
+    """Whether the caller asked for timeline-accurate last_activity_date values."""
+    include = request.args.get('include', '')
+    return 'last_activity' in include.split(',')
+
+
+def _field_filter():
+    """The fields selected by `filter`, or None for every field."""
+    return parse_field_filter(request.args.get('filter'), ANSWER_FIELDS, MINIMAL_ANSWER_FIELDS)
 
 
 @bp.route('/answers/<string:ids>', methods=['GET'])
-def get_answers_by_ids(ids):
+@cached_response
+async def get_answers_by_ids(ids):
     """Retrieve a list of Answer objects identified by ids."""
-    answer_ids = ids.split(',')
+    answer_ids = continuation_ids(ids.split(','))
     answers = []
 
     sort = request.args.get('sort', 'activity')
@@ -27,8 +47,18 @@ def get_answers_by_ids(ids):
     from_timestamp = parse_date(from_date) if from_date else None
     to_timestamp = parse_date(to_date) if to_date else None
 
+    fields = _field_filter()
+    stored = lookup_answers(answer_ids)
+    missing = [answer_id for answer_id in answer_ids if answer_id not in stored]
+    scraped, unfinished = await run_on_engine(gather_until_deadline([async_scrape_answer_by_id(answer_id, fields=fields) for answer_id in missing]))
+    unfinished_ids = [missing[index] for index in unfinished]
+    scraped_answers = dict(zip(missing, scraped))
+    scraped_answers.update(stored)
+    if _include_last_activity() and wants_field(fields, 'last_activity_date'):
+        await run_on_engine(async_resolve_last_activity_dates([answer_data for answer_data in scraped_answers.values() if answer_data]))
+
     for answer_id in answer_ids:
-        answer_data = scrape_answer_by_id(answer_id)
+        answer_data = scraped_answers.get(answer_id)
         if answer_data:
             if (min_timestamp and answer_data['last_activity_date'] < min_timestamp) or \
                (max_timestamp and answer_data['last_activity_date'] > max_timestamp) or \
@@ -36,7 +66,7 @@ def get_answers_by_ids(ids):
                (to_timestamp and answer_data['creation_date'] > to_timestamp):
                 continue
             answers.append(answer_data)
-        else:
+        elif answer_id not in unfinished_ids:
             logger.error(f"Failed to retrieve answer with ID: {answer_id}")
 
     if sort == 'activity':
@@ -49,13 +79,14 @@ def get_answers_by_ids(ids):
         logger.warning(f"Unknown sort parameter: {sort}. Defaulting to sort by activity.")
         answers.sort(key=lambda x: x['last_activity_date'], reverse=True)
 
-    return jsonify({"items": answers})
+    return json_response(with_continuation({"items": [project_fields(answer_data, fields) for answer_data in answers]}, unfinished_ids))
 
 
 @bp.route('/questions/<string:ids>/answers', methods=['GET'])
-def get_answers_by_question_ids(ids):
+@cached_response
+async def get_answers_by_question_ids(ids):
     """Retrieve a list of Answer objects for given question ids."""
-    question_ids = ids.split(',')
+    question_ids = continuation_ids(ids.split(','))
     all_answers = []
 
     sort = request.args.get('sort', 'activity')
@@ -68,38 +99,52 @@ def get_answers_by_question_ids(ids):
     logger.debug(f"Received request to retrieve answers for question IDs: {question_ids}")
     logger.debug(f"Sorting by: {sort}, Order: {order}, Min: {min_value}, Max: {max_value}, From: {fromdate}, To: {todate}")
 
+    min_value = int(min_value) if min_value else None
+    max_value = int(max_value) if max_value else None
+    fromdate = int(fromdate) if fromdate else None
+    todate = int(todate) if todate else None
+
+    # min/max apply to the field being sorted on
+    if sort == 'votes':
+        key = 'score'
+    elif sort in ['activity', 'creation']:
+        key = 'last_activity_date' if sort == 'activity' else 'creation_date'
+    else:
+        key = None
+
+    def matches(a):
+        if key and min_value is not None and a[key] < min_value:
+            return False
+        if key and max_value is not None and a[key] > max_value:
+            return False
+        if fromdate is not None and a['creation_date'] < fromdate:
+            return False
+        if todate is not None and a['creation_date'] > todate:
+            return False
+        return True
+
+    include_last_activity = _include_last_activity()
+    fields = _field_filter()
     for question_id in question_ids:
-        logger.debug(f"Processing question ID: {question_id}")
-        question_url = f"https://stackoverflow.com/questions/{question_id}"
-        response = make_request_with_retries(question_url)
-
-        if response is None or response.status_code != 200:
-            logger.error(f"Failed to retrieve question with ID: {question_id}")
-            continue
-
-        logger.debug(f"Successfully retrieved question page for ID: {question_id}")
-        soup = BeautifulSoup(response.text, 'html.parser')
-        answers = scrape_answers_from_question_soup(soup, question_id)
-        logger.debug(f"Found {len(answers)} answers for question ID: {question_id}")
-        all_answers.extend(answers)
-
-    # Filter answers based on min/max values
-    if min_value or max_value:
-        min_value = int(min_value) if min_value else None
-        max_value = int(max_value) if max_value else None
-
-        if sort == 'votes':
-            all_answers = [a for a in all_answers if (min_value is None or a['score'] >= min_value) and (max_value is None or a['score'] <= max_value)]
-        elif sort in ['activity', 'creation']:
-            key = 'last_activity_date' if sort == 'activity' else 'creation_date'
-            all_answers = [a for a in all_answers if (min_value is None or a[key] >= min_value) and (max_value is None or a[key] <= max_value)]
-
-    if fromdate:
-        fromdate = int(fromdate)
-        all_answers = [a for a in all_answers if a['creation_date'] >= fromdate]
-    if todate:
-        todate = int(todate)
-        all_answers = [a for a in all_answers if a['creation_date'] <= todate]
+        question_log.record(question_id)
+    stored = lookup_question_answers(question_ids)
+    if include_last_activity and stored:
+        await run_on_engine(async_resolve_last_activity_dates([a for answers in stored.values() for a in answers]))
+    missing = [question_id for question_id in question_ids if question_id not in stored]
+    coroutines = [async_scrape_answers_by_question_id(question_id, include_last_activity, fields) for question_id in missing]
+
+    if wants_stream():
+        return ndjson_response(
+            project_fields(a, fields) for answers in chain(stored.values(), iterate_on_engine(coroutines)) if answers
+            for a in answers if matches(a)
+        )
+
+    results, unfinished = await run_on_engine(gather_until_deadline(coroutines))
+    unfinished_ids = [missing[index] for index in unfinished]
+    scraped = list(stored.values()) + results
+    for answers in scraped:
+        if answers:
+            all_answers.extend(a for a in answers if matches(a))
 
     if sort == 'activity':
         all_answers.sort(key=lambda x: x['last_activity_date'], reverse=(order == 'desc'))
@@ -109,4 +154,4 @@ def get_answers_by_question_ids(ids):
         all_answers.sort(key=lambda x: x['score'], reverse=(order == 'desc'))
 
     logger.debug(f"Total answers after filtering and sorting: {len(all_answers)}")
-    return jsonify({"items": all_answers})
+    return json_response(with_continuation({"items": [project_fields(a, fields) for a in all_answers]}, unfinished_ids))
@@ -1,17 +1,25 @@
 from flask import Blueprint, jsonify, request
 import logging
 
-from app.scrapers import scrape_collectives
+from app.utils import gather_until_deadline, run_on_engine
+from app.scrapers import async_cached_collectives
+from app.routes.responses import cached_response, finish_response
 
 logger = logging.getLogger(__name__)
 
 bp = Blueprint('collectives', __name__)
+bp.after_request(finish_response)
 
 
 @bp.route('/collectives', methods=['GET'])
-def get_collectives():
-    collectives = scrape_collectives()
-    
+@cached_response
+async def get_collectives():
+    # The crawl may be shared with other requests, so the deadline only bounds the wait for it
+    (collectives,), unfinished = await run_on_engine(gather_until_deadline([async_cached_collectives()]))
+
+    if unfinished:
+        logger.error("Request deadline expired before the collectives were retrieved.")
+        return jsonify({"error": "Request deadline expired"}), 504
     if collectives is None:
         return jsonify({"error": "Failed to retrieve collectives"}), 500
     
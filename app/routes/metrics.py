@@ -0,0 +1,16 @@
+from flask import Blueprint, Response
+
+from app.utils.metrics import registry, PROMETHEUS_MIMETYPE
+from app.routes.responses import finish_response
+
+bp = Blueprint('metrics', __name__)
+bp.after_request(finish_response)
+
+# Header carrying the upstream cost of each API response
+UPSTREAM_COST_HEADER = 'X-Upstream-Cost'
+
+
+@bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Expose upstream, parse, cache and API metrics in the Prometheus text format."""
+    return Response(registry.expose(), content_type=PROMETHEUS_MIMETYPE)
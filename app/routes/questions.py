@@ -1,107 +1,198 @@
+import os
 from datetime import datetime
+from itertools import chain
 from flask import Blueprint, jsonify, request
 import logging
 
-from app.utils import make_request_with_retries
-from app.scrapers import scrape_questions, scrape_question_by_id
+from app.utils import gather_until_deadline, run_on_engine, iterate_on_engine
+from app.scrapers import (
+    async_fetch_question_listing, async_enrich_question, async_scrape_question_by_id, async_scrape_question_with_answers,
+    async_resolve_last_activity_dates
+)
+from app.scrapers.entity_store import lookup_questions
+from app.scrapers.prefetch import listing_log, question_log
+from app.scrapers.questions import QUESTION_FIELDS, MINIMAL_QUESTION_FIELDS, SORT_TABS
+from app.utils.fields import parse_field_filter, require_fields, project_fields
+from app.routes.responses import (
+    wants_stream, json_response, ndjson_response, cached_response, finish_response, continuation_ids, with_continuation
+)
 
 logger = logging.getLogger(__name__)
 
 bp = Blueprint('questions', __name__)
+bp.after_request(finish_response)
 
+MAX_PAGE_SIZE = 100
+LISTING_SCAN_SIZE = int(os.environ.get("STACKOVERFLOW_LISTING_SCAN_SIZE", 100))
 
-@bp.route('/questions', methods=['GET'])
-def get_questions():
-    url = "https://stackoverflow.com/questions"
-    response = make_request_with_retries(url)
-
-    if not response:
-        logger.error("Failed to retrieve data after retries.")
-        return jsonify({"error": "Failed to retrieve data after retries"}), 429
+# Parameters the listing pages cannot filter by; see _needs_scan
+POST_FILTERS = ('min', 'max', 'fromdate', 'todate')
 
-    logger.debug("Successfully retrieved data from StackOverflow.")
-    questions = scrape_questions(response.text)
-    logger.debug(f"Scraped {len(questions)} questions from StackOverflow.")
 
-    # Apply filtering by min and max
+def _summary_filter():
+    """Build the predicate for the min/max and tagged parameters, which listing summaries can answer."""
     min_value = request.args.get('min', type=int)
     max_value = request.args.get('max', type=int)
-    if min_value is not None:
-        logger.debug(f"Applying minimum score filter: {min_value}")
-        questions = [q for q in questions if q['score'] >= min_value]
-        logger.debug(f"Number of questions after min filter: {len(questions)}")
-    if max_value is not None:
-        logger.debug(f"Applying maximum score filter: {max_value}")
-        questions = [q for q in questions if q['score'] <= max_value]
-        logger.debug(f"Number of questions after max filter: {len(questions)}")
-
-    # Apply filtering by tags
     tagged = request.args.get('tagged')
-    if tagged:
-        tags = tagged.split(',')
-        logger.debug(f"Filtering by tags: {tags}")
-        questions = [q for q in questions if any(tag in q['tags'] for tag in tags)]
-        logger.debug(f"Number of questions after tag filter: {len(questions)}")
+    tags = tagged.split(',') if tagged else None
+    logger.debug(f"Filtering questions by score {min_value}..{max_value} and tags {tags}")
 
-    # Sorting by specified sort parameter
-    sort_by = request.args.get('sort', 'last_activity_date')
-    order = request.args.get('order', 'desc').lower()
+    def matches(q):
+        if min_value is not None and q['score'] < min_value:
+            return False
+        if max_value is not None and q['score'] > max_value:
+            return False
+        if tags and not any(tag in q['tags'] for tag in tags):
+            return False
+        return True
+
+    return matches
 
-    reverse_order = (order == 'desc')
-    if sort_by == 'creation_date':
-        logger.debug("Sorting questions by creation_date")
-        questions = sorted(questions, key=lambda x: x['creation_date'] if x['creation_date'] else 0, reverse=reverse_order)
-    elif sort_by == 'last_activity_date':
-        logger.debug("Sorting questions by last_activity_date")
-        questions = sorted(questions, key=lambda x: x['last_activity_date'] if x['last_activity_date'] else 0, reverse=reverse_order)
-    else:
-        logger.warning(f"Unknown sort parameter: {sort_by}")
 
-    # Filtering by fromdate and todate
+def _question_filter():
+    """Build the predicate for the fromdate/todate and filter parameters, which need enriched questions."""
     fromdate = request.args.get('fromdate', type=int)
     todate = request.args.get('todate', type=int)
-    if fromdate is not None:
-        questions = [q for q in questions if q['creation_date'] >= fromdate]
-    if todate is not None:
-        questions = [q for q in questions if q['creation_date'] <= todate]
-    
-    logger.debug(f"Number of questions after date filtering: {len(questions)}")
-
-    # Apply built-in filters
     filter_type = request.args.get('filter', 'default')
-    if filter_type == 'default':
-        pass
-    elif filter_type == 'withbody':
-        questions = [q for q in questions if q['body']]
-        logger.debug(f"Number of questions after body filter: {len(questions)}")
-    elif filter_type == 'total':
-        questions = [{'total': len(questions)}]
-    elif filter_type == 'all':
-        pass
-    else:
+    if filter_type not in ('default', 'withbody', 'total', 'all') and _field_filter() is None:
         logger.warning(f"Unknown filter type: {filter_type}")
 
-    # Implement paging
-    page = request.args.get('page', 1, type=int)
-    page_size = request.args.get('pagesize', 30, type=int)
+    logger.debug(f"Filtering questions by creation date {fromdate}..{todate} and filter {filter_type}")
+
+    def matches(q):
+        if fromdate is not None and q['creation_date'] < fromdate:
+            return False
+        if todate is not None and q['creation_date'] > todate:
+            return False
+        if filter_type == 'withbody' and not q['body']:
+            return False
+        return True
+
+    return matches
+
+
+def _needs_scan(filter_type, order):
+    """
+    Whether the request filters or orders questions in a way the listing pages cannot.
+    Such requests collect their matches from the first LISTING_SCAN_SIZE questions of the
+    listing, then order and page those.
+    """
+    if any(request.args.get(name, type=int) is not None for name in POST_FILTERS):
+        return True
+    return filter_type == 'withbody' or order == 'asc'
+
+
+def _needs_details(filter_type):
+    """Whether matching questions needs their creation date or body, so every candidate has to be enriched."""
+    return filter_type == 'withbody' or any(request.args.get(name, type=int) is not None for name in ('fromdate', 'todate'))
+
+
+def _field_filter():
+    """The fields selected by `filter`, or None for every field."""
+    return parse_field_filter(request.args.get('filter'), QUESTION_FIELDS, MINIMAL_QUESTION_FIELDS)
+
+
+@bp.route('/questions', methods=['GET'])
+@cached_response
+async def get_questions():
+    tagged = request.args.get('tagged')
+    tags = tagged.split(',') if tagged else None
+    listing_log.record(tagged or '')
+
+    # The listing is already ordered by the sort's tab, newest or most active first
+    sort_by = request.args.get('sort', 'last_activity_date')
+    order = request.args.get('order', 'desc').lower()
+    if sort_by not in SORT_TABS:
+        logger.warning(f"Unknown sort parameter: {sort_by}")
+
+    page = max(request.args.get('page', 1, type=int), 1)
+    page_size = min(max(request.args.get('pagesize', 30, type=int), 1), MAX_PAGE_SIZE)
     start = (page - 1) * page_size
     end = start + page_size
 
-    if start >= len(questions):
-        paged_questions = []
+    filter_type = request.args.get('filter', 'default')
+    scan = _needs_scan(filter_type, order)
+    if scan:
+        window = (0, LISTING_SCAN_SIZE)
+    elif filter_type == 'total':
+        # The count is on every listing page, so the smallest one will do
+        window = (0, 1)
     else:
-        paged_questions = questions[start:end]
+        window = (start, end)
+
+    # The listing fetch may be shared with other requests, so the deadline only bounds the wait for it
+    listing, listing_unfinished = await run_on_engine(gather_until_deadline([async_fetch_question_listing(tags, sort_by, *window)]))
+    if listing[0] is None:
+        if listing_unfinished:
+            logger.error("Request deadline expired before the listing was retrieved.")
+            return jsonify({"error": "Request deadline expired"}), 504
+        logger.error("Failed to retrieve data after retries.")
+        return jsonify({"error": "Failed to retrieve data after retries"}), 429
+
+    summaries, listed_total = listing[0]
+    logger.debug(f"Successfully retrieved {len(summaries)} questions from StackOverflow.")
+
+    summary_matches = _summary_filter()
+    summaries = [q for q in summaries if summary_matches(q)]
+    matches = _question_filter()
+    fields = _field_filter()
+    if request.args.get('fromdate') or request.args.get('todate'):
+        scrape_fields = require_fields(fields, 'creation_date')
+    else:
+        scrape_fields = fields
+
+    # question_id -> enriched question, and the questions the deadline left unfinished
+    enriched, unfinished_ids = {}, []
+    if scan:
+        if _needs_details(filter_type):
+            questions, unfinished = await run_on_engine(gather_until_deadline([async_enrich_question(q, scrape_fields) for q in summaries]))
+            unfinished_ids = [summaries[index]['question_id'] for index in unfinished]
+            enriched = {q['question_id']: q for q in questions if q}
+            summaries = [enriched[q['question_id']] for q in summaries if q['question_id'] in enriched and matches(enriched[q['question_id']])]
+        # The listing is ordered newest or most active first
+        if order == 'asc':
+            summaries.reverse()
+        total = len(summaries)
+        logger.debug(f"{total} of the first {LISTING_SCAN_SIZE} listed questions match.")
+        summaries = summaries[start:end]
+    else:
+        total = listed_total if listed_total is not None else start + len(summaries)
+
+    if filter_type == 'total':
+        return jsonify(with_continuation({"items": [{'total': total}], "page": page, "pagesize": page_size, "total": 1}, unfinished_ids))
+
+    wanted = set(continuation_ids([q['question_id'] for q in summaries]))
+    summaries = [q for q in summaries if q['question_id'] in wanted]
+    pending = [q for q in summaries if q['question_id'] not in enriched]
 
-    logger.debug(f"Returning page {page} with page size {page_size}, containing {len(paged_questions)} questions.")
+    if wants_stream():
+        # Streamed questions are written in the order their enrichment completes
+        logger.debug(f"Streaming {len(summaries)} questions.")
+        done = [enriched[q['question_id']] for q in summaries if q['question_id'] in enriched]
+        fetched = (q for q in iterate_on_engine(async_enrich_question(q, scrape_fields) for q in pending) if q and matches(q))
+        return ndjson_response(project_fields(q, fields) for q in chain(done, fetched))
 
-    return jsonify({"items": paged_questions, "page": page, "pagesize": page_size, "total": len(questions)})
+    # Only the questions on the requested page are enriched, unless filtering needed them all
+    questions, unfinished = await run_on_engine(gather_until_deadline([async_enrich_question(q, scrape_fields) for q in pending]))
+    unfinished_ids += [pending[index]['question_id'] for index in unfinished]
+    enriched.update((q['question_id'], q) for q in questions if q)
+    questions = [enriched[q['question_id']] for q in summaries if q['question_id'] in enriched]
+    questions = [q for q in questions if matches(q)]
+
+    logger.debug(f"Returning page {page} with page size {page_size}, containing {len(questions)} questions.")
+
+    return json_response(with_continuation(
+        {"items": [project_fields(q, fields) for q in questions], "page": page, "pagesize": page_size, "total": total},
+        unfinished_ids
+    ))
 
 
 @bp.route('/questions/<ids>', methods=['GET'])
-def get_questions_by_id(ids):
-    question_ids = ids.split(',')
+@cached_response
+async def get_questions_by_id(ids):
+    question_ids = continuation_ids(ids.split(','))
     questions = []
-    
+
     sort_by = request.args.get('sort', 'activity')
     min_value = request.args.get('min')
     max_value = request.args.get('max')
@@ -113,24 +204,55 @@ def get_questions_by_id(ids):
     if to_date:
         to_date = datetime.strptime(to_date, '%Y-%m-%d')
 
+    def matches(question):
+        if min_value and question.get(sort_by, None) < int(min_value):
+            return False
+        if max_value and question.get(sort_by, None) > int(max_value):
+            return False
+        if from_date and datetime.strptime(question.get('creation_date'), '%Y-%m-%dT%H:%M:%S') < from_date:
+            return False
+        if to_date and datetime.strptime(question.get('creation_date'), '%Y-%m-%dT%H:%M:%S') > to_date:
+            return False
+        return True
+
+    include = request.args.get('include', '').split(',')
+    fields = _field_filter()
+
     for question_id in question_ids:
-        logger.debug(f"Fetching data for question ID {question_id}")
-        question = scrape_question_by_id(question_id)
-        
+        question_log.record(question_id)
+
+    # Questions with a recent copy in the entity store are served from it
+    stored = lookup_questions(question_ids, with_answers='answers' in include)
+    missing = [question_id for question_id in question_ids if question_id not in stored]
+
+    logger.debug(f"Fetching data for question IDs {missing}, {len(stored)} served from the store")
+    if 'answers' in include:
+        include_last_activity = 'last_activity' in include
+        coroutines = [async_scrape_question_with_answers(question_id, include_last_activity, fields) for question_id in missing]
+        if include_last_activity and stored:
+            await run_on_engine(async_resolve_last_activity_dates([a for question in stored.values() for a in question['answers']]))
+    else:
+        coroutines = [async_scrape_question_by_id(question_id, fields=fields) for question_id in missing]
+
+    if wants_stream():
+        return ndjson_response(
+            project_fields(question, fields) for question in chain(stored.values(), iterate_on_engine(coroutines))
+            if question and matches(question)
+        )
+
+    scraped, unfinished = await run_on_engine(gather_until_deadline(coroutines))
+    unfinished_ids = [missing[index] for index in unfinished]
+    scraped_questions = dict(zip(missing, scraped))
+    scraped_questions.update(stored)
+
+    for question_id in question_ids:
+        question = scraped_questions.get(question_id)
         if question:
-            if min_value and question.get(sort_by, None) < int(min_value):
-                continue
-            if max_value and question.get(sort_by, None) > int(max_value):
-                continue
-            if from_date and datetime.strptime(question.get('creation_date'), '%Y-%m-%dT%H:%M:%S') < from_date:
-                continue
-            if to_date and datetime.strptime(question.get('creation_date'), '%Y-%m-%dT%H:%M:%S') > to_date:
-                continue
-            
-            questions.append(question)
-        else:
+            if matches(question):
+                questions.append(question)
+        elif question_id not in unfinished_ids:
             logger.warning(f"No questions found for question ID {question_id}")
-    
+
     questions.sort(key=lambda x: x.get(sort_by, None), reverse=(sort_by != 'creation'))
 
-    return jsonify({"items": questions})
+    return json_response(with_continuation({"items": [project_fields(question, fields) for question in questions]}, unfinished_ids))
@@ -0,0 +1,203 @@
+import os
+import json
+import zlib
+import base64
+import hashlib
+import logging
+import functools
+from flask import Response, current_app, request, abort
+from werkzeug.http import remove_entity_headers
+
+from app.utils import encode_json
+from app.utils.cache import TTLCache
+from app.utils.deadline import request_cut_short
+from app.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+RESPONSE_CACHE_SIZE = int(os.environ.get("STACKOVERFLOW_RESPONSE_CACHE_SIZE", 256))
+RESPONSE_CACHE_TTL = int(os.environ.get("STACKOVERFLOW_RESPONSE_CACHE_TTL", 60))
+
+# Bodies smaller than this are sent uncompressed.
+GZIP_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+# zlib window bits that produce a gzip container with a zero mtime, so equal bodies compress to equal bytes
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+# (path, normalized query) -> EncodedBody
+response_cache = TTLCache(maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL)
+registry.register_cache('response', response_cache.stats)
+
+
+def wants_stream():
+    """Whether the caller asked for newline-delimited JSON, via `?stream=1` or the Accept header."""
+    if request.args.get('stream') in ('1', 'true'):
+        return True
+    return request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+
+def accepts_gzip():
+    return request.accept_encodings['gzip'] > 0
+
+
+def gzip_bytes(data):
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, GZIP_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+class EncodedBody:
+    """A response body encoded once, with its strong ETag and, from the first gzip request on, its gzip form."""
+
+    def __init__(self, data, mimetype):
+        self.data = data
+        self.mimetype = mimetype
+        self.etag = hashlib.sha256(data).hexdigest()[:32]
+        self._gzipped = None
+
+    def gzipped(self):
+        if self._gzipped is None:
+            self._gzipped = gzip_bytes(self.data)
+        return self._gzipped
+
+    def respond(self, response=None):
+        """
+        Fill in `response`, or a new response, for the current request: a 304 when the
+        client's If-None-Match holds the ETag of the representation it would get, gzip when
+        the client accepts it.
+        """
+        if response is None:
+            response = current_app.response_class(mimetype=self.mimetype)
+        use_gzip = accepts_gzip() and len(self.data) >= GZIP_MIN_SIZE
+        # Each content coding is its own representation and gets its own strong ETag
+        etag = f"{self.etag}-gzip" if use_gzip else self.etag
+
+        if request.if_none_match.contains_weak(etag):
+            response.status_code = 304
+            response.set_data(b'')
+            remove_entity_headers(response.headers)
+        elif use_gzip:
+            response.set_data(self.gzipped())
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response.set_data(self.data)
+        response.set_etag(etag)
+        response.vary.add('Accept-Encoding')
+        return response
+
+
+# Parameters that do not change a complete response
+UNCACHED_PARAMS = ('timeout',)
+
+
+def _query_key():
+    """The request path and its query with parameters sorted, and empty parameters and `timeout` dropped."""
+    args = sorted(
+        (key, value) for key, value in request.args.items(multi=True) if value != '' and key not in UNCACHED_PARAMS
+    )
+    return request.path, tuple(args)
+
+
+def cached_response(view):
+    """
+    Serve repeated requests for the same normalized query from a cache of encoded response
+    bodies, for RESPONSE_CACHE_TTL seconds. Only complete 200 responses are cached:
+    streamed responses and those cut short by the request deadline bypass the cache.
+    """
+    @functools.wraps(view)
+    async def wrapper(*args, **kwargs):
+        if not RESPONSE_CACHE_TTL or wants_stream():
+            return await view(*args, **kwargs)
+
+        key = _query_key()
+        body = response_cache.get(key)
+        if body is not None:
+            logger.debug(f"Serving {request.full_path} from the response cache")
+            return body.respond()
+
+        response = current_app.make_response(await view(*args, **kwargs))
+        if response.status_code != 200 or response.is_streamed or request_cut_short():
+            return response
+        body = EncodedBody(response.get_data(), response.mimetype)
+        response_cache.set(key, body)
+        return body.respond(response)
+
+    return wrapper
+
+
+def finish_response(response):
+    """
+    After-request hook of the route blueprints: add a strong ETag, answer If-None-Match
+    with a 304 and gzip the body when the client accepts it. Cached responses arrive
+    with their ETag already set and are left alone.
+    """
+    if response.status_code != 200 or response.is_streamed or response.direct_passthrough:
+        return response
+    if response.get_etag()[0] is not None:
+        return response
+    return EncodedBody(response.get_data(), response.mimetype).respond(response)
+
+
+def json_response(payload, status=200):
+    """Serialize `payload` the way jsonify does, reusing the cached JSON of unchanged records."""
+    return current_app.response_class(encode_json(payload) + "\n", status=status, mimetype=current_app.json.mimetype)
+
+
+def encode_continuation(ids):
+    data = json.dumps([str(item_id) for item_id in ids], separators=(',', ':')).encode('ascii')
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def continuation_ids(ids):
+    """
+    The IDs out of `ids` this request still has to produce: all of them, or with a
+    `continuation` token from an earlier response, only those the token names.
+    """
+    token = request.args.get('continuation')
+    if not token:
+        return ids
+    try:
+        remaining = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (ValueError, TypeError):
+        logger.warning(f"Malformed continuation token: {token}")
+        abort(400)
+    if not isinstance(remaining, list):
+        abort(400)
+    remaining = set(str(item_id) for item_id in remaining)
+    return [item_id for item_id in ids if str(item_id) in remaining]
+
+
+def with_continuation(payload, unfinished_ids):
+    """
+    Add `has_more` to a response payload and, when the deadline left items unfinished,
+    a `continuation` token that repeats the request for just those items.
+    """
+    payload['has_more'] = bool(unfinished_ids)
+    if unfinished_ids:
+        payload['continuation'] = encode_continuation(unfinished_ids)
+    return payload
+
+
+def ndjson_response(items):
+    """
+    Stream `items` as newline-delimited JSON, writing each one as soon as it is produced.
+    When the client accepts gzip, the stream is compressed and flushed after every item.
+    """
+    use_gzip = accepts_gzip()
+
+    def generate():
+        for item in items:
+            yield encode_json(item) + "\n"
+
+    def generate_gzip():
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, GZIP_WBITS)
+        for line in generate():
+            yield compressor.compress(line.encode('utf-8')) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+    response = Response(generate_gzip() if use_gzip else generate(), mimetype=NDJSON_MIMETYPE)
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
@@ -1,4 +1,11 @@
-from app.scrapers.questions import scrape_questions, scrape_question_by_id, scrape_question_details
-from app.scrapers.answers import scrape_answer_by_id, scrape_answers_from_question_soup
-from app.scrapers.collectives import scrape_collectives
-from app.scrapers.users import scrape_user_profile
+from app.scrapers.async_engine import (
+    scrape_questions, scrape_question_by_id, scrape_question_details, scrape_answer_by_id, scrape_answers_from_question_soup,
+    scrape_collectives, scrape_user_profile
+)
+from app.scrapers.question_page import QuestionPage
+from app.scrapers.records import Question, Answer, Owner
+from app.scrapers.async_engine import (
+    async_scrape_questions, async_fetch_question_listing, async_enrich_question, async_scrape_question_by_id, async_scrape_question_with_answers,
+    async_scrape_answer_by_id, async_scrape_answers_by_question_id, async_resolve_last_activity_dates,
+    async_scrape_collectives, async_cached_collectives, async_scrape_user_profile
+)
@@ -0,0 +1,363 @@
+"""
+Asyncio scraping engine. Fetches go through async_make_request_with_retries and fan out
+with gather_in_parallel; parsing is done by the parse functions of the scraper modules.
+Every coroutine here runs on the engine loop (see run_on_engine). Records returned with
+all their fields are pre-encoded as soon as they are finished, while other fetches of the
+request are still in flight. The blocking scrape_* functions at the end run the same
+coroutines on the engine for callers outside any event loop (see call_on_engine).
+"""
+import asyncio
+import logging
+from app.utils import async_make_request_with_retries, call_on_engine, gather_in_parallel, gather_until_deadline, pre_encode
+from app.utils.single_flight import AsyncSingleFlight
+from app.utils.metrics import without_request_cost
+from app.utils.deadline import without_request_deadline, deadline_expired
+from app.utils.fields import OWNER_ID_FIELDS, wants_field, wants_any, subfields
+from app.scrapers.users import parse_user_id, lookup_user_identity, parse_user_profile
+from app.scrapers.question_page import QuestionPage
+from app.scrapers.questions import (
+    DETAIL_FIELDS, SKIPPED, parse_question_summaries, parse_question_details, parse_question_page, merge_question_enrichment,
+    listing_window, parse_listing_window
+)
+from app.scrapers.answers import (
+    parse_answer_summary, parse_timeline_last_activity_date, apply_cached_timelines, remember_timelines
+)
+from app.scrapers.entity_store import store_questions, store_answers, refresh_from_store
+from app.scrapers.collectives import (
+    COLLECTIVES_CONCURRENCY, MAX_TAG_PAGES, collectives_cache, parse_collectives, parse_collective_tags_page,
+    parse_collective_external_links
+)
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = "https://stackoverflow.com"
+
+async_profile_flights = AsyncSingleFlight('user profile')
+async_page_flights = AsyncSingleFlight('question page')
+collectives_flights = AsyncSingleFlight('collectives crawl')
+
+# Background refresh tasks, referenced until they finish so they are not garbage collected.
+_background_tasks = set()
+
+
+async def async_scrape_user_profile(user_profile_link):
+    """Resolve (user_id, account_id) for a profile link."""
+    return await async_profile_flights.do(user_profile_link, lambda: _async_scrape_user_profile(user_profile_link))
+
+
+async def _async_scrape_user_profile(user_profile_link):
+    cached = lookup_user_identity(parse_user_id(user_profile_link))
+    if cached is not None:
+        return cached
+
+    response = await async_make_request_with_retries(user_profile_link)
+    if response is None or response.status_code != 200:
+        logger.debug(f"Failed to fetch user profile for link {user_profile_link}")
+        return None, None
+
+    return parse_user_profile(response.text, user_profile_link)
+
+
+async def _async_resolve_owner(record, fields=None):
+    owner = record['owner']
+    if owner['link'] and wants_any(fields, OWNER_ID_FIELDS):
+        owner['user_id'], owner['account_id'] = await async_scrape_user_profile(owner['link'])
+    return record
+
+
+async def async_fetch_page(url):
+    """Download and parse a question page, or return None if it cannot be retrieved."""
+    return await async_page_flights.do(url, lambda: _async_fetch_page(url))
+
+
+async def _async_fetch_page(url):
+    response = await async_make_request_with_retries(url)
+    if response is None or response.status_code != 200:
+        logger.error(f"Failed to fetch question page {url}")
+        return None
+    return QuestionPage(url, response.text)
+
+
+async def async_fetch_question_page(question_id):
+    return await async_fetch_page(f"{BASE_URL}/questions/{question_id}")
+
+
+async def async_fetch_timeline_last_activity_date(answer_id):
+    timeline_url = f"{BASE_URL}/posts/{answer_id}/timeline"
+    timeline_response = await async_make_request_with_retries(timeline_url)
+
+    if timeline_response is None or timeline_response.status_code != 200:
+        logger.debug(f"Failed to fetch timeline for answer ID {answer_id}")
+        return None
+
+    return parse_timeline_last_activity_date(timeline_response.text)
+
+
+async def async_resolve_last_activity_dates(answers):
+    """Resolve the timeline dates of `answers`; answers whose timeline misses the request deadline keep their own date."""
+    pending = apply_cached_timelines(answers)
+    timeline_dates, _ = await gather_until_deadline([async_fetch_timeline_last_activity_date(answer['answer_id']) for answer in pending])
+    remember_timelines(pending, timeline_dates)
+    return answers
+
+
+async def async_scrape_answer_summary(summary, question_id, fields=None):
+    try:
+        return await _async_resolve_owner(parse_answer_summary(summary, question_id), fields)
+    except Exception as e:
+        logger.error(f"Error processing answer for question ID {question_id}: {e}")
+        return None
+
+
+async def async_scrape_answers_from_page(page, question_id, include_last_activity=False, fields=None):
+    return await async_scrape_answer_summaries(page.answer_summaries(), question_id, include_last_activity, fields)
+
+
+async def async_scrape_answer_summaries(answer_summaries, question_id, include_last_activity=False, fields=None):
+    """Scrape the answer divs of a question page, resolving their owners concurrently."""
+    logger.debug(f"Found {len(answer_summaries)} answer summaries on the page.")
+
+    results = await gather_in_parallel([async_scrape_answer_summary(summary, question_id, fields) for summary in answer_summaries])
+    answers = [answer_data for answer_data in results if answer_data]
+
+    if include_last_activity and wants_field(fields, 'last_activity_date'):
+        await async_resolve_last_activity_dates(answers)
+
+    store_answers(answers, question_id, fields)
+    if fields is None:
+        pre_encode(answers)
+    logger.debug(f"Total answers scraped for question ID {question_id}: {len(answers)}")
+    return answers
+
+
+async def async_scrape_answers_by_question_id(question_id, include_last_activity=False, fields=None):
+    page = await async_fetch_question_page(question_id)
+    if page is None:
+        logger.error(f"Failed to retrieve question with ID: {question_id}")
+        return None
+    return await async_scrape_answers_from_page(page, question_id, include_last_activity, fields)
+
+
+async def async_scrape_answer_by_id(answer_id, include_last_activity=False, fields=None):
+    page = await async_fetch_page(f"{BASE_URL}/a/{answer_id}")
+    if page is None:
+        logger.error(f"Failed to fetch answer details for ID {answer_id}")
+        return None
+
+    summary = page.answer_summary(answer_id)
+    if summary is None:
+        logger.error(f"Answer ID {answer_id} not found on question page {page.url}")
+        return None
+
+    answer_data = await async_scrape_answer_summary(summary, page.question_id, fields)
+    if answer_data and include_last_activity and wants_field(fields, 'last_activity_date'):
+        await async_resolve_last_activity_dates([answer_data])
+    if answer_data:
+        store_answers([answer_data], fields=fields)
+        if fields is None:
+            pre_encode([answer_data])
+    return answer_data
+
+
+async def async_scrape_question_details(question_id):
+    page = await async_fetch_question_page(question_id)
+    if page is None:
+        logger.debug(f"Failed to fetch question details for ID {question_id}")
+        return None, None, None
+    return parse_question_details(question_id, page)
+
+
+async def _async_skip(value):
+    return value
+
+
+async def async_enrich_question(question, fields=None):
+    """
+    Resolve the owner and question page of one parsed listing summary, or return None.
+    Fetches for fields outside `fields` are skipped, and so is the whole question while
+    its stored copy is still current.
+    """
+    stored = refresh_from_store(question)
+    if stored is not None:
+        return stored
+
+    profile, details = await gather_in_parallel([
+        async_scrape_user_profile(question['owner']['link']) if wants_any(fields, OWNER_ID_FIELDS) else _async_skip(SKIPPED),
+        async_scrape_question_details(question['question_id']) if wants_any(fields, DETAIL_FIELDS) else _async_skip(SKIPPED)
+    ])
+    listed_activity = {question['question_id']: question.get('last_activity_date')}
+    enriched = merge_question_enrichment([question], [profile], [details])
+    store_questions(enriched, fields, listed_activity)
+    if fields is None:
+        pre_encode(enriched)
+    return enriched[0] if enriched else None
+
+
+async def async_fetch_question_listing(tags=None, sort=None, start=0, end=30):
+    """
+    Fetch the listing pages covering questions [start, end) concurrently and return their
+    summaries and the number of questions in the whole listing, or None.
+    """
+    urls, skip = listing_window(tags, sort, start, end)
+    responses = await gather_in_parallel([async_make_request_with_retries(url) for url in urls])
+    return parse_listing_window([response.text if response else None for response in responses], skip, end - start)
+
+
+async def async_scrape_questions(html_content, fields=None):
+    """Scrape a listing page, resolving every owner and question page concurrently."""
+    results = await gather_in_parallel([async_enrich_question(q, fields) for q in parse_question_summaries(html_content)])
+    return [question for question in results if question]
+
+
+async def async_scrape_question_by_id(question_id, page=None, fields=None):
+    page = page or await async_fetch_question_page(question_id)
+    if page is None:
+        logger.error(f"Failed to fetch question details for ID {question_id}")
+        return None
+    question = await _async_resolve_owner(parse_question_page(question_id, page), fields)
+    store_questions([question], fields)
+    if fields is None:
+        pre_encode([question])
+    return question
+
+
+async def async_scrape_question_with_answers(question_id, include_last_activity=False, fields=None):
+    page = await async_fetch_question_page(question_id)
+    if page is None:
+        logger.error(f"Failed to fetch question details for ID {question_id}")
+        return None
+
+    question, answers = await gather_in_parallel([
+        async_scrape_question_by_id(question_id, page, fields),
+        async_scrape_answers_from_page(page, question_id, include_last_activity, subfields(fields, 'answers'))
+    ])
+    if question is None:
+        return None
+    question['answers'] = answers or []
+    return question
+
+
+async def async_scrape_collective_tags(tags_url, semaphore):
+    """Scrape all tags of a collective, or return None if any page of them cannot be retrieved."""
+    tags = []
+
+    for page_number in range(1, MAX_TAG_PAGES + 1):
+        paginated_url = f"{tags_url}&page={page_number}"
+        async with semaphore:
+            response = await async_make_request_with_retries(paginated_url)
+
+        if response is None or response.status_code != 200:
+            logger.debug(f"Failed to retrieve tags from {paginated_url}")
+            return None
+
+        new_tags, has_next = parse_collective_tags_page(response.text)
+        tags.extend(new_tags)
+        if not new_tags or not has_next:
+            break
+
+    return tags
+
+
+async def async_scrape_collective_external_links(external_links_url, semaphore):
+    async with semaphore:
+        response = await async_make_request_with_retries(external_links_url)
+    if response is None or response.status_code != 200:
+        logger.debug(f"Failed to retrieve external links from {external_links_url}")
+        return None
+    return parse_collective_external_links(response.text)
+
+
+async def async_scrape_collectives():
+    """
+    Scrape collectives, crawling every collective's tags and links concurrently with at
+    most COLLECTIVES_CONCURRENCY page loads in flight. Returns None unless every page
+    could be retrieved, so a partial crawl is never cached.
+    """
+    collectives_url = f"{BASE_URL}/collectives-all"
+    response = await async_make_request_with_retries(collectives_url)
+
+    if response is None or response.status_code != 200:
+        logger.debug(f"Failed to retrieve data from {collectives_url}")
+        return None
+
+    collectives = parse_collectives(response.text)
+    semaphore = asyncio.Semaphore(COLLECTIVES_CONCURRENCY)
+    results = await gather_in_parallel(
+        [async_scrape_collective_tags(f"{BASE_URL}{c['link']}?tab=tags", semaphore) for c in collectives] +
+        [async_scrape_collective_external_links(f"{BASE_URL}{c['link']}", semaphore) for c in collectives]
+    )
+    if any(result is None for result in results):
+        logger.warning(f"Failed to retrieve the tags or external links of {results.count(None)} collectives")
+        return None
+    for collective, tags, external_links in zip(collectives, results[:len(collectives)], results[len(collectives):]):
+        collective['tags'] = tags
+        collective['external_links'] = external_links
+
+    return collectives
+
+
+async def async_cached_collectives():
+    """
+    Return the cached collectives dataset, crawling it on first use. Once the dataset is
+    stale it is still returned immediately while a background crawl refreshes it.
+    """
+    collectives, is_fresh = collectives_cache.get()
+    if collectives is None:
+        return await _async_refresh_collectives()
+
+    if not is_fresh:
+        logger.debug("Collectives are stale, refreshing them in the background.")
+        task = asyncio.ensure_future(without_request_deadline(without_request_cost(_async_refresh_collectives())))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+    return collectives
+
+
+async def _async_refresh_collectives():
+    return await collectives_flights.do('collectives', _async_crawl_collectives)
+
+
+async def _async_crawl_collectives():
+    collectives = await async_scrape_collectives()
+    # Fetches given up at a deadline leave the crawl incomplete, which must not be cached
+    if collectives is not None and not deadline_expired():
+        collectives_cache.set(collectives)
+    return collectives
+
+
+# Blocking entry points for callers outside any event loop, such as the prefetch scheduler.
+
+def scrape_user_profile(user_profile_link):
+    """Scrape a user's profile link for user_id and account_id."""
+    return call_on_engine(async_scrape_user_profile(user_profile_link))
+
+
+def scrape_questions(html_content, fields=None):
+    """Scrape questions from HTML content."""
+    return call_on_engine(async_scrape_questions(html_content, fields))
+
+
+def scrape_question_details(question_id):
+    """Scrape the creation date, last activity date and body of a question."""
+    return call_on_engine(async_scrape_question_details(question_id))
+
+
+def scrape_question_by_id(question_id, fields=None):
+    """Scrape a question by its ID."""
+    return call_on_engine(async_scrape_question_by_id(question_id, fields=fields))
+
+
+def scrape_answer_by_id(answer_id, include_last_activity=False, fields=None):
+    """Scrape an answer by its ID from the question page it links to."""
+    return call_on_engine(async_scrape_answer_by_id(answer_id, include_last_activity, fields))
+
+
+def scrape_answers_from_question_soup(soup, question_id, include_last_activity=False, fields=None):
+    """Scrape answers from a question's page soup."""
+    answer_summaries = soup.find_all('div', class_='answer')
+    return call_on_engine(async_scrape_answer_summaries(answer_summaries, question_id, include_last_activity, fields))
+
+
+def scrape_collectives():
+    """Scrape collectives from Stack Overflow, or return None unless every page could be retrieved."""
+    return call_on_engine(async_scrape_collectives())
@@ -1,22 +1,29 @@
+import os
 import logging
-import requests
-from bs4 import BeautifulSoup
+from app.utils import parse_html
+from app.utils.cache import DatasetCache
+from app.utils.metrics import registry, timed_parse
+from app.utils.shared_cache import shared_namespace
 
 logger = logging.getLogger(__name__)
 
 BASE_URL = "https://stackoverflow.com"
 
+COLLECTIVES_CONCURRENCY = int(os.environ.get("STACKOVERFLOW_COLLECTIVES_CONCURRENCY", 4))
+COLLECTIVES_TTL = int(os.environ.get("STACKOVERFLOW_COLLECTIVES_TTL", 3600))
 
-def scrape_collectives():
-    """Scrape collectives from Stack Overflow."""
-    collectives_url = f"{BASE_URL}/collectives-all"
-    response = requests.get(collectives_url)
-    
-    if response.status_code != 200:
-        logger.debug(f"Failed to retrieve data from {collectives_url}. Status code: {response.status_code}")
-        return None
-    
-    soup = BeautifulSoup(response.text, 'html.parser')
+# Upper bound on the tag pages crawled per collective, in case pagination never ends.
+MAX_TAG_PAGES = 100
+
+# The whole crawled dataset, served stale while a refresh runs. Workers share the latest crawl.
+collectives_cache = DatasetCache(ttl=COLLECTIVES_TTL, persistence=shared_namespace('collectives'), key='collectives')
+registry.register_cache('collectives', collectives_cache.stats)
+
+
+@timed_parse('parse_collectives')
+def parse_collectives(html):
+    """Parse the collectives listing into collectives without their tags and external links."""
+    soup = parse_html(html, 'collectives')
     collectives = []
 
     collective_items = soup.find_all('div', class_='s-card')
@@ -34,15 +41,9 @@ def scrape_collectives():
         description = description_tag.text.strip() if description_tag else "No description found"
         logger.debug(f"Description: {description}")
         
-        tags_url = f"{BASE_URL}{link}?tab=tags"
-        tags = scrape_collective_tags(tags_url)
-
-        external_links_url = f"{BASE_URL}{link}"
-        external_links = scrape_collective_external_links(external_links_url)
-        
         collective_dict = {
-            'tags': tags,
-            'external_links': external_links,
+            'tags': [],
+            'external_links': [],
             'description': description,
             'link': link,
             'name': name,
@@ -53,40 +54,18 @@ def scrape_collectives():
     return collectives
 
 
-def scrape_collective_tags(tags_url):
-    """Scrape tags from a collective's page."""
-    tags = []
-    page_number = 1
+@timed_parse('parse_collective_tags_page')
+def parse_collective_tags_page(html):
+    """Parse one page of a collective's tags tab into its tag names and whether a next page exists."""
+    soup = parse_html(html, 'collective_tags')
+    tags = [tag.text.strip() for tag in soup.find_all('a', class_='s-tag')]
+    return tags, soup.find('a', rel='next') is not None
 
-    while True:
-        paginated_url = f"{tags_url}&page={page_number}"
-        response = requests.get(paginated_url)
-        
-        if response.status_code != 200:
-            logger.debug(f"Failed to retrieve tags from {paginated_url}. Status code: {response.status_code}")
-            break
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        new_tags = [tag.text.strip() for tag in soup.find_all('a', class_='s-tag')]
-
-        if not new_tags:
-            break
-
-        tags.extend(new_tags)
-        page_number += 1
-
-    return tags
 
-
-def scrape_collective_external_links(external_links_url):
-    """Scrape external links from a collective's page."""
-    response = requests.get(external_links_url)
-    
-    if response.status_code != 200:
-        logger.debug(f"Failed to retrieve external links from {external_links_url}. Status code: {response.status_code}")
-        return []
-    
-    soup = BeautifulSoup(response.text, 'html.parser')
+@timed_parse('parse_collective_external_links')
+def parse_collective_external_links(html):
+    """Parse the external links of a collective's page."""
+    soup = parse_html(html, 'collective_links')
     external_links = []
 
     link_tags = soup.find_all('a', class_='s-link', target='_blank')
@@ -0,0 +1,293 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from app.utils.metrics import registry
+from app.utils.serializer import encode_json
+from app.scrapers.users import parse_user_id
+from app.scrapers.records import Question, Answer
+
+logger = logging.getLogger(__name__)
+
+STORE_PATH = os.environ.get("STACKOVERFLOW_STORE_PATH")
+STORE_MAX_AGE = int(os.environ.get("STACKOVERFLOW_STORE_MAX_AGE", 600))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS owners (
+    user_id INTEGER PRIMARY KEY, data TEXT NOT NULL, stored_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS questions (
+    question_id INTEGER PRIMARY KEY, owner_id INTEGER, last_activity_date INTEGER,
+    data TEXT NOT NULL, stored_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS answers (
+    answer_id INTEGER PRIMARY KEY, question_id INTEGER NOT NULL, owner_id INTEGER, last_activity_date INTEGER,
+    data TEXT NOT NULL, stored_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS answers_by_question ON answers (question_id);
+CREATE TABLE IF NOT EXISTS answer_sets (
+    question_id INTEGER PRIMARY KEY, answer_ids TEXT NOT NULL, stored_at REAL NOT NULL
+);
+"""
+
+
+class EntityStore:
+    """
+    Questions, answers and owners scraped so far, keyed by id in a local SQLite file.
+    Each owner is stored once and joined back into its posts on read. Reads only
+    return copies stored within the last `max_age` seconds.
+    """
+
+    def __init__(self, path, max_age=STORE_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def record(self, hits, misses):
+        """Count lookups served from the store and lookups that have to be scraped."""
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+    def _split_owner(self, record, now):
+        """Return the owner id, the owner row to upsert and the record data without a stored owner."""
+        owner = record.get('owner') or {}
+        owner_id = owner.get('user_id')
+        if owner_id is None and owner.get('link'):
+            owner_id = parse_user_id(owner['link'])
+        if owner_id is None:
+            return None, None, encode_json(record)
+
+        data = {key: value for key, value in record.items() if key != 'owner'}
+        return owner_id, (owner_id, encode_json(owner), now), encode_json(data)
+
+    def _upsert_owners(self, owner_rows):
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO owners (user_id, data, stored_at) VALUES (?, ?, ?)",
+            [row for row in owner_rows if row is not None]
+        )
+
+    def save_questions(self, questions, listed_activity=None):
+        """
+        Write questions through to the store. Embedded answers are not part of a question row.
+        `listed_activity` maps question ids to the activity date their listing showed, which
+        is kept instead of the question's own last_activity_date to compare later listings to.
+        """
+        listed_activity = listed_activity or {}
+        now = time.time()
+        rows, owner_rows = [], []
+        for question in questions:
+            owner_id, owner_row, data = self._split_owner({k: v for k, v in question.items() if k != 'answers'}, now)
+            activity = listed_activity.get(question['question_id'], question.get('last_activity_date'))
+            rows.append((int(question['question_id']), owner_id, activity, data, now))
+            owner_rows.append(owner_row)
+
+        try:
+            with self._lock, self._conn:
+                self._upsert_owners(owner_rows)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO questions (question_id, owner_id, last_activity_date, data, stored_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Failed to store {len(rows)} questions: {e}")
+
+    def save_answers(self, answers, question_id=None):
+        """
+        Write answers through to the store. When `question_id` is given, `answers` are all
+        of that question's answers, in page order, and replace the ones stored for it.
+        """
+        now = time.time()
+        rows, owner_rows = [], []
+        for answer in answers:
+            owner_id, owner_row, data = self._split_owner(answer, now)
+            rows.append((answer['answer_id'], answer['question_id'], owner_id, answer.get('last_activity_date'), data, now))
+            owner_rows.append(owner_row)
+
+        try:
+            with self._lock, self._conn:
+                self._upsert_owners(owner_rows)
+                if question_id is not None:
+                    self._conn.execute("DELETE FROM answers WHERE question_id = ?", (int(question_id),))
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO answer_sets (question_id, answer_ids, stored_at) VALUES (?, ?, ?)",
+                        (int(question_id), json.dumps([answer['answer_id'] for answer in answers]), now)
+                    )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO answers (answer_id, question_id, owner_id, last_activity_date, data, stored_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Failed to store {len(rows)} answers: {e}")
+
+    def _select(self, table, key, ids, max_age, record_type):
+        """Return {id: record} for the ids of `table` stored within `max_age` seconds, as `record_type` records."""
+        ids = [int(i) for i in ids]
+        if not ids:
+            return {}
+        cutoff = time.time() - (self.max_age if max_age is None else max_age)
+        placeholders = ','.join('?' * len(ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT t.{key}, t.data, o.data FROM {table} t LEFT JOIN owners o ON o.user_id = t.owner_id "
+                f"WHERE t.{key} IN ({placeholders}) AND t.stored_at >= ?",
+                ids + [cutoff]
+            ).fetchall()
+        return {row[0]: self._join(row[1], row[2], record_type) for row in rows}
+
+    def _join(self, data, owner_data, record_type):
+        record = json.loads(data)
+        if owner_data is not None:
+            record['owner'] = json.loads(owner_data)
+        return record_type.from_dict(record)
+
+    def get_questions(self, question_ids, max_age=None):
+        return self._select('questions', 'question_id', question_ids, max_age, Question)
+
+    def get_listed_question(self, question_id):
+        """
+        Return `(question, activity_date, stored_at)` for a stored question whatever its age,
+        with the activity date it was stored with, or None.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT q.data, o.data, q.last_activity_date, q.stored_at FROM questions q "
+                "LEFT JOIN owners o ON o.user_id = q.owner_id WHERE q.question_id = ?",
+                (int(question_id),)
+            ).fetchone()
+        if row is None:
+            return None
+        return self._join(row[0], row[1], Question), row[2], row[3]
+
+    def get_answers(self, answer_ids, max_age=None):
+        return self._select('answers', 'answer_id', answer_ids, max_age, Answer)
+
+    def get_question_answers(self, question_id, max_age=None):
+        """Return every stored answer of a question, or None unless they were stored together recently."""
+        cutoff = time.time() - (self.max_age if max_age is None else max_age)
+        with self._lock:
+            stored = self._conn.execute(
+                "SELECT answer_ids FROM answer_sets WHERE question_id = ? AND stored_at >= ?", (int(question_id), cutoff)
+            ).fetchone()
+        if stored is None:
+            return None
+
+        answer_ids = json.loads(stored[0])
+        answers = self._select('answers', 'answer_id', answer_ids, float('inf'), Answer)
+        if len(answers) != len(answer_ids):
+            return None
+        return [answers[answer_id] for answer_id in answer_ids]
+
+
+entity_store = EntityStore(STORE_PATH) if STORE_PATH else None
+if entity_store is not None:
+    registry.register_cache('entity_store', entity_store.stats)
+
+
+def store_questions(questions, fields=None, listed_activity=None):
+    """
+    Write fully scraped questions through to the entity store, if one is configured.
+    Questions enriched from a listing pass the listing's activity dates as `listed_activity`.
+    """
+    if entity_store is not None and fields is None and questions:
+        entity_store.save_questions(questions, listed_activity)
+
+
+def store_answers(answers, question_id=None, fields=None):
+    """Write fully scraped answers through to the entity store, if one is configured."""
+    if entity_store is not None and fields is None and (answers or question_id is not None):
+        entity_store.save_answers(answers, question_id)
+
+
+def lookup_questions(question_ids, with_answers=False):
+    """
+    Return {question_id: question} for the requested ids with a recent stored copy.
+    With `with_answers`, only questions whose answers are stored too are returned.
+    """
+    if entity_store is None:
+        return {}
+    question_ids = [question_id for question_id in question_ids if str(question_id).isdigit()]
+    stored = entity_store.get_questions(question_ids)
+    found = {}
+    for question_id in question_ids:
+        question = stored.get(int(question_id))
+        if question is None:
+            continue
+        if with_answers:
+            answers = entity_store.get_question_answers(question_id)
+            if answers is None:
+                continue
+            question['answers'] = answers
+        found[question_id] = question
+    entity_store.record(len(found), len(question_ids) - len(found))
+    return found
+
+
+def lookup_answers(answer_ids):
+    """Return {answer_id: answer} for the requested ids with a recent stored copy."""
+    if entity_store is None:
+        return {}
+    answer_ids = [answer_id for answer_id in answer_ids if str(answer_id).isdigit()]
+    stored = entity_store.get_answers(answer_ids)
+    found = {answer_id: stored[int(answer_id)] for answer_id in answer_ids if int(answer_id) in stored}
+    entity_store.record(len(found), len(answer_ids) - len(found))
+    return found
+
+
+def lookup_question_answers(question_ids):
+    """Return {question_id: answers} for the questions whose answers were stored recently."""
+    if entity_store is None:
+        return {}
+    found = {}
+    for question_id in question_ids:
+        if not str(question_id).isdigit():
+            continue
+        answers = entity_store.get_question_answers(question_id)
+        if answers is not None:
+            found[question_id] = answers
+    entity_store.record(len(found), len(question_ids) - len(found))
+    return found
+
+
+def refresh_from_store(summary):
+    """
+    Return the stored copy of a listing question, updated with the listing's fields, if it
+    is still current: the listing shows no activity since the one it was stored with, or,
+    for a listing without an activity date, it was stored recently.
+    Otherwise return None and the question has to be scraped again.
+    """
+    if entity_store is None:
+        return None
+    found = entity_store.get_listed_question(summary['question_id'])
+    if found is None:
+        entity_store.record(0, 1)
+        return None
+
+    stored, stored_activity, stored_at = found
+    listed_activity = summary.get('last_activity_date')
+    if listed_activity is None:
+        current = time.time() - stored_at <= entity_store.max_age
+    else:
+        current = stored_activity is not None and listed_activity <= stored_activity
+    if not current:
+        logger.debug(f"Question {summary['question_id']} has new activity, refreshing it.")
+        entity_store.record(0, 1)
+        return None
+
+    stored.update({key: value for key, value in summary.items() if value is not None and key not in ('owner', 'last_activity_date')})
+    stored['owner'].update({key: value for key, value in summary['owner'].items() if value is not None})
+    entity_store.record(1, 0)
+    return stored
@@ -0,0 +1,165 @@
+"""
+Background prefetching. Routes record which listings and questions they serve, and a
+scheduler thread periodically re-scrapes the hottest ones so their pages, profiles and
+stored entities stay warm for the next foreground request.
+"""
+import os
+import time
+import heapq
+import logging
+import threading
+from app.utils import make_request_with_retries
+from app.utils.rate_limiter import get_host_limiter, BURST
+from app.scrapers.questions import listing_window
+from app.scrapers.async_engine import scrape_questions, scrape_question_by_id
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = "https://stackoverflow.com"
+
+PREFETCH_INTERVAL = float(os.environ.get("STACKOVERFLOW_PREFETCH_INTERVAL", 0))
+PREFETCH_LISTINGS = int(os.environ.get("STACKOVERFLOW_PREFETCH_LISTINGS", 5))
+PREFETCH_QUESTIONS = int(os.environ.get("STACKOVERFLOW_PREFETCH_QUESTIONS", 20))
+PREFETCH_MAX_FOREGROUND = int(os.environ.get("STACKOVERFLOW_PREFETCH_MAX_FOREGROUND", 4))
+
+# Request counts halve every 15 minutes, so hotness follows what clients ask for now.
+HOTNESS_HALF_LIFE = 15 * 60
+REQUEST_LOG_SIZE = 1000
+
+# Upstream tokens left for foreground requests; prefetching waits while fewer are available.
+PREFETCH_TOKEN_RESERVE = BURST / 2
+
+# Page size the listing endpoint uses when the client does not pass one.
+DEFAULT_PAGE_SIZE = 30
+
+
+class RequestLog:
+    """Request counts per key that decay over time; the keys with the highest counts are hot."""
+
+    def __init__(self, half_life=HOTNESS_HALF_LIFE, maxsize=REQUEST_LOG_SIZE):
+        self.half_life = half_life
+        self.maxsize = maxsize
+        self._scores = {}
+        self._lock = threading.Lock()
+
+    def _decayed(self, score, updated, now):
+        return score * 0.5 ** ((now - updated) / self.half_life)
+
+    def record(self, key):
+        now = time.monotonic()
+        with self._lock:
+            score, updated = self._scores.get(key, (0.0, now))
+            self._scores[key] = (self._decayed(score, updated, now) + 1, now)
+            if len(self._scores) > self.maxsize:
+                coldest = min(self._scores, key=lambda k: self._decayed(*self._scores[k], now))
+                del self._scores[coldest]
+
+    def hottest(self, n):
+        """Return up to `n` keys, hottest first."""
+        now = time.monotonic()
+        with self._lock:
+            scored = [(self._decayed(score, updated, now), key) for key, (score, updated) in self._scores.items()]
+        return [key for _, key in heapq.nlargest(n, scored, key=lambda item: item[0])]
+
+
+class ForegroundTracker:
+    """Number of API requests currently being served."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def enter(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def busy(self, limit=PREFETCH_MAX_FOREGROUND):
+        return self.in_flight >= limit
+
+
+# Listings are keyed by their `tagged` parameter, '' being the untagged front page.
+listing_log = RequestLog()
+question_log = RequestLog()
+foreground = ForegroundTracker()
+
+
+class PrefetchScheduler:
+    """
+    Every `interval` seconds, re-scrape the hottest listings and questions. Each prefetch
+    waits until foreground traffic is light and the upstream rate limiter has tokens to
+    spare, so prefetching only uses capacity that user requests leave idle.
+    """
+
+    def __init__(self, interval, listings=PREFETCH_LISTINGS, questions=PREFETCH_QUESTIONS):
+        self.interval = interval
+        self.listings = listings
+        self.questions = questions
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="prefetch-scheduler", daemon=True)
+        self._thread.start()
+        logger.debug(f"Started prefetch scheduler with an interval of {self.interval} seconds.")
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.run_pass()
+            except Exception as e:
+                logger.error(f"Prefetch pass failed: {e}")
+
+    def _wait_for_capacity(self):
+        """Block while foreground traffic is heavy or the upstream budget is low. False once stopped."""
+        limiter = get_host_limiter(BASE_URL)
+        while not self._stopped.is_set():
+            if not foreground.busy() and limiter.available() >= PREFETCH_TOKEN_RESERVE:
+                return True
+            self._stopped.wait(1.0)
+        return False
+
+    def run_pass(self):
+        listings = listing_log.hottest(self.listings)
+        question_ids = question_log.hottest(self.questions)
+        logger.debug(f"Prefetching listings {listings} and questions {question_ids}")
+
+        for tagged in listings:
+            if not self._wait_for_capacity():
+                return
+            self.prefetch_listing(tagged)
+
+        for question_id in question_ids:
+            if not self._wait_for_capacity():
+                return
+            scrape_question_by_id(question_id)
+
+    def prefetch_listing(self, tagged):
+        """Scrape the first page the listing endpoint would return for `tagged`."""
+        tags = tagged.split(',') if tagged else None
+        urls, _ = listing_window(tags, 'last_activity_date', 0, DEFAULT_PAGE_SIZE)
+        for url in urls:
+            response = make_request_with_retries(url)
+            if response is None:
+                logger.debug(f"Failed to prefetch listing {url}")
+                return
+            scrape_questions(response.text)
+
+
+_scheduler = None
+
+
+def start_prefetch_scheduler(interval=PREFETCH_INTERVAL):
+    """Start the process-wide prefetch scheduler, unless prefetching is disabled (interval 0)."""
+    global _scheduler
+    if interval <= 0 or _scheduler is not None:
+        return _scheduler
+    _scheduler = PrefetchScheduler(interval)
+    _scheduler.start()
+    return _scheduler
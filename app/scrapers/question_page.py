@@ -0,0 +1,51 @@
+import logging
+from app.utils import parse_html, parse_reputation
+from app.utils.metrics import timed_parse
+from app.scrapers.records import Owner
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = "https://stackoverflow.com"
+
+class QuestionPage:
+    """
+    A question page fetched and parsed once. The question, answer and owner scrapers all
+    read from the same parsed document instead of downloading the page again.
+    """
+
+    @timed_parse('question_page')
+    def __init__(self, url, html):
+        self.url = url
+        self.soup = parse_html(html, 'question')
+        question_id_tag = self.soup.find('div', {'data-questionid': True})
+        self.question_id = int(question_id_tag['data-questionid']) if question_id_tag else None
+
+    def answer_summaries(self):
+        """Return the div of every answer on the page."""
+        return self.soup.find_all('div', class_='answer')
+
+    def answer_summary(self, answer_id):
+        """Return the div of a single answer, or None if it is not on the page."""
+        return self.soup.find('div', class_='answer', attrs={'data-answerid': str(answer_id)})
+
+    def owner_card(self):
+        """Return the question owner as shown on the page, without user and account ids."""
+        user_card = self.soup.find('div', class_='user-details')
+        if not user_card:
+            logger.warning("User details not found.")
+            return Owner(reputation=0, profile_image="", display_name="Unknown", link="")
+
+        username_tag = user_card.find('a')
+        username = username_tag.text.strip() if username_tag else "Unknown"
+        user_link = BASE_URL + username_tag['href'] if username_tag else ""
+        logger.debug(f"Username: {username}, User link: {user_link}")
+        reputation_tag = user_card.find('span', class_='reputation-score')
+        user_reputation = parse_reputation(reputation_tag.text.strip()) if reputation_tag else 0
+
+        profile_image_tag = self.soup.find('div', class_='gravatar-wrapper-32')
+        if profile_image_tag:
+            user_profile_image = profile_image_tag.find('img')['src'] if profile_image_tag.find('img') else ""
+        else:
+            user_profile_image = ""
+
+        return Owner(reputation=user_reputation, profile_image=user_profile_image, display_name=username, link=user_link)
@@ -1,12 +1,37 @@
+import re
 import logging
-from bs4 import BeautifulSoup
-from app.utils import make_request_with_retries, parse_reputation, parse_date, parse_view_count, clean_question_body
-from app.scrapers.users import scrape_user_profile
+from urllib.parse import quote, urlencode
+from app.utils import parse_html, parse_reputation, parse_date, parse_view_count, html_to_markdown
+from app.utils.metrics import timed_parse
+from app.scrapers.records import Question, Owner
 
 logger = logging.getLogger(__name__)
 
 BASE_URL = "https://stackoverflow.com"
 
+QUESTION_FIELDS = (
+    'question_id', 'tags', 'owner', 'is_answered', 'view_count', 'answer_count', 'score', 'last_activity_date',
+    'creation_date', 'title', 'link', 'content_license', 'body', 'community_owned_date', 'closed_reason',
+    'closed_date', 'answers'
+)
+MINIMAL_QUESTION_FIELDS = ('question_id', 'title', 'score', 'tags', 'link', 'answer_count', 'view_count', 'is_answered')
+
+# Listing fields that can only be filled in from the question's own page.
+DETAIL_FIELDS = ('creation_date', 'last_activity_date', 'body')
+
+# Stands in for a profile or question page lookup the field filter skipped; the listing keeps its own values.
+SKIPPED = object()
+
+# Header of a listing page with the number of questions in the whole listing, e.g. "24,163,654 questions"
+LISTING_TOTAL = re.compile(r'([\d,]+)\s+questions?\b')
+
+# Page sizes offered by the listing pages, and the listing tab for each sort.
+LISTING_PAGE_SIZES = (15, 30, 50)
+SORT_TABS = {
+    'creation_date': 'Newest',
+    'last_activity_date': 'Active',
+}
+
 
 def scrape_last_activity_date(soup):
     """Scrape the last activity date of a question."""
@@ -20,16 +45,10 @@ def scrape_last_activity_date(soup):
         return None
 
 
-def scrape_question_details(question_id):
-    """Scrape the details of a question."""
-    question_url = f"{BASE_URL}/questions/{question_id}"
-    response = make_request_with_retries(question_url)
-    
-    if response is None or response.status_code != 200:
-        logger.debug(f"Failed to fetch question details for ID {question_id}")
-        return None, None, None
-    
-    soup = BeautifulSoup(response.text, 'html.parser')
+@timed_parse('parse_question_details')
+def parse_question_details(question_id, page):
+    """Parse creation date, last activity date and body from a fetched question page."""
+    soup = page.soup
     
     creation_date_tag = soup.find('time', itemprop='dateCreated')
     if creation_date_tag and creation_date_tag.has_attr('datetime'):
@@ -43,7 +62,7 @@ def scrape_question_details(question_id):
     
     body_tag = soup.find('div', class_='s-prose js-post-body')
     if body_tag:
-        body = clean_question_body(body_tag.get_text().strip())
+        body = html_to_markdown(body_tag)
     else:
         logger.debug(f"Body of the question not found for question ID: {question_id}")
         body = None
@@ -51,114 +70,188 @@ def scrape_question_details(question_id):
     return creation_date, last_activity_date, body
 
 
-def scrape_questions(html_content):
-    """Scrape questions from HTML content."""
-    soup = BeautifulSoup(html_content, 'html.parser')
+def parse_question_summary(summary):
+    """Parse a listing-page question summary into a question without the enriched fields."""
+    question_id = int(summary['data-post-id'])
+    logger.debug(f"Processing question ID: {question_id}")
+    
+    vote_count = int(summary.find('span', class_='s-post-summary--stats-item-number').text.strip())
+    answer_count = int(summary.find_all('span', class_='s-post-summary--stats-item-number')[1].text.strip())
+    
+    title_tag = summary.find('h3', class_='s-post-summary--content-title').find('a')
+    title = title_tag.text.strip()
+    link = BASE_URL + title_tag['href']
+    logger.debug(f"Title: {title}, Link: {link}")
+    
+    tags = [tag.text for tag in summary.find_all('a', class_='s-tag')]
+    
+    user_card = summary.find('div', class_='s-user-card')
+    username = user_card.find('a', class_='flex--item').text.strip()
+    user_reputation = parse_reputation(user_card.find('li', class_='s-user-card--rep').find('span').text.strip())
+    user_profile_image = user_card.find('img', class_='s-avatar--image')['src']
+    user_link = BASE_URL + user_card.find('a', class_='flex--item')['href']
+    # The latest event shown on the listing (asked, answered or modified)
+    activity_tag = user_card.find('span', class_='relativetime', title=True)
+    listed_activity_date = parse_date(activity_tag['title']) if activity_tag else None
+    
+    is_answered = answer_count > 0
+    view_count_tag = summary.find('div', class_='flex--item ws-nowrap mb8')
+
+    if view_count_tag:
+        view_count_str = view_count_tag.get_text().split()[0].strip()
+        view_count = parse_view_count(view_count_str)
+        logger.debug(f"View count found: {view_count}")
+    else:
+        logger.warning("View count not found, setting to 0.")
+        view_count = 0
+ 
+    question_data = Question(
+        question_id=question_id,
+        tags=tags,
+        owner=Owner(
+            reputation=user_reputation,
+            profile_image=user_profile_image,
+            display_name=username,
+            link=user_link
+        ),
+        is_answered=is_answered,
+        view_count=view_count,
+        answer_count=answer_count,
+        score=vote_count,
+        last_activity_date=listed_activity_date,
+        title=title,
+        link=link
+    )
+    
+    community_wiki_tag = summary.find('span', class_='community-wiki')
+    if community_wiki_tag and 'title' in community_wiki_tag.attrs:
+        community_owned_date_str = community_wiki_tag['title'].split("as of ")[1]
+        community_owned_date = parse_date(community_owned_date_str)
+        question_data['community_owned_date'] = community_owned_date
+
+    closed_notice = summary.find('aside', class_='s-notice s-notice__info post-notice js-post-notice mb16')
+    if closed_notice:
+        logger.debug(f"Question {question_id} is closed.")
+        closed_reason = closed_notice.get_text(strip=True).split('.')[1].strip()
+        close_date_tag = closed_notice.find('span', class_='relativetime')
+        if close_date_tag and close_date_tag.has_attr('title'):
+            closed_date_str = close_date_tag['title']
+            closed_date = parse_date(closed_date_str.replace('T', ' ').replace('Z', ''))
+            question_data['closed_reason'] = closed_reason
+            question_data['closed_date'] = closed_date
+
+    return question_data
+
+
+def merge_question_enrichment(questions, profiles, details):
+    """
+    Combine parsed summaries with their profile and question page lookups, dropping failed ones.
+    Lookups passed as SKIPPED leave the fields they would fill in as the listing has them.
+    """
+    enriched = []
+    for question_data, profile, question_details in zip(questions, profiles, details):
+        if profile is None or question_details is None:
+            logger.debug(f"Error processing question summary: enrichment failed for question ID {question_data['question_id']}")
+            continue
+
+        if profile is not SKIPPED:
+            user_id, account_id = profile
+            if user_id is None or account_id is None:
+                logger.debug(f"Missing user ID or account ID for user link: {question_data['owner']['link']}")
+            question_data['owner']['user_id'] = user_id
+            question_data['owner']['account_id'] = account_id
+
+        if question_details is not SKIPPED:
+            creation_date, last_activity_date, body = question_details
+            if creation_date is None:
+                logger.debug(f"Missing creation date for question ID: {question_data['question_id']}")
+            question_data['creation_date'] = creation_date
+            question_data['last_activity_date'] = last_activity_date
+            question_data['body'] = body
+
+        enriched.append(question_data)
+
+    return enriched
+
+
+def listing_url(tags=None, sort=None, page=1, pagesize=15):
+    """Build the URL of a question listing page, restricted to any of `tags` and ordered by `sort`."""
+    url = f"{BASE_URL}/questions/tagged/{quote(' or '.join(tags))}" if tags else f"{BASE_URL}/questions"
+    params = {'tab': SORT_TABS[sort]} if sort in SORT_TABS else {}
+    params.update(page=page, pagesize=pagesize)
+    return f"{url}?{urlencode(params)}"
+
+
+def listing_window(tags, sort, start, end):
+    """
+    Return the listing page URLs that cover questions [start, end) of a listing, and the
+    position of question `start` on the first of them. The listing page size is chosen to
+    cover the range with as few pages as possible.
+    """
+    best = None
+    for size in LISTING_PAGE_SIZES:
+        first_page, last_page = start // size + 1, (end - 1) // size + 1
+        if best is None or last_page - first_page < best[2] - best[1]:
+            best = (size, first_page, last_page)
+
+    size, first_page, last_page = best
+    urls = [listing_url(tags, sort, page, size) for page in range(first_page, last_page + 1)]
+    return urls, start - (first_page - 1) * size
+
+
+@timed_parse('parse_listing_total')
+def parse_listing_total(html_content):
+    """Parse the number of questions in the whole listing from a listing page's header, or None."""
+    soup = parse_html(html_content, 'listing_total')
+    for tag in soup.find_all('div', class_='fs-body3'):
+        match = LISTING_TOTAL.search(tag.get_text())
+        if match:
+            return int(match.group(1).replace(',', ''))
+    logger.debug("Question count not found on the listing page.")
+    return None
+
+
+def parse_listing_window(pages, skip, count):
+    """
+    Parse consecutive listing pages and return `count` summaries after the first `skip`,
+    with the number of questions in the whole listing (None if the page does not show it).
+    Pages after one that failed to download (None) are ignored, and if the first page
+    failed the whole window is None.
+    """
+    if not pages or pages[0] is None:
+        return None
+
+    questions = []
+    for html_content in pages:
+        if html_content is None:
+            logger.debug("Listing page missing, truncating the window.")
+            break
+        questions.extend(parse_question_summaries(html_content))
+    return questions[skip:skip + count], parse_listing_total(pages[0])
+
+
+@timed_parse('parse_question_summaries')
+def parse_question_summaries(html_content):
+    """Parse every question summary on a listing page, skipping ones that fail to parse."""
+    soup = parse_html(html_content, 'summaries')
     questions = []
 
     question_summaries = soup.find_all('div', class_='s-post-summary')
     
     for summary in question_summaries:
         try:
-            question_id = int(summary['data-post-id'])
-            logger.debug(f"Processing question ID: {question_id}")
-            
-            vote_count = int(summary.find('span', class_='s-post-summary--stats-item-number').text.strip())
-            answer_count = int(summary.find_all('span', class_='s-post-summary--stats-item-number')[1].text.strip())
-            
-            title_tag = summary.find('h3', class_='s-post-summary--content-title').find('a')
-            title = title_tag.text.strip()
-            link = BASE_URL + title_tag['href']
-            logger.debug(f"Title: {title}, Link: {link}")
-            
-            tags = [tag.text for tag in summary.find_all('a', class_='s-tag')]
-            
-            user_card = summary.find('div', class_='s-user-card')
-            username = user_card.find('a', class_='flex--item').text.strip()
-            user_reputation = parse_reputation(user_card.find('li', class_='s-user-card--rep').find('span').text.strip())
-            user_profile_image = user_card.find('img', class_='s-avatar--image')['src']
-            user_link = BASE_URL + user_card.find('a', class_='flex--item')['href']
-            
-            user_id, account_id = scrape_user_profile(user_link)
-            if user_id is None or account_id is None:
-                logger.debug(f"Missing user ID or account ID for user link: {user_link}")
-            
-            creation_date, last_activity_date, body = scrape_question_details(question_id)
-            if creation_date is None:
-                logger.debug(f"Missing creation date for question ID: {question_id}")
-            
-            is_answered = answer_count > 0
-            view_count_tag = summary.find('div', class_='flex--item ws-nowrap mb8')
-
-            if view_count_tag:
-                view_count_str = view_count_tag.get_text().split()[0].strip()
-                view_count = parse_view_count(view_count_str)
-                logger.debug(f"View count found: {view_count}")
-            else:
-                logger.warning("View count not found, setting to 0.")
-                view_count = 0
-         
-            question_data = {
-                'question_id': question_id,
-                'tags': tags,
-                'owner': {
-                    'account_id': account_id,
-                    'reputation': user_reputation,
-                    'user_id': user_id,
-                    'user_type': 'registered',
-                    'profile_image': user_profile_image,
-                    'display_name': username,
-                    'link': user_link
-                },
-                'is_answered': is_answered,
-                'view_count': view_count,
-                'answer_count': answer_count,
-                'score': vote_count,
-                'last_activity_date': last_activity_date,
-                'creation_date': creation_date,
-                'title': title,
-                'link': link,
-                'content_license': "CC BY-SA 4.0",
-                'body': body
-            }
-            
-            community_wiki_tag = summary.find('span', class_='community-wiki')
-            if community_wiki_tag and 'title' in community_wiki_tag.attrs:
-                community_owned_date_str = community_wiki_tag['title'].split("as of ")[1]
-                community_owned_date = parse_date(community_owned_date_str)
-                question_data['community_owned_date'] = community_owned_date
-
-            closed_notice = summary.find('aside', class_='s-notice s-notice__info post-notice js-post-notice mb16')
-            if closed_notice:
-                logger.debug(f"Question {question_id} is closed.")
-                closed_reason = closed_notice.get_text(strip=True).split('.')[1].strip()
-                close_date_tag = closed_notice.find('span', class_='relativetime')
-                if close_date_tag and close_date_tag.has_attr('title'):
-                    closed_date_str = close_date_tag['title']
-                    closed_date = parse_date(closed_date_str.replace('T', ' ').replace('Z', ''))
-                    question_data['closed_reason'] = closed_reason
-                    question_data['closed_date'] = closed_date
-
-            questions.append(question_data)
-        
+            questions.append(parse_question_summary(summary))
         except Exception as e:
             logger.debug(f"Error processing question summary: {e}")
     
     return questions
 
 
-def scrape_question_by_id(question_id):
-    """Scrape a question by its ID."""
+@timed_parse('parse_question_page')
+def parse_question_page(question_id, page):
+    """Parse a fetched question page into a question whose owner ids are not resolved yet."""
     question_url = f"{BASE_URL}/questions/{question_id}"
-    logger.debug(f"Fetching question details from URL: {question_url}")
-    response = make_request_with_retries(question_url)
-    
-    if response is None or response.status_code != 200:
-        logger.error(f"Failed to fetch question details for ID {question_id}")
-        return None
-    
-    logger.debug("Successfully fetched the question page.")
-    soup = BeautifulSoup(response.text, 'html.parser')
+    soup = page.soup
     
     creation_date_tag = soup.find('time', itemprop='dateCreated')
     if creation_date_tag and creation_date_tag.has_attr('datetime'):
@@ -174,7 +267,7 @@ def scrape_question_by_id(question_id):
     
     body_tag = soup.find('div', class_='s-prose js-post-body')
     if body_tag:
-        body = clean_question_body(body_tag.get_text().strip())
+        body = html_to_markdown(body_tag)
         logger.debug(f"Question body found with length {len(body)} characters.")
     else:
         logger.warning("Body of the question not found.")
@@ -224,54 +317,20 @@ def scrape_question_by_id(question_id):
     is_answered = soup.find('div', class_='js-accepted-answer-indicator') is not None
     logger.debug(f"Is the question answered? {is_answered}")
     
-    user_card = soup.find('div', class_='user-details')
-    if user_card:
-        username_tag = user_card.find('a')
-        username = username_tag.text.strip() if username_tag else "Unknown"
-        user_link = BASE_URL + username_tag['href'] if username_tag else ""
-        logger.debug(f"Username: {username}, User link: {user_link}")
-        reputation_tag = user_card.find('span', class_='reputation-score')
-        user_reputation = parse_reputation(reputation_tag.text.strip()) if reputation_tag else 0
-        
-        profile_image_tag = soup.find('div', class_='gravatar-wrapper-32')
-        if profile_image_tag:
-            user_profile_image = profile_image_tag.find('img')['src'] if profile_image_tag.find('img') else ""
-        else:
-            user_profile_image = ""
-        
-        user_id, account_id = scrape_user_profile(user_link) if user_link else (None, None)
-        logger.debug(f"User ID: {user_id}, Account ID: {account_id}")
-    else:
-        logger.warning("User details not found.")
-        username = "Unknown"
-        user_reputation = 0
-        user_profile_image = ""
-        user_link = ""
-        user_id, account_id = None, None
-    
-    question = {
-        'question_id': question_id,
-        'creation_date': creation_date,
-        'last_activity_date': last_activity_date,
-        'body': body,
-        'title': title,
-        'score': score,
-        'tags': tags,
-        'owner': {
-            'account_id': account_id,
-            'reputation': user_reputation,
-            'user_id': user_id,
-            'user_type': 'registered',
-            'profile_image': user_profile_image,
-            'display_name': username,
-            'link': user_link
-        },
-        'link': question_url,
-        'is_answered': is_answered,
-        'view_count': view_count,
-        'answer_count': answer_count,
-        'content_license': "CC BY-SA 4.0"
-    }
+    question = Question(
+        question_id=question_id,
+        creation_date=creation_date,
+        last_activity_date=last_activity_date,
+        body=body,
+        title=title,
+        score=score,
+        tags=tags,
+        owner=page.owner_card(),
+        link=question_url,
+        is_answered=is_answered,
+        view_count=view_count,
+        answer_count=answer_count
+    )
     
     closed_notice = soup.find('aside', class_='s-notice s-notice__info post-notice js-post-notice mb16')
     if closed_notice:
@@ -0,0 +1,50 @@
+from app.utils.serializer import Record
+
+CONTENT_LICENSE = "CC BY-SA 4.0"
+
+
+class Owner(Record):
+    """The owner of a question or answer, as shown on its user card."""
+
+    FIELDS = ('account_id', 'reputation', 'user_id', 'user_type', 'profile_image', 'display_name', 'link')
+    DEFAULTS = {'user_type': 'registered'}
+    __slots__ = FIELDS
+
+
+class Answer(Record):
+    """An answer, with the owner of the answer."""
+
+    FIELDS = (
+        'answer_id', 'question_id', 'score', 'creation_date', 'last_activity_date', 'last_edit_date', 'is_accepted',
+        'owner', 'content_license', 'body'
+    )
+    DEFAULTS = {'content_license': CONTENT_LICENSE}
+    __slots__ = FIELDS
+
+    @classmethod
+    def from_dict(cls, data):
+        answer = super().from_dict(data)
+        if isinstance(answer.owner, dict):
+            answer.owner = Owner.from_dict(answer.owner)
+        return answer
+
+
+class Question(Record):
+    """A question; `answers` is only present when the answers were scraped along with it."""
+
+    FIELDS = (
+        'question_id', 'tags', 'owner', 'is_answered', 'view_count', 'answer_count', 'score', 'last_activity_date',
+        'creation_date', 'title', 'link', 'content_license', 'body'
+    )
+    OPTIONAL = ('community_owned_date', 'closed_reason', 'closed_date', 'answers')
+    DEFAULTS = {'content_license': CONTENT_LICENSE}
+    __slots__ = FIELDS + OPTIONAL
+
+    @classmethod
+    def from_dict(cls, data):
+        question = super().from_dict(data)
+        if isinstance(question.owner, dict):
+            question.owner = Owner.from_dict(question.owner)
+        if 'answers' in question:
+            question.answers = [Answer.from_dict(answer) if isinstance(answer, dict) else answer for answer in question.answers]
+        return question
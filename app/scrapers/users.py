@@ -1,27 +1,58 @@
+import os
 import re
 import logging
-from bs4 import BeautifulSoup
-from app.utils import make_request_with_retries
+from app.utils import parse_html
+from app.utils.cache import TTLCache, SQLiteStore
+from app.utils.metrics import registry, timed_parse
+from app.utils.shared_cache import shared_namespace
 
 logger = logging.getLogger(__name__)
 
+USER_CACHE_SIZE = int(os.environ.get("STACKOVERFLOW_USER_CACHE_SIZE", 10000))
+USER_CACHE_TTL = int(os.environ.get("STACKOVERFLOW_USER_CACHE_TTL", 30 * 24 * 3600))
+USER_CACHE_PATH = os.environ.get("STACKOVERFLOW_USER_CACHE_PATH")
 
-def scrape_user_profile(user_profile_link):
-    """Scrape a user's profile link for user_id and account_id."""
-    response = make_request_with_retries(user_profile_link)
-    if response is None or response.status_code != 200:
-        logger.debug(f"Failed to fetch user profile for link {user_profile_link}")
-        return None, None
-    
-    soup = BeautifulSoup(response.text, 'html.parser')
-    
-    # Extract user_id from the URL
+# user_id -> (user_id, account_id). Neither id ever changes for a profile.
+# Persisted to its own file when configured, otherwise shared with the other workers when that is configured.
+identity_cache = TTLCache(
+    maxsize=USER_CACHE_SIZE,
+    ttl=USER_CACHE_TTL,
+    persistence=(
+        SQLiteStore(USER_CACHE_PATH, 'user_identities') if USER_CACHE_PATH
+        else shared_namespace('user_identity', USER_CACHE_TTL)
+    )
+)
+
+registry.register_cache('user_identity', identity_cache.stats)
+
+def parse_user_id(user_profile_link):
+    """Extract the numeric user id from a profile link such as /users/123/name."""
     user_id_str = user_profile_link.split('/')[-2]
     try:
-        user_id = int(user_id_str)
+        return int(user_id_str)
     except ValueError as e:
         logger.debug(f"User ID parsing error: {e} for user_id_str: {user_id_str}")
-        user_id = None
+        return None
+
+
+def lookup_user_identity(user_id):
+    """Return the cached (user_id, account_id) for `user_id`, or None."""
+    if user_id is None:
+        return None
+    cached = identity_cache.get(user_id)
+    if cached is not None:
+        logger.debug(f"User identity cache hit for user ID {user_id}")
+        return tuple(cached)
+    return None
+
+
+@timed_parse('parse_user_profile')
+def parse_user_profile(html, user_profile_link):
+    """Parse a profile page into (user_id, account_id) and remember the identity."""
+    # Extract user_id from the URL
+    user_id = parse_user_id(user_profile_link)
+
+    soup = parse_html(html, 'profile')
     
     # Extract account_id using regex
     account_id_script = soup.find('script', string=lambda text: text and 'accountId' in text)
@@ -35,5 +66,9 @@ def scrape_user_profile(user_profile_link):
     else:
         logger.debug(f"No accountId script found for user link: {user_profile_link}")
         account_id = None
+
+    if user_id is not None and account_id is not None:
+        identity_cache.set(user_id, (user_id, account_id))
+        logger.debug(f"User identity cache stats: {identity_cache.stats()}")
     
     return user_id, account_id
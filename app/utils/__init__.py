@@ -1,3 +1,7 @@
 from app.utils.request_handler import make_request_with_retries
 from app.utils.parsers import parse_reputation, parse_date, parse_view_count
-from app.utils.html_cleaner import clean_question_body
+from app.utils.html_cleaner import clean_question_body, html_to_markdown
+from app.utils.enrichment import gather_in_parallel, gather_until_deadline
+from app.utils.html_parser import parse_html
+from app.utils.async_request_handler import async_make_request_with_retries, run_on_engine, call_on_engine, iterate_on_engine
+from app.utils.serializer import encode_json, pre_encode
@@ -0,0 +1,245 @@
+import os
+import time
+import queue
+import asyncio
+import logging
+import threading
+import contextvars
+import aiohttp
+
+from app.utils.rate_limiter import get_host_limiter
+from app.utils.page_cache import page_cache, UpstreamResponse
+from app.utils.metrics import (
+    observe_upstream_attempt, observe_backoff, observe_rate_limit_wait, observe_cache_hit
+)
+from app.utils.resilience import (
+    retry_budget, get_host_breaker, known_failure, allow_attempt, record_failure, retry_delay, parse_retry_after
+)
+from app.utils.deadline import MIN_TIMEOUT, request_deadline, past_deadline, within_deadline
+from app.utils.single_flight import AsyncSingleFlight
+from app.utils.transport import ReplayMiss, upstream_transport
+
+logger = logging.getLogger(__name__)
+
+ASYNC_MAX_CONNECTIONS = int(os.environ.get("STACKOVERFLOW_ASYNC_MAX_CONNECTIONS", 100))
+
+_engine_loop = None
+_engine_lock = threading.Lock()
+_session = None
+
+async_request_flights = AsyncSingleFlight('upstream request')
+
+
+def get_engine_loop():
+    """Return the scraping engine's event loop, starting its thread on first use."""
+    global _engine_loop
+    if _engine_loop is None:
+        with _engine_lock:
+            if _engine_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="scraping-engine", daemon=True).start()
+                _engine_loop = loop
+                logger.debug("Started scraping engine event loop.")
+    return _engine_loop
+
+
+def _in_caller_context(coro):
+    """Wrap `coro` so it runs with the caller's context variables, such as the request's upstream cost."""
+    context = contextvars.copy_context()
+
+    async def run():
+        for var, value in context.items():
+            var.set(value)
+        return await coro
+
+    return run()
+
+
+async def run_on_engine(coro):
+    """
+    Run `coro` on the engine loop and await its result from another event loop.
+    All async scraping happens on that one loop, so its connection pool and in-flight
+    bookkeeping are shared by every request.
+    """
+    future = asyncio.run_coroutine_threadsafe(_in_caller_context(coro), get_engine_loop())
+    return await asyncio.wrap_future(future)
+
+
+def call_on_engine(coro):
+    """
+    Synchronous counterpart of run_on_engine: run `coro` on the engine loop and block
+    until its result, for callers outside any event loop such as the prefetch scheduler.
+    """
+    loop = get_engine_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("call_on_engine would block the engine loop; await the coroutine instead")
+    return asyncio.run_coroutine_threadsafe(_in_caller_context(coro), loop).result()
+
+
+def iterate_on_engine(coroutines):
+    """
+    Run coroutines on the engine loop and yield their results from a synchronous caller,
+    such as a streaming response, in the order they complete. A coroutine that raises
+    yields None. Iteration stops at the deadline of the current API request. Closing the
+    generator early cancels whatever is still running.
+    """
+    loop = get_engine_loop()
+    deadline = request_deadline.get()
+    completed = queue.Queue()
+    pending = set()
+    for coro in coroutines:
+        future = asyncio.run_coroutine_threadsafe(_in_caller_context(coro), loop)
+        future.add_done_callback(lambda future: completed.put((future, time.monotonic())))
+        pending.add(future)
+
+    try:
+        while pending:
+            try:
+                future, finished_at = completed.get(timeout=None if deadline is None else deadline.remaining())
+            except queue.Empty:
+                finished_at = None
+            # Work that gives up at the deadline finishes after it, so only earlier results are complete
+            if finished_at is None or (deadline is not None and finished_at >= deadline.expires_at):
+                logger.warning(f"Request deadline of {deadline.seconds} seconds expired with {len(pending)} items unfinished.")
+                deadline.cut_short = True
+                break
+            pending.discard(future)
+            if future.cancelled():
+                yield None
+            elif future.exception() is not None:
+                logger.error(f"Enrichment call failed: {future.exception()}")
+                yield None
+            else:
+                yield future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def get_async_session():
+    """Return the engine's keep-alive aiohttp session. Must be called on the engine loop."""
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(limit=ASYNC_MAX_CONNECTIONS)
+        _session = aiohttp.ClientSession(connector=connector)
+        logger.debug(f"Created async upstream session with up to {ASYNC_MAX_CONNECTIONS} connections.")
+    return _session
+
+
+async def async_make_request_with_retries(url, max_retries=5, backoff_factor=1.0, timeout=5, delay_between_requests=2, use_cache=True):
+    """
+    Make HTTP request with retries and exponential backoff.
+    Fresh pages are served from the page cache without touching the network; stale ones
+    are revalidated with a conditional request. Concurrent calls for the same URL share
+    a single upstream request. Permanent failures such as a 404 are not retried and are
+    remembered for a while; throttled and transient ones are retried within the retry
+    budget, waiting as long as Retry-After asks, unless the host's circuit breaker is open.
+    Timeouts and waits are clipped to the deadline of the current API request, and the
+    request is given up once the deadline has passed.
+    """
+    return await async_request_flights.do(
+        (url, use_cache),
+        lambda: _async_request_with_retries(url, max_retries, backoff_factor, timeout, delay_between_requests, use_cache)
+    )
+
+
+async def _async_get(session, url, headers, timeout):
+    """GET `url` through the configured upstream transport, or straight from the upstream."""
+    if upstream_transport is not None:
+        intercepted = await upstream_transport.async_intercept(url, timeout)
+        if intercepted is not None:
+            return intercepted
+
+    async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+        text = await response.text()
+        upstream_response = UpstreamResponse(url, response.status, text, response.headers)
+
+    if upstream_transport is not None:
+        upstream_transport.record(url, upstream_response.status_code, upstream_response.headers, text)
+    return upstream_response
+
+
+async def _async_request_with_retries(url, max_retries, backoff_factor, timeout, delay_between_requests, use_cache):
+    cached = page_cache.get(url) if use_cache and page_cache else None
+    if cached is not None and cached.is_fresh():
+        logger.debug(f"Page cache hit for {url}")
+        page_cache.record(hit=True)
+        observe_cache_hit()
+        return cached.to_response()
+    if use_cache and page_cache:
+        page_cache.record(hit=False)
+    if use_cache and known_failure(url) is not None:
+        return None
+    headers = cached.revalidation_headers() if cached is not None else {}
+
+    session = get_async_session()
+    limiter = get_host_limiter(url)
+    breaker = get_host_breaker(url)
+    retry_budget.deposit()
+
+    logger.debug(f"Starting async request to {url} with up to {max_retries} retries and timeout of {timeout} seconds.")
+
+    for attempt in range(max_retries):
+        if past_deadline(url) or not allow_attempt(url, breaker):
+            return None
+
+        logger.debug(f"Attempt {attempt + 1} of {max_retries} for URL: {url}")
+        status = retry_after = None
+        try:
+            wait = limiter.reserve()
+            if wait > 0:
+                logger.debug(f"Rate limit reached, waiting {wait:.2f} seconds.")
+                await asyncio.sleep(within_deadline(wait))
+            observe_rate_limit_wait(url, wait)
+            if past_deadline(url):
+                return None
+            logger.debug(f"Sending GET request to {url}")
+            start = time.perf_counter()
+            upstream_response = await _async_get(session, url, headers, within_deadline(timeout, MIN_TIMEOUT))
+            observe_upstream_attempt(url, upstream_response.status_code, time.perf_counter() - start)
+            logger.debug(f"Response status code: {upstream_response.status_code} on attempt {attempt + 1}")
+            if upstream_response.status_code == 304 and cached is not None:
+                logger.debug(f"Cached copy of {url} is still valid.")
+                breaker.record_success()
+                page_cache.touch(cached)
+                return cached.to_response()
+            if upstream_response.status_code == 200:
+                logger.debug(f"Successfully retrieved data from {url} on attempt {attempt + 1}.")
+                breaker.record_success()
+                if use_cache and page_cache:
+                    page_cache.set(url, upstream_response)
+                return upstream_response
+            else:
+                logger.error(f"Failed to retrieve data from {url}. Status code: {upstream_response.status_code} on attempt {attempt + 1}")
+                status = upstream_response.status_code
+                retry_after = parse_retry_after(upstream_response.headers.get('Retry-After'))
+        except ReplayMiss as e:
+            logger.error(f"Request to {url} failed on attempt {attempt + 1}: {e}")
+            return None
+        except asyncio.TimeoutError as e:
+            observe_upstream_attempt(url, 'timeout', time.perf_counter() - start)
+            logger.error(f"Request to {url} timed out on attempt {attempt + 1}. Exception: {e}")
+        except aiohttp.ClientError as e:
+            observe_upstream_attempt(url, 'error', time.perf_counter() - start)
+            logger.error(f"Request to {url} failed on attempt {attempt + 1} with exception: {e}")
+
+        # A failure caused by the deadline says nothing about the upstream
+        if past_deadline(url) or not record_failure(url, breaker, status, retry_after, use_cache):
+            return None
+        if attempt + 1 == max_retries:
+            break
+        sleep_time = retry_delay(url, attempt, backoff_factor, retry_after)
+        if sleep_time is None:
+            return None
+        sleep_time = within_deadline(max(sleep_time, delay_between_requests))
+        logger.warning(f"Retrying after {sleep_time:.2f} seconds (Attempt {attempt + 1}).")
+        await asyncio.sleep(sleep_time)
+        observe_backoff(url, sleep_time, retry=True)
+
+    logger.error(f"Max retries ({max_retries}) exceeded with URL: {url}. Giving up.")
+    return None
@@ -0,0 +1,177 @@
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteStore:
+    """Small key/value table in a local SQLite file, used to persist cache entries across restarts."""
+
+    def __init__(self, path, table):
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+
+    def get(self, key):
+        """Return `(value, stored_at)` for `key`, or None."""
+        with self._lock:
+            row = self._conn.execute(f"SELECT value, stored_at FROM {self.table} WHERE key = ?", (str(key),)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, stored_at):
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, stored_at) VALUES (?, ?, ?)",
+                (str(key), json.dumps(value), stored_at)
+            )
+
+    def delete(self, key):
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (str(key),))
+
+
+def _read_persisted(persistence, key):
+    """Return `(value, stored_at)` for `key` from a persistence store, or None, also when the store cannot be read."""
+    try:
+        return persistence.get(key)
+    except (sqlite3.Error, ValueError) as e:
+        logger.error(f"Failed to read persisted cache entry {key}: {e}")
+        return None
+
+
+class DatasetCache:
+    """
+    A single cached value, such as a whole crawled dataset, that goes stale `ttl` seconds
+    after it was stored. With a `persistence` store, the value is written through to it
+    under `key`, and a missing or stale value is replaced by a newer persisted one.
+    """
+
+    def __init__(self, ttl, persistence=None, key='dataset'):
+        self.ttl = ttl
+        self.persistence = persistence
+        self.key = key
+        self._value = None
+        self._stored_at = None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _is_fresh(self, now):
+        return self._stored_at is not None and now - self._stored_at <= self.ttl
+
+    def get(self):
+        """Return `(value, is_fresh)`, with a None value before anything was stored."""
+        now = time.time()
+        if self.persistence is not None and not self._is_fresh(now):
+            persisted = _read_persisted(self.persistence, self.key)
+            if persisted is not None:
+                with self._lock:
+                    if self._stored_at is None or persisted[1] > self._stored_at:
+                        self._value, self._stored_at = persisted
+
+        with self._lock:
+            if self._stored_at is None:
+                self.misses += 1
+                return None, False
+            self.hits += 1
+            return self._value, self._is_fresh(now)
+
+    def set(self, value):
+        stored_at = time.time()
+        with self._lock:
+            self._value = value
+            self._stored_at = stored_at
+        if self.persistence is not None:
+            try:
+                self.persistence.set(self.key, value, stored_at)
+            except sqlite3.Error as e:
+                logger.error(f"Failed to persist cache entry {self.key}: {e}")
+
+    def stats(self):
+        """Return hit/miss counters; a stale value served while it refreshes counts as a hit."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire `ttl` seconds after they were stored.
+    When a `persistence` store is given, entries are written through to it and
+    memory misses fall back to it.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, persistence=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.persistence = persistence
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expired(self, stored_at, now):
+        return self.ttl is not None and now - stored_at > self.ttl
+
+    def _store(self, key, value, stored_at):
+        self._entries[key] = (value, stored_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        """Return the cached value for `key`, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry[1], now):
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        if self.persistence is not None:
+            persisted = _read_persisted(self.persistence, key)
+            if persisted is not None and not self._expired(persisted[1], now):
+                with self._lock:
+                    self._store(key, persisted[0], persisted[1])
+                    self.hits += 1
+                return persisted[0]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        stored_at = time.time()
+        with self._lock:
+            self._store(key, value, stored_at)
+        if self.persistence is not None:
+            try:
+                self.persistence.set(key, value, stored_at)
+            except sqlite3.Error as e:
+                logger.error(f"Failed to persist cache entry {key}: {e}")
+
+    def stats(self):
+        """Return hit/miss counters and the current size."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+                'size': len(self._entries),
+                'maxsize': self.maxsize
+            }
@@ -0,0 +1,130 @@
+"""
+Per-request deadlines. An API request gets a deadline from its `timeout` parameter or
+from STACKOVERFLOW_REQUEST_TIMEOUT; it lives in a context variable, so it follows the
+request onto the engine loop and into every fetch. Fetches give up once it has passed,
+and never sleep past it, so anything that finishes before the deadline is complete.
+Coalesced fetches (see AsyncSingleFlight) run under a SharedDeadline, the latest deadline
+of the requests waiting for them, since other requests may share them; a request that
+stops waiting for one cancels it only when nobody else is waiting.
+"""
+import os
+import time
+import logging
+from contextvars import ContextVar
+
+from app.utils.metrics import observe_shed
+
+logger = logging.getLogger(__name__)
+
+REQUEST_TIMEOUT = float(os.environ.get("STACKOVERFLOW_REQUEST_TIMEOUT", 0))
+
+# Shortest timeout handed to an HTTP client, which would reject a timeout of zero
+MIN_TIMEOUT = 0.01
+
+
+class Deadline:
+    """The point in time an API request must answer by; `cut_short` is set once items were left unfinished."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.cut_short = False
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+
+class SharedDeadline:
+    """
+    The deadline of work several requests wait for: the latest of their deadlines, and
+    none at all once a waiter without a deadline joins. Without a deadline, remaining()
+    is infinite and the deadline never expires.
+    """
+
+    def __init__(self):
+        self.deadlines = []
+        self.unbounded = False
+        self.cut_short = False
+
+    def join(self, deadline):
+        """Extend the deadline to cover a waiter whose own deadline is `deadline`, None for none."""
+        if deadline is None:
+            self.unbounded = True
+        else:
+            self.deadlines.append(deadline)
+
+    def _latest(self):
+        return None if self.unbounded else max(self.deadlines, key=lambda deadline: deadline.expires_at)
+
+    @property
+    def seconds(self):
+        latest = self._latest()
+        return None if latest is None else latest.seconds
+
+    @property
+    def expires_at(self):
+        latest = self._latest()
+        return float('inf') if latest is None else latest.expires_at
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+
+request_deadline = ContextVar('request_deadline', default=None)
+
+
+def start_request_deadline(timeout=None):
+    """
+    Start the deadline of the current API request: `timeout` seconds, capped by
+    REQUEST_TIMEOUT when that is set. Without either, the request has no deadline.
+    """
+    seconds = timeout if timeout is not None and timeout > 0 else None
+    if REQUEST_TIMEOUT > 0:
+        seconds = REQUEST_TIMEOUT if seconds is None else min(seconds, REQUEST_TIMEOUT)
+    deadline = Deadline(seconds) if seconds is not None else None
+    request_deadline.set(deadline)
+    return deadline
+
+
+def remaining_time():
+    """Seconds left until the current deadline, or None without one."""
+    deadline = request_deadline.get()
+    return None if deadline is None else deadline.remaining()
+
+
+def deadline_expired():
+    deadline = request_deadline.get()
+    return deadline is not None and deadline.expired()
+
+
+def past_deadline(url):
+    """Whether the current deadline has passed, in which case the fetch of `url` is abandoned."""
+    if not deadline_expired():
+        return False
+    logger.warning(f"Request deadline expired, giving up on {url}.")
+    observe_shed(url, 'deadline')
+    return True
+
+
+def within_deadline(seconds, minimum=0.0):
+    """Clip a timeout or sleep of `seconds` to the time left until the current deadline, but not below `minimum`."""
+    remaining = remaining_time()
+    return seconds if remaining is None else max(minimum, min(seconds, remaining))
+
+
+async def without_request_deadline(coro):
+    """Await `coro` without the current request's deadline, e.g. for background refreshes that outlive the request."""
+    request_deadline.set(None)
+    return await coro
+
+
+def request_cut_short():
+    """Whether the current request left items unfinished when its deadline expired."""
+    deadline = request_deadline.get()
+    return deadline is not None and deadline.cut_short
@@ -0,0 +1,67 @@
+import time
+import asyncio
+import logging
+
+from app.utils.deadline import request_deadline
+
+logger = logging.getLogger(__name__)
+
+
+async def gather_in_parallel(coroutines):
+    """
+    Await coroutines concurrently and return their results in order. A coroutine that
+    raises is logged and yields None, so one bad item never fails the batch.
+    """
+    results = await asyncio.gather(*coroutines, return_exceptions=True)
+    gathered = []
+    for result in results:
+        # A coroutine cancelled on its own, such as a call whose flight was abandoned, is a failure too
+        if isinstance(result, BaseException):
+            logger.error(f"Enrichment call failed: {result}")
+            gathered.append(None)
+        else:
+            gathered.append(result)
+    return gathered
+
+
+async def _finished_at(coroutine):
+    result = await coroutine
+    return result, time.monotonic()
+
+
+async def gather_until_deadline(coroutines):
+    """
+    gather_in_parallel that stops waiting at the current request's deadline. Returns the
+    results in order and the indexes of the coroutines that did not finish before the
+    deadline; those are cancelled and their results are None.
+    """
+    deadline = request_deadline.get()
+    if deadline is None:
+        return await gather_in_parallel(coroutines), []
+
+    tasks = [asyncio.ensure_future(_finished_at(coroutine)) for coroutine in coroutines]
+    if tasks:
+        await asyncio.wait(tasks, timeout=deadline.remaining())
+
+    results = []
+    unfinished = []
+    for index, task in enumerate(tasks):
+        if not task.done():
+            task.cancel()
+        elif task.cancelled() or task.exception() is not None:
+            logger.error(f"Enrichment call failed: {'cancelled' if task.cancelled() else task.exception()}")
+            results.append(None)
+            continue
+        else:
+            result, finished_at = task.result()
+            # Work that gives up at the deadline finishes after it, so only earlier results are complete
+            if finished_at < deadline.expires_at:
+                results.append(result)
+                continue
+        results.append(None)
+        unfinished.append(index)
+
+    if unfinished:
+        logger.warning(f"Request deadline of {deadline.seconds} seconds expired with {len(unfinished)} of {len(tasks)} items unfinished.")
+        deadline.cut_short = True
+    return results, unfinished
@@ -0,0 +1,72 @@
+"""
+Field selection for API responses. A field set is a frozenset of field names, with
+`owner.user_id` style names for nested fields, or None when every field is wanted.
+Scrapers consult it to skip secondary fetches whose fields nobody asked for.
+"""
+from collections.abc import Mapping
+
+MINIMAL_FILTER = '!minimal'
+
+# Owner fields that can only be resolved by fetching the owner's profile page.
+OWNER_ID_FIELDS = ('owner.user_id', 'owner.account_id')
+
+
+def parse_field_filter(filter_value, known_fields, minimal_fields):
+    """
+    Return the field set selected by a `filter` parameter. `!minimal` selects
+    `minimal_fields` and a comma-separated list of known fields selects those fields;
+    any other value is a named filter that keeps every field.
+    """
+    if not filter_value:
+        return None
+    if filter_value == MINIMAL_FILTER:
+        return frozenset(minimal_fields)
+
+    fields = frozenset(field.strip() for field in filter_value.split(',') if field.strip())
+    if fields and all(field.split('.')[0] in known_fields for field in fields):
+        return fields
+    return None
+
+
+def require_fields(fields, *names):
+    """Add fields needed for filtering or sorting to a field set."""
+    return fields if fields is None else fields.union(names)
+
+
+def wants_field(fields, name):
+    """Whether `name`, a parent of it or one of its children is in the field set."""
+    if fields is None or name in fields:
+        return True
+    return any(field.startswith(name + '.') or name.startswith(field + '.') for field in fields)
+
+
+def wants_any(fields, names):
+    return any(wants_field(fields, name) for name in names)
+
+
+def subfields(fields, name):
+    """Return the field set for the value of field `name`, e.g. the answers of a question."""
+    if fields is None or name in fields:
+        return None
+    prefix = name + '.'
+    return frozenset(field[len(prefix):] for field in fields if field.startswith(prefix))
+
+
+def project_fields(item, fields):
+    """Return a copy of `item` holding only the fields in the field set."""
+    if fields is None:
+        return item
+
+    projected = {}
+    for key, value in item.items():
+        if key in fields:
+            projected[key] = value
+            continue
+        nested = subfields(fields, key)
+        if not nested:
+            continue
+        if isinstance(value, Mapping):
+            projected[key] = project_fields(value, nested)
+        elif isinstance(value, list):
+            projected[key] = [project_fields(v, nested) if isinstance(v, Mapping) else v for v in value]
+    return projected
@@ -1,43 +1,153 @@
 import re
-from bs4 import BeautifulSoup
+from bs4 import NavigableString, Tag
+from bs4.element import Comment, Declaration, Doctype, ProcessingInstruction
 
+from app.utils.html_parser import parse_html
 
-def clean_question_body(body_html, closed_reason=None, closed_date=None):
-    """
-    Clean and format the HTML body of a question to make it more readable.
-    Preserves code blocks and important formatting.
-    Removes 'Closed' notices and related messages.
-    """
-    soup = BeautifulSoup(body_html, 'html.parser')
+WHITESPACE = re.compile(r'\s+')
+BLANK_LINES = re.compile(r'\n{3,}')
+TRAILING_SPACES = re.compile(r'[ \t]+\n')
+CLOSED_TEXT = re.compile(r'Closed\s*')
 
-    # Remove unnecessary tags but keep the content
-    for tag in soup(['script', 'style', 'meta', 'link']):
-        tag.decompose()
+SKIPPED_TAGS = frozenset(('script', 'style', 'meta', 'link', 'noscript', 'template'))
+BLOCK_TAGS = frozenset(('p', 'div', 'table', 'tr', 'dl', 'figure', 'details', 'section'))
+HEADING_LEVELS = {'h1': 1, 'h2': 2, 'h3': 3, 'h4': 4, 'h5': 5, 'h6': 6}
+EMPHASIS = {'strong': '**', 'b': '**', 'em': '*', 'i': '*', 'del': '~~', 's': '~~', 'strike': '~~'}
+NON_TEXT_STRINGS = (Comment, Declaration, Doctype, ProcessingInstruction)
 
-    closed_notice = soup.find('aside', class_='s-notice s-notice__info post-notice js-post-notice mb16')
-    if closed_notice:
-        closed_notice.decompose()
 
-    if closed_reason:
-        for elem in soup(text=lambda text: closed_reason in text):
-            elem.extract()
+class CodeBlock(str):
+    """A fenced code block in the output, kept verbatim when the text around it is normalized."""
 
-    for elem in soup(text=re.compile(r'Closed\s*')):
-        elem.extract()
 
-    for elem in soup(text=re.compile(r'Closed \d+ hours ago')):
-        elem.extract()
+def _code_language(pre):
+    """Return the language of a code block from its `lang-*` class, if any."""
+    for class_name in pre.get('class') or ():
+        if class_name.startswith('lang-') and class_name != 'lang-none':
+            return class_name[len('lang-'):]
+    return ''
+
+
+def _inline_code(text):
+    fence = '``' if '`' in text else '`'
+    padding = ' ' if text.startswith('`') or text.endswith('`') else ''
+    return f"{fence}{padding}{text}{padding}{fence}"
+
+
+def _is_notice(tag):
+    classes = tag.get('class') or ()
+    return tag.name == 'aside' and 'post-notice' in classes
+
+
+def _render(element, out, list_prefix=''):
+    """Append the Markdown for the children of `element` to `out`, in document order."""
+    for child in element.children:
+        if isinstance(child, NavigableString):
+            if isinstance(child, NON_TEXT_STRINGS):
+                continue
+            text = WHITESPACE.sub(' ', child)
+            # Collapse whitespace across adjacent text, as a browser would
+            if text.startswith(' ') and (not out or out[-1].endswith((' ', '\n'))):
+                text = text[1:]
+            if text:
+                out.append(text)
+            continue
+        if not isinstance(child, Tag):
+            continue
 
-    for code_block in soup.find_all('pre'):
-        code_block.insert_before('\n```')
-        code_block.insert_after('```\n')
+        name = child.name
+        if name in SKIPPED_TAGS or _is_notice(child):
+            continue
+        if name == 'pre':
+            code = child.get_text().rstrip('\n')
+            out.append(CodeBlock(f"```{_code_language(child)}\n{code}\n```"))
+        elif name == 'code':
+            out.append(_inline_code(child.get_text()))
+        elif name == 'br':
+            out.append('\n')
+        elif name == 'hr':
+            out.append('\n\n---\n\n')
+        elif name in HEADING_LEVELS:
+            out.append(f"\n\n{'#' * HEADING_LEVELS[name]} ")
+            _render(child, out, list_prefix)
+            out.append('\n\n')
+        elif name in EMPHASIS:
+            marker = EMPHASIS[name]
+            out.append(marker)
+            _render(child, out, list_prefix)
+            out.append(marker)
+        elif name == 'a':
+            href = child.get('href')
+            if href:
+                out.append('[')
+                _render(child, out, list_prefix)
+                out.append(f"]({href})")
+            else:
+                _render(child, out, list_prefix)
+        elif name == 'img':
+            out.append(f"![{child.get('alt', '')}]({child.get('src', '')})")
+        elif name in ('ul', 'ol'):
+            # Nested lists start right below their item
+            out.append('' if list_prefix else '\n')
+            for number, item in enumerate(child.find_all('li', recursive=False), start=1):
+                marker = f"{number}. " if name == 'ol' else '- '
+                out.append(f"\n{list_prefix}{marker}")
+                _render(item, out, list_prefix + '    ')
+            out.append('\n\n')
+        elif name == 'blockquote':
+            quoted = []
+            _render(child, quoted, list_prefix)
+            lines = _finish(quoted).split('\n')
+            out.append('\n\n' + '\n'.join(f"> {line}".rstrip() for line in lines) + '\n\n')
+        elif name in BLOCK_TAGS:
+            out.append('\n\n')
+            _render(child, out, list_prefix)
+            out.append('\n\n')
+        else:
+            _render(child, out, list_prefix)
 
-    for inline_code in soup.find_all('code'):
-        inline_code.insert_before('`')
-        inline_code.insert_after('`')
 
-    for br in soup.find_all('br'):
-        br.replace_with('\n')
+def _normalize(text):
+    return BLANK_LINES.sub('\n\n', TRAILING_SPACES.sub('\n', text)).strip()
 
-    cleaned_text = soup.get_text(separator='\n').strip()
-    return cleaned_text
+
+def _finish(out):
+    """Join rendered pieces into paragraphs separated by one blank line, leaving code blocks untouched."""
+    blocks = []
+    text = []
+    for piece in out:
+        if isinstance(piece, CodeBlock):
+            blocks.append(_normalize(''.join(text)))
+            blocks.append(piece)
+            text = []
+        else:
+            text.append(piece)
+    blocks.append(_normalize(''.join(text)))
+    return '\n\n'.join(block for block in blocks if block)
+
+
+def html_to_markdown(element):
+    """
+    Convert a post body element to Markdown in one walk over the parsed tree, keeping
+    fenced code blocks (with their language), inline code, links, lists and line breaks.
+    Post notices such as 'Closed' banners, scripts and styles are dropped.
+    """
+    if element is None:
+        return None
+    out = []
+    _render(element, out)
+    return _finish(out)
+
+
+def clean_question_body(body_html, closed_reason=None, closed_date=None):
+    """
+    Convert the HTML of a post body, as a string, to Markdown.
+    Removes 'Closed' notices and related messages, including any text mentioning `closed_reason`.
+    """
+    soup = parse_html(body_html)
+    if closed_reason:
+        for elem in soup.find_all(string=lambda text: closed_reason in text):
+            elem.extract()
+    for elem in soup.find_all(string=CLOSED_TEXT):
+        elem.extract()
+    return html_to_markdown(soup)
@@ -0,0 +1,69 @@
+import os
+import logging
+from bs4 import BeautifulSoup, SoupStrainer
+
+logger = logging.getLogger(__name__)
+
+try:
+    import lxml  # noqa: F401
+    _LXML_AVAILABLE = True
+except ImportError:
+    _LXML_AVAILABLE = False
+
+
+def _default_parser():
+    configured = os.environ.get("STACKOVERFLOW_HTML_PARSER")
+    if configured == 'lxml' and not _LXML_AVAILABLE:
+        logger.warning("STACKOVERFLOW_HTML_PARSER is 'lxml' but lxml is not installed, falling back to html.parser.")
+        return 'html.parser'
+    if configured:
+        return configured
+    return 'lxml' if _LXML_AVAILABLE else 'html.parser'
+
+
+HTML_PARSER = _default_parser()
+
+
+def _has_class(attrs, class_name):
+    classes = attrs.get('class') or ''
+    if isinstance(classes, str):
+        classes = classes.split()
+    return class_name in classes
+
+
+def _question_region(name, attrs):
+    # Header (title), the asked/modified/viewed stats row and the main column with the
+    # question and its answers; skips navigation, sidebars and footer.
+    return attrs.get('id') in ('question-header', 'mainbar') or (name == 'div' and _has_class(attrs, 'ws-nowrap'))
+
+
+# Page regions a scraper can restrict parsing to. Everything outside a region is
+# skipped by the tree builder instead of being built and then ignored.
+REGIONS = {
+    'question': SoupStrainer(_question_region),
+    'answers': SoupStrainer(lambda name, attrs: attrs.get('id') == 'answers'),
+    'summaries': SoupStrainer(lambda name, attrs: name == 'div' and _has_class(attrs, 's-post-summary')),
+    'listing_total': SoupStrainer(lambda name, attrs: name == 'div' and _has_class(attrs, 'fs-body3')),
+    'profile': SoupStrainer('script'),
+    'timeline': SoupStrainer(lambda name, attrs: name == 'span' and _has_class(attrs, 'relativetime')),
+    'collectives': SoupStrainer(lambda name, attrs: name == 'div' and _has_class(attrs, 's-card')),
+    'collective_tags': SoupStrainer(
+        lambda name, attrs: name == 'a' and (_has_class(attrs, 's-tag') or 'next' in (attrs.get('rel') or '').split())
+    ),
+    'collective_links': SoupStrainer(lambda name, attrs: name == 'a' and attrs.get('target') == '_blank'),
+}
+
+
+def parse_html(markup, region=None):
+    """
+    Parse HTML with the fastest available tree builder (lxml, else html.parser).
+    When `region` names an entry of REGIONS only that part of the page is built.
+    """
+    parse_only = REGIONS[region] if region else None
+    try:
+        return BeautifulSoup(markup, HTML_PARSER, parse_only=parse_only)
+    except Exception as e:
+        if HTML_PARSER == 'html.parser':
+            raise
+        logger.warning(f"{HTML_PARSER} failed to parse page ({e}), falling back to html.parser.")
+        return BeautifulSoup(markup, 'html.parser', parse_only=parse_only)
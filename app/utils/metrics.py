@@ -0,0 +1,301 @@
+"""
+Process metrics in the Prometheus text format, and the upstream cost of the API request
+being served. Upstream fetches, retries and parse time are counted both globally and
+against the current request's RequestCost, which follows the request onto the scraping
+engine loop through a context variable.
+"""
+import re
+import time
+import bisect
+import logging
+import threading
+import functools
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_MIMETYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PARSE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+FETCHES_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250)
+
+# Upstream URL patterns used as the `pattern` label. The first matching pattern wins.
+URL_PATTERNS = [
+    ('user_profile', re.compile(r"/users/\d+")),
+    ('timeline', re.compile(r"/posts/\d+/timeline")),
+    ('collective_tags', re.compile(r"/collectives/[^/?]+\?(.*&)?tab=tags")),
+    ('collective', re.compile(r"/collectives/[^/?]+")),
+    ('collectives', re.compile(r"/collectives-all")),
+    ('question_page', re.compile(r"/(questions|a)/\d+")),
+    ('listing', re.compile(r"/questions")),
+]
+
+
+def url_pattern(url):
+    """Return the name of the URL pattern `url` belongs to, for low-cardinality labels."""
+    for name, pattern in URL_PATTERNS:
+        if pattern.search(url):
+            return name
+    return 'other'
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, labels, (), value) for labels, value in sorted(self._values.items())]
+
+
+class Histogram:
+    """Cumulative histogram with optional labels, exposed as _bucket, _sum and _count series."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            values = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._values.items())
+        for labels, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", labels, (('le', _format_value(bound)),), cumulative))
+            samples.append((f"{self.name}_sum", labels, (), total))
+            samples.append((f"{self.name}_count", labels, (), cumulative))
+        return samples
+
+
+class Registry:
+    """The metrics of the process plus caches whose hit ratios are read at collection time."""
+
+    def __init__(self):
+        self.metrics = []
+        self.caches = {}
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def register_cache(self, name, stats):
+        """Expose the hits and misses of a cache. `stats()` returns a dict with 'hits' and 'misses'."""
+        self.caches[name] = stats
+
+    def _cache_lines(self):
+        rows = []
+        for name, stats in sorted(self.caches.items()):
+            try:
+                current = stats()
+            except Exception as e:
+                logger.error(f"Failed to collect stats of cache {name}: {e}")
+                continue
+            if current is not None:
+                rows.append((name, current['hits'], current['misses']))
+
+        lines = []
+        for metric, documentation, kind, value in (
+            ('stackoverflow_cache_hits_total', 'Lookups served from the cache.', 'counter', lambda h, m: h),
+            ('stackoverflow_cache_misses_total', 'Lookups the cache could not serve.', 'counter', lambda h, m: m),
+            ('stackoverflow_cache_hit_ratio', 'Share of lookups served from the cache.', 'gauge',
+             lambda h, m: h / (h + m) if h + m else 0.0),
+        ):
+            lines += [f"# HELP {metric} {documentation}", f"# TYPE {metric} {kind}"]
+            lines += [f"{metric}{{cache=\"{name}\"}} {_format_value(value(hits, misses))}" for name, hits, misses in rows]
+        return lines
+
+    def expose(self):
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            lines += [f"# HELP {metric.name} {metric.documentation}", f"# TYPE {metric.name} {metric.kind}"]
+            for name, labels, extra, value in metric.samples():
+                lines.append(f"{name}{_format_labels(metric.labelnames, labels, extra)} {_format_value(value)}")
+        lines += self._cache_lines()
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+upstream_latency = registry.register(Histogram(
+    'stackoverflow_upstream_request_seconds', 'Latency of upstream requests, per attempt.', ('pattern',)
+))
+upstream_responses = registry.register(Counter(
+    'stackoverflow_upstream_responses_total', 'Upstream attempts by response status, or timeout/error.', ('pattern', 'status')
+))
+upstream_retries = registry.register(Counter(
+    'stackoverflow_upstream_retries_total', 'Upstream attempts after the first one.', ('pattern',)
+))
+upstream_backoff = registry.register(Counter(
+    'stackoverflow_upstream_backoff_seconds_total', 'Seconds spent sleeping between upstream attempts.', ('pattern',)
+))
+upstream_shed = registry.register(Counter(
+    'stackoverflow_upstream_shed_total', 'Upstream requests not sent, by reason: negative_cache, circuit_open, retry_budget or deadline.',
+    ('pattern', 'reason')
+))
+rate_limit_wait = registry.register(Counter(
+    'stackoverflow_rate_limit_wait_seconds_total', 'Seconds spent waiting for the upstream rate limiter.', ('pattern',)
+))
+parse_latency = registry.register(Histogram(
+    'stackoverflow_parse_seconds', 'Time spent parsing upstream pages, per scraper function.', ('scraper',), PARSE_BUCKETS
+))
+api_requests = registry.register(Histogram(
+    'stackoverflow_api_request_seconds', 'Latency of API requests until the response starts.', ('endpoint', 'status')
+))
+api_upstream_fetches = registry.register(Histogram(
+    'stackoverflow_api_upstream_fetches', 'Upstream requests made while serving one API request.', ('endpoint',), FETCHES_BUCKETS
+))
+
+
+class RequestCost:
+    """What one API request cost upstream: requests sent, pages served from cache, retries and time."""
+
+    FIELDS = ('fetches', 'cache_hits', 'revalidations', 'retries', 'backoff_seconds', 'upstream_seconds', 'parse_seconds')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._amounts = dict.fromkeys(self.FIELDS, 0)
+        self._lock = threading.Lock()
+
+    def add(self, **amounts):
+        with self._lock:
+            for field, amount in amounts.items():
+                self._amounts[field] += amount
+
+    def __getitem__(self, field):
+        with self._lock:
+            return self._amounts[field]
+
+    def header(self):
+        """Render the cost as a header value, with times in milliseconds."""
+        with self._lock:
+            amounts = dict(self._amounts)
+        parts = []
+        for field in self.FIELDS:
+            if field.endswith('_seconds'):
+                parts.append(f"{field[:-len('_seconds')]}_ms={amounts[field] * 1000:.0f}")
+            else:
+                parts.append(f"{field}={amounts[field]}")
+        return '; '.join(parts)
+
+
+request_cost = ContextVar('request_cost', default=None)
+
+
+def start_request_cost():
+    """Start accounting upstream cost against a new RequestCost in the current context."""
+    cost = RequestCost()
+    request_cost.set(cost)
+    return cost
+
+
+def add_request_cost(**amounts):
+    cost = request_cost.get()
+    if cost is not None:
+        cost.add(**amounts)
+
+
+async def without_request_cost(coro):
+    """Await `coro` without charging its upstream cost to the current request, e.g. for background refreshes."""
+    request_cost.set(None)
+    return await coro
+
+
+def observe_upstream_attempt(url, status, seconds):
+    """Record one upstream attempt; `status` is the HTTP status code, 'timeout' or 'error'."""
+    pattern = url_pattern(url)
+    upstream_latency.observe(seconds, pattern=pattern)
+    upstream_responses.inc(pattern=pattern, status=status)
+    add_request_cost(fetches=1, upstream_seconds=seconds, revalidations=1 if status == 304 else 0)
+
+
+def observe_backoff(url, seconds, retry=False):
+    """Record a sleep between attempts; `retry` marks the sleep right before a new attempt."""
+    pattern = url_pattern(url)
+    upstream_backoff.inc(seconds, pattern=pattern)
+    if retry:
+        upstream_retries.inc(pattern=pattern)
+    add_request_cost(backoff_seconds=seconds, retries=1 if retry else 0)
+
+
+def observe_shed(url, reason):
+    """Record an upstream request that was not sent, or a retry that was given up, and why."""
+    upstream_shed.inc(pattern=url_pattern(url), reason=reason)
+
+
+def observe_rate_limit_wait(url, seconds):
+    if seconds > 0:
+        rate_limit_wait.inc(seconds, pattern=url_pattern(url))
+
+
+def observe_cache_hit():
+    """Record a page served from the page cache without an upstream request."""
+    add_request_cost(cache_hits=1)
+
+
+def observe_parse(scraper, seconds):
+    parse_latency.observe(seconds, scraper=scraper)
+    add_request_cost(parse_seconds=seconds)
+
+
+def timed_parse(scraper):
+    """Decorator that records the run time of a parse function under `scraper`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe_parse(scraper, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def observe_api_request(endpoint, status, cost):
+    api_requests.observe(time.perf_counter() - cost.started, endpoint=endpoint, status=status)
+    api_upstream_fetches.observe(cost['fetches'], endpoint=endpoint)
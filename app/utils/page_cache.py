@@ -0,0 +1,200 @@
+import os
+import re
+import gzip
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+
+from app.utils.cache import TTLCache
+from app.utils.metrics import registry
+from app.utils.shared_cache import shared_namespace
+
+logger = logging.getLogger(__name__)
+
+PAGE_CACHE_ENABLED = os.environ.get("STACKOVERFLOW_PAGE_CACHE_ENABLED", "1") == "1"
+PAGE_CACHE_SIZE = int(os.environ.get("STACKOVERFLOW_PAGE_CACHE_SIZE", 512))
+PAGE_CACHE_DIR = os.environ.get("STACKOVERFLOW_PAGE_CACHE_DIR")
+
+# Seconds an upstream page stays fresh, by URL pattern. The first matching pattern wins.
+PAGE_TTLS = [
+    (re.compile(r"/users/\d+"), 24 * 3600),
+    (re.compile(r"/collectives"), 3600),
+    (re.compile(r"/posts/\d+/timeline"), 300),
+    (re.compile(r"/(questions|a)/\d+"), 300),
+    (re.compile(r"/questions"), 60),
+]
+DEFAULT_PAGE_TTL = 60
+
+
+def page_ttl(url):
+    """Return how many seconds a cached copy of `url` stays fresh."""
+    for pattern, ttl in PAGE_TTLS:
+        if pattern.search(url):
+            return ttl
+    return DEFAULT_PAGE_TTL
+
+
+class UpstreamResponse:
+    """A fetched page, whether it came from the upstream, the page cache or the transport archive."""
+
+    def __init__(self, url, status_code, text, headers=None):
+        self.url = url
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+
+class CacheEntry:
+    def __init__(self, url, text, etag=None, last_modified=None, fetched_at=None):
+        self.url = url
+        self.text = text
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at if fetched_at is not None else time.time()
+
+    def is_fresh(self):
+        return time.time() - self.fetched_at <= page_ttl(self.url)
+
+    def revalidation_headers(self):
+        """Conditional request headers that let upstream answer 304 Not Modified."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def to_response(self):
+        return UpstreamResponse(self.url, 200, self.text)
+
+    def to_dict(self):
+        return {
+            'url': self.url,
+            'text': self.text,
+            'etag': self.etag,
+            'last_modified': self.last_modified,
+            'fetched_at': self.fetched_at
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['url'], data['text'], data.get('etag'), data.get('last_modified'), data.get('fetched_at'))
+
+
+class PageCache:
+    """
+    Tiered cache of upstream HTML keyed by URL: a bounded in-memory LRU in front of the
+    cache shared with the other workers, when configured, and optional gzip-compressed
+    files on disk.
+    """
+
+    def __init__(self, maxsize=PAGE_CACHE_SIZE, directory=None, shared=None):
+        self.memory = TTLCache(maxsize=maxsize)
+        self.directory = directory
+        self.shared = shared
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url):
+        return os.path.join(self.directory, hashlib.sha256(url.encode('utf-8')).hexdigest() + '.json.gz')
+
+    def _read_disk(self, url):
+        try:
+            with gzip.open(self._path(url), 'rt', encoding='utf-8') as f:
+                return CacheEntry.from_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Discarding unreadable page cache file for {url}: {e}")
+            return None
+
+    def _write_disk(self, entry):
+        path = self._path(entry.url)
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb') as f:
+                f.write(json.dumps(entry.to_dict()).encode('utf-8'))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Failed to write page cache file for {entry.url}: {e}")
+
+    def _read_shared(self, url):
+        persisted = self.shared.get(url)
+        if persisted is None:
+            return None
+        try:
+            return CacheEntry.from_dict(persisted[0])
+        except (KeyError, TypeError) as e:
+            logger.warning(f"Discarding unreadable shared page cache entry for {url}: {e}")
+            return None
+
+    def _write_shared(self, entry):
+        self.shared.set(entry.url, entry.to_dict(), entry.fetched_at)
+
+    def get(self, url):
+        """
+        Return the cached entry for `url`, fresh or stale, or None. A stale entry is
+        replaced by a newer copy another worker stored in the shared cache.
+        """
+        entry = self.memory.get(url)
+        if self.shared is not None and (entry is None or not entry.is_fresh()):
+            shared_entry = self._read_shared(url)
+            if shared_entry is not None and (entry is None or shared_entry.fetched_at > entry.fetched_at):
+                entry = shared_entry
+                self.memory.set(url, entry)
+        if entry is None and self.directory:
+            entry = self._read_disk(url)
+            if entry is not None:
+                self.memory.set(url, entry)
+        return entry
+
+    def set(self, url, response):
+        """Store a successful upstream response."""
+        entry = CacheEntry(url, response.text, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        self.memory.set(url, entry)
+        if self.shared is not None:
+            self._write_shared(entry)
+        if self.directory:
+            self._write_disk(entry)
+        return entry
+
+    def touch(self, entry):
+        """Mark a stale entry fresh again after upstream confirmed it is unchanged."""
+        entry.fetched_at = time.time()
+        self.memory.set(entry.url, entry)
+        if self.shared is not None:
+            self._write_shared(entry)
+        if self.directory:
+            self._write_disk(entry)
+        with self._lock:
+            self.revalidations += 1
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'revalidations': self.revalidations,
+                'hit_ratio': self.hits / total if total else 0.0,
+                'size': self.memory.stats()['size']
+            }
+
+
+page_cache = PageCache(directory=PAGE_CACHE_DIR, shared=shared_namespace('page')) if PAGE_CACHE_ENABLED else None
+if page_cache is not None:
+    registry.register_cache('page', page_cache.stats)
@@ -1,10 +1,33 @@
 import re
 import logging
+from functools import lru_cache
 from datetime import datetime, timezone
 
 logger = logging.getLogger(__name__)
 
+# Distinct strings remembered per parser. Dates and abbreviated numbers repeat heavily
+# across a page (the same comment dates, reputations and view counts).
+PARSE_CACHE_SIZE = 8192
 
+# The `title` timestamps Stack Overflow puts on dates: "2024-05-01 06:00:00Z", optionally
+# with fractional seconds and trailing text such as ", License: CC BY-SA 4.0"
+DATE_PREFIX = re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z)?")
+
+# ISO-8601 timestamps with either separator, split into their fields.
+ISO_DATE = re.compile(r"(\d{4})-(\d{2})-(\d{2})([ T])(\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,6}))?(Z?)", re.ASCII)
+
+DATE_FORMATS = [
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d %H:%M:%S.%fZ',
+    '%Y-%m-%d %H:%M:%S.%f',
+    '%Y-%m-%d %H:%M:%SZ',
+    '%Y-%m-%dT%H:%M:%S.%f',
+    '%b %d, %Y at %H:%M',
+]
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
 def parse_reputation(reputation_str):
     """Parse reputation string (e.g., '10k', '1.5M') into an integer."""
     try:
@@ -19,24 +42,52 @@ def parse_reputation(reputation_str):
         return 0
 
 
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
 def parse_date(date_str):
     """Parse a date string into a Unix timestamp."""
+    timestamp = _parse_iso_date(date_str) if isinstance(date_str, str) else None
+    if timestamp is not None:
+        return timestamp
+    return _parse_date_formats(date_str)
+
+
+def _parse_iso_date(date_str):
+    """
+    Fast path for ISO-8601 timestamps: build the datetime from the matched fields instead
+    of trying each strptime format. Returns None whenever the strptime formats have to
+    decide, so results always match _parse_date_formats.
+    """
+    match = ISO_DATE.match(date_str)
+    if match is None:
+        return None
+    year, month, day, separator, hour, minute, second, fraction, utc = match.groups()
+
+    # Space-separated dates are cut after the timestamp; 'T'-separated ones must be the whole string, without Z
+    if separator == 'T' and (utc or match.end() != len(date_str)):
+        return None
+    if separator == ' ' and DATE_PREFIX.match(date_str).end() != match.end():
+        return None
+
+    try:
+        dt = datetime(
+            int(year), int(month), int(day), int(hour), int(minute), int(second),
+            int(fraction.ljust(6, '0')) if fraction else 0
+        )
+        if utc:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return int(dt.timestamp())
+    except ValueError:
+        return None
+
+
+def _parse_date_formats(date_str):
+    """Parse a date string by trying each known strptime format."""
     # Remove any extra text after the actual date using regex
-    match = re.match(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z)?", date_str)
+    match = DATE_PREFIX.match(date_str)
     if match:
         date_str = match.group(0)
-    
-    date_formats = [
-        '%Y-%m-%dT%H:%M:%S',
-        '%Y-%m-%d %H:%M:%S',
-        '%Y-%m-%d %H:%M:%S.%fZ',
-        '%Y-%m-%d %H:%M:%S.%f',
-        '%Y-%m-%d %H:%M:%SZ',
-        '%Y-%m-%dT%H:%M:%S.%f',
-        '%b %d, %Y at %H:%M',
-    ]
-    
-    for fmt in date_formats:
+
+    for fmt in DATE_FORMATS:
         try:
             dt = datetime.strptime(date_str, fmt)
             if 'Z' in date_str or fmt.endswith('Z'):
@@ -44,15 +95,16 @@ def parse_date(date_str):
             return int(dt.timestamp())
         except (ValueError, TypeError):
             continue
-    
+
     logger.debug(f"Date parsing error: No matching format for date string: {date_str}")
     return None
 
 
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
 def parse_view_count(view_count_str):
     """Parse a view count string (e.g., '691k') into an integer."""
     view_count_str = view_count_str.lower().replace('viewed', '').strip()
-    
+
     if not view_count_str:
         logger.warning("View count string is empty, defaulting to 0.")
         return 0
@@ -0,0 +1,57 @@
+import os
+import time
+import threading
+import logging
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+REQUESTS_PER_SECOND = float(os.environ.get("STACKOVERFLOW_REQUESTS_PER_SECOND", 4))
+BURST = int(os.environ.get("STACKOVERFLOW_REQUEST_BURST", 8))
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at `rate` tokens per second up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def reserve(self):
+        """Take a token and return how many seconds the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def available(self):
+        """Return the number of tokens currently in the bucket."""
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_host_limiter(url):
+    """Return the shared token bucket for the host of `url`."""
+    host = urlsplit(url).netloc
+    with _buckets_lock:
+        bucket = _buckets.get(host)
+        if bucket is None:
+            bucket = TokenBucket(REQUESTS_PER_SECOND, BURST)
+            _buckets[host] = bucket
+    return bucket
@@ -0,0 +1,232 @@
+"""
+Failure handling shared by both request handlers. Failed upstream calls are classified:
+permanent failures (404 for a deleted question, other 4xx) fail fast and are
+negative-cached, throttled (429) and transient (5xx, timeouts) ones are retried. Retries
+draw from a process-wide budget, honor Retry-After in place of blind backoff, and a
+per-host circuit breaker sheds calls while the host keeps throttling or failing.
+"""
+import os
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+from app.utils.cache import TTLCache
+from app.utils.metrics import registry, observe_shed
+from app.utils.rate_limiter import TokenBucket
+from app.utils.shared_cache import shared_namespace
+
+logger = logging.getLogger(__name__)
+
+NEGATIVE_CACHE_SIZE = int(os.environ.get("STACKOVERFLOW_NEGATIVE_CACHE_SIZE", 10000))
+NEGATIVE_CACHE_TTL = int(os.environ.get("STACKOVERFLOW_NEGATIVE_CACHE_TTL", 600))
+RETRY_BUDGET_RATIO = float(os.environ.get("STACKOVERFLOW_RETRY_BUDGET_RATIO", 0.2))
+RETRY_BUDGET_MIN = float(os.environ.get("STACKOVERFLOW_RETRY_BUDGET_MIN", 1))
+BREAKER_THRESHOLD = int(os.environ.get("STACKOVERFLOW_BREAKER_THRESHOLD", 10))
+BREAKER_COOLDOWN = float(os.environ.get("STACKOVERFLOW_BREAKER_COOLDOWN", 30))
+MAX_BACKOFF = float(os.environ.get("STACKOVERFLOW_MAX_BACKOFF", 30))
+MAX_RETRY_AFTER = float(os.environ.get("STACKOVERFLOW_MAX_RETRY_AFTER", 60))
+
+PERMANENT = 'permanent'
+THROTTLED = 'throttled'
+TRANSIENT = 'transient'
+
+# Retries the budget holds when idle, so a quiet process can still retry a short burst of failures.
+RETRY_BUDGET_CAPACITY = 20
+
+
+def classify_status(status):
+    """Classify a failed response status as PERMANENT, THROTTLED or TRANSIENT."""
+    if status == 429:
+        return THROTTLED
+    if status == 408 or status >= 500:
+        return TRANSIENT
+    if 400 <= status < 500:
+        return PERMANENT
+    return TRANSIENT
+
+
+def parse_retry_after(value):
+    """Return the seconds a Retry-After header (delta-seconds or HTTP-date) asks to wait, or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        logger.debug(f"Ignoring malformed Retry-After header: {value}")
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryBudget(TokenBucket):
+    """
+    Process-wide allowance of retries. Every first attempt deposits `ratio` of a retry and
+    `min_per_second` retries accrue regardless, so retries stay a bounded share of the
+    upstream traffic however many calls fail at once.
+    """
+
+    def __init__(self, ratio, min_per_second, capacity=RETRY_BUDGET_CAPACITY):
+        super().__init__(min_per_second, capacity)
+        self.ratio = ratio
+
+    def deposit(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens + self.ratio)
+
+    def try_withdraw(self):
+        """Take one retry from the budget, or return False when it is spent."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class CircuitBreaker:
+    """
+    Per-host breaker. It opens after `threshold` consecutive throttled or transient failures
+    and rejects calls until the cooldown, or a longer Retry-After of the last failure, has
+    passed. Then one probe call is let through: success closes the breaker, failure opens
+    it again.
+    """
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.open_until = None
+        self._probe_started = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.open_until is None:
+                return 'closed'
+            return 'open' if time.monotonic() < self.open_until else 'half-open'
+
+    def allow(self):
+        """Whether a call may be sent now. While half-open, only one probe is in flight at a time."""
+        with self._lock:
+            if self.open_until is None:
+                return True
+            now = time.monotonic()
+            if now < self.open_until:
+                return False
+            # A probe that never reported back stops blocking after one cooldown
+            if self._probe_started is not None and now - self._probe_started < self.cooldown:
+                return False
+            self._probe_started = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self.open_until is not None:
+                logger.info("Upstream recovered, closing the circuit breaker.")
+            self.failures = 0
+            self.open_until = None
+            self._probe_started = None
+
+    def record_failure(self, retry_after=None):
+        with self._lock:
+            self.failures += 1
+            self._probe_started = None
+            probing = self.open_until is not None
+            if probing or self.failures >= self.threshold:
+                open_for = max(self.cooldown, retry_after or 0.0)
+                self.open_until = time.monotonic() + open_for
+                logger.warning(f"Opening the circuit breaker for {open_for:.1f} seconds after {self.failures} failures.")
+
+
+# url -> status of a permanent failure
+negative_cache = TTLCache(
+    maxsize=NEGATIVE_CACHE_SIZE, ttl=NEGATIVE_CACHE_TTL, persistence=shared_namespace('negative', NEGATIVE_CACHE_TTL)
+)
+registry.register_cache('negative', negative_cache.stats)
+
+retry_budget = RetryBudget(RETRY_BUDGET_RATIO, RETRY_BUDGET_MIN)
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_host_breaker(url):
+    """Return the shared circuit breaker for the host of `url`."""
+    host = urlsplit(url).netloc
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker()
+            _breakers[host] = breaker
+    return breaker
+
+
+def known_failure(url):
+    """Return the status of a recent permanent failure of `url`, or None."""
+    status = negative_cache.get(url)
+    if status is not None:
+        logger.debug(f"{url} failed with {status} recently, not fetching it again.")
+        observe_shed(url, 'negative_cache')
+    return status
+
+
+def allow_attempt(url, breaker):
+    """Whether the breaker of the host lets an attempt at `url` through; records the call as shed if not."""
+    if breaker.allow():
+        return True
+    logger.warning(f"Circuit breaker for {url} is open, not sending the request.")
+    observe_shed(url, 'circuit_open')
+    return False
+
+
+def record_failure(url, breaker, status=None, retry_after=None, use_cache=True):
+    """
+    Record a failed attempt, with `status` None for a timeout or connection error, and
+    return whether it is worth retrying.
+    """
+    failure = TRANSIENT if status is None else classify_status(status)
+    if failure == PERMANENT:
+        # The host answered; only this URL is gone
+        breaker.record_success()
+        if use_cache:
+            negative_cache.set(url, status)
+        logger.warning(f"{url} failed permanently with status {status}, not retrying.")
+        return False
+    breaker.record_failure(retry_after if failure == THROTTLED else None)
+    if breaker.state == 'open':
+        logger.warning(f"Circuit breaker for {url} opened, not retrying.")
+        observe_shed(url, 'circuit_open')
+        return False
+    return True
+
+
+def retry_delay(url, attempt, backoff_factor, retry_after=None):
+    """
+    Return the seconds to wait before retrying after failed attempt number `attempt`, or
+    None to give up: when Retry-After asks for more than MAX_RETRY_AFTER seconds or the
+    retry budget is spent.
+    """
+    if retry_after is not None:
+        if retry_after > MAX_RETRY_AFTER:
+            logger.warning(f"{url} asked to retry after {retry_after:.0f} seconds, giving up instead.")
+            return None
+        delay = retry_after
+    else:
+        # Exponential backoff with jitter
+        delay = min(MAX_BACKOFF, backoff_factor * (2 ** attempt)) + random.uniform(0, 1)
+
+    if not retry_budget.try_withdraw():
+        logger.warning(f"Retry budget exhausted, not retrying {url}.")
+        observe_shed(url, 'retry_budget')
+        return None
+    return delay
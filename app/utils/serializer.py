@@ -0,0 +1,171 @@
+"""
+Slotted records and the JSON serializer for API responses. A Record reads and writes
+like the dict it replaces (`question['owner']['user_id'] = ...`) but keeps its fields
+in slots, and remembers its encoded JSON until one of its fields is assigned again.
+encode_json produces the same text as Flask's jsonify: compact, ASCII-only and with
+sorted keys.
+"""
+from collections.abc import Mapping, MutableMapping
+from json.encoder import JSONEncoder, encode_basestring_ascii
+
+_MISSING = object()
+
+SCALAR_TYPES = frozenset((str, int, float, bool, type(None)))
+
+_encoder = JSONEncoder(sort_keys=True, separators=(',', ':'))
+
+
+def _is_constant(value):
+    """Whether the JSON of `value` can be kept: scalars, and lists of scalars such as tags."""
+    cls = value.__class__
+    if cls in SCALAR_TYPES:
+        return True
+    if cls is list or cls is tuple:
+        return all(item.__class__ in SCALAR_TYPES for item in value)
+    return False
+
+
+class Record(MutableMapping):
+    """
+    Base class of the slotted record types. FIELDS are always present and default to
+    DEFAULTS or None; OPTIONAL fields are only present once assigned. Lists of scalars
+    are encoded along with the record, so assign a new list rather than changing one
+    in place.
+    """
+
+    __slots__ = ('_json',)
+
+    FIELDS = ()
+    OPTIONAL = ()
+    DEFAULTS = {}
+    _KEYS = frozenset()
+    _PREFIXES = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._KEYS = frozenset(cls.FIELDS + cls.OPTIONAL)
+        cls._PREFIXES = tuple((name, encode_basestring_ascii(name) + ':') for name in sorted(cls._KEYS))
+
+    def __init__(self, **values):
+        for name in self.FIELDS:
+            object.__setattr__(self, name, values.pop(name, self.DEFAULTS.get(name)))
+        for name, value in values.items():
+            if name not in self.OPTIONAL:
+                raise TypeError(f"{type(self).__name__} has no field {name!r}")
+            object.__setattr__(self, name, value)
+        object.__setattr__(self, '_json', None)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a record from a decoded JSON object, ignoring keys that are not fields."""
+        return cls(**{key: value for key, value in data.items() if key in cls._KEYS})
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        object.__setattr__(self, '_json', None)
+
+    def __delattr__(self, name):
+        object.__delattr__(self, name)
+        object.__setattr__(self, '_json', None)
+
+    def __getitem__(self, key):
+        if key in self._KEYS:
+            value = getattr(self, key, _MISSING)
+            if value is not _MISSING:
+                return value
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key in self._KEYS:
+            return getattr(self, key, default)
+        return default
+
+    def __setitem__(self, key, value):
+        if key not in self._KEYS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __delitem__(self, key):
+        if key not in self._KEYS or getattr(self, key, _MISSING) is _MISSING:
+            raise KeyError(key)
+        delattr(self, key)
+
+    def __contains__(self, key):
+        return key in self._KEYS and getattr(self, key, _MISSING) is not _MISSING
+
+    def __iter__(self):
+        return (name for name in self.FIELDS + self.OPTIONAL if getattr(self, name, _MISSING) is not _MISSING)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)!r})"
+
+    def _encode_parts(self):
+        """
+        Encode the record into text parts, leaving nested records and containers as values
+        to encode on every call, so changes to them are never hidden by this record's cache.
+        Runs of constant fields are encoded together by the C encoder.
+        """
+        parts = []
+        text = '{'
+        constant = {}
+        for name, prefix in self._PREFIXES:
+            value = getattr(self, name, _MISSING)
+            if value is _MISSING:
+                continue
+            if _is_constant(value):
+                constant[name] = value
+                continue
+            if constant:
+                text += _encoder.encode(constant)[1:-1] + ','
+                constant = {}
+            parts += [text + prefix, value]
+            text = ','
+        if constant:
+            text += _encoder.encode(constant)[1:-1]
+        elif text == ',':
+            text = ''
+        parts.append(text + '}')
+        return parts
+
+    def to_json(self):
+        """Return the JSON of the record, reusing the cached encoding of unchanged fields."""
+        parts = self._json
+        if parts is None:
+            parts = self._encode_parts()
+            object.__setattr__(self, '_json', parts)
+        if len(parts) == 1:
+            return parts[0]
+        return ''.join(part if part.__class__ is str else encode_json(part) for part in parts)
+
+
+def pre_encode(records):
+    """Encode finished records ahead of the response, which then only joins their cached JSON."""
+    for record in records:
+        record.to_json()
+
+
+def encode_json(value):
+    """Encode `value` exactly as jsonify would, reusing the cached JSON of records."""
+    cls = value.__class__
+    if cls is str:
+        return encode_basestring_ascii(value)
+    if value is None:
+        return 'null'
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    if cls is int:
+        return int.__repr__(value)
+    if isinstance(value, Record):
+        return value.to_json()
+    if cls is list or cls is tuple:
+        return '[' + ','.join([encode_json(item) for item in value]) + ']'
+    if isinstance(value, Mapping) and all(key.__class__ is str for key in value):
+        return '{' + ','.join([
+            f"{encode_basestring_ascii(key)}:{encode_json(value[key])}" for key in sorted(value)
+        ]) + '}'
+    return _encoder.encode(value)
@@ -0,0 +1,231 @@
+"""
+Cache shared by every worker process on a node. Entries live in one SQLite file in WAL
+mode, so readers never block the writer and each write is one atomic transaction.
+The in-process caches (pages, user identities, timelines, failed URLs, collectives)
+keep their memory tier and fall back to this store on a miss, so a page fetched by one
+worker is a hit in every other one, including workers started after it. The file is
+bounded in size: once it grows past its limit, expired and then least recently used
+entries are evicted.
+"""
+import os
+import json
+import time
+import zlib
+import sqlite3
+import logging
+import threading
+
+from app.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+SHARED_CACHE_PATH = os.environ.get("STACKOVERFLOW_SHARED_CACHE_PATH")
+SHARED_CACHE_SIZE_MB = int(os.environ.get("STACKOVERFLOW_SHARED_CACHE_SIZE_MB", 256))
+
+COMPRESSION_LEVEL = 3
+# Eviction brings the store down to this fraction of its limit, so it does not run on every write
+EVICTION_TARGET = 0.9
+EVICTION_BATCH = 100
+# Reads refresh an entry's access time at most this often, to keep most reads free of writes
+ACCESS_GRANULARITY = 60
+BUSY_TIMEOUT_MS = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    expires_at REAL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta (name, value) VALUES ('bytes', 0);
+"""
+
+
+class SharedCache:
+    """
+    Size-bounded key/value store in a SQLite file that several processes use at once.
+    Values are JSON, compressed with zlib, and grouped into namespaces, one per cache.
+    Each process and thread opens its own connection, since connections must not cross
+    a fork.
+    """
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connect()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        conn.executescript(SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        logger.debug(f"Opened shared cache {self.path} in process {os.getpid()}.")
+        return conn
+
+    def _record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, namespace, key):
+        """Return `(value, stored_at)` for `key` in `namespace`, or None when missing or expired."""
+        now = time.time()
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, stored_at, expires_at, accessed_at FROM entries WHERE namespace = ? AND key = ?",
+                (namespace, str(key))
+            ).fetchone()
+            if row is None or (row[2] is not None and row[2] <= now):
+                self._record(hit=False)
+                return None
+            if now - row[3] > ACCESS_GRANULARITY:
+                conn.execute(
+                    "UPDATE entries SET accessed_at = ? WHERE namespace = ? AND key = ?", (now, namespace, str(key))
+                )
+            value = json.loads(zlib.decompress(row[0]))
+        except (sqlite3.Error, zlib.error, ValueError) as e:
+            logger.warning(f"Shared cache read of {namespace}/{key} failed: {e}")
+            self._record(hit=False)
+            return None
+        self._record(hit=True)
+        return value, row[1]
+
+    def set(self, namespace, key, value, stored_at=None, ttl=None):
+        """Store `value` under `key` in one transaction, evicting old entries if the store grows past its limit."""
+        now = time.time()
+        stored_at = stored_at if stored_at is not None else now
+        data = zlib.compress(json.dumps(value).encode('utf-8'), COMPRESSION_LEVEL)
+        expires_at = stored_at + ttl if ttl is not None else None
+        try:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                old = conn.execute(
+                    "SELECT size FROM entries WHERE namespace = ? AND key = ?", (namespace, str(key))
+                ).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (namespace, key, value, size, stored_at, expires_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (namespace, str(key), data, len(data), stored_at, expires_at, now)
+                )
+                conn.execute(
+                    "UPDATE meta SET value = value + ? WHERE name = 'bytes'", (len(data) - (old[0] if old else 0),)
+                )
+                total = conn.execute("SELECT value FROM meta WHERE name = 'bytes'").fetchone()[0]
+                if total > self.max_bytes:
+                    self._evict(conn, total, now)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            logger.error(f"Shared cache write of {namespace}/{key} failed: {e}")
+
+    def _evict(self, conn, total, now):
+        """Delete expired entries, then the least recently used ones, until the store is under its eviction target."""
+        target = self.max_bytes * EVICTION_TARGET
+        evicted = 0
+        while total > target:
+            rows = conn.execute(
+                "SELECT namespace, key, size FROM entries "
+                "ORDER BY COALESCE(expires_at, ?) > ?, accessed_at LIMIT ?",
+                (now + 1, now, EVICTION_BATCH)
+            ).fetchall()
+            if not rows:
+                break
+            conn.executemany("DELETE FROM entries WHERE namespace = ? AND key = ?", [(row[0], row[1]) for row in rows])
+            freed = sum(row[2] for row in rows)
+            conn.execute("UPDATE meta SET value = value - ? WHERE name = 'bytes'", (freed,))
+            total -= freed
+            evicted += len(rows)
+        with self._lock:
+            self.evictions += evicted
+        logger.debug(f"Evicted {evicted} entries from the shared cache, {total} bytes left.")
+
+    def delete(self, namespace, key):
+        try:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                old = conn.execute(
+                    "SELECT size FROM entries WHERE namespace = ? AND key = ?", (namespace, str(key))
+                ).fetchone()
+                if old is not None:
+                    conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, str(key)))
+                    conn.execute("UPDATE meta SET value = value - ? WHERE name = 'bytes'", (old[0],))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            logger.error(f"Shared cache delete of {namespace}/{key} failed: {e}")
+
+    def stats(self):
+        """Return this process's hit/miss counters, and the entries and bytes in the store."""
+        try:
+            conn = self._connect()
+            entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            size = conn.execute("SELECT value FROM meta WHERE name = 'bytes'").fetchone()[0]
+        except sqlite3.Error:
+            entries = size = None
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+                'evictions': self.evictions,
+                'size': entries,
+                'bytes': size,
+                'max_bytes': self.max_bytes
+            }
+
+
+class SharedNamespace:
+    """One cache's view of the shared store, usable as the `persistence` of a TTLCache or DatasetCache."""
+
+    def __init__(self, cache, namespace, ttl=None):
+        self.cache = cache
+        self.namespace = namespace
+        self.ttl = ttl
+
+    def get(self, key):
+        """Return `(value, stored_at)` for `key`, or None."""
+        return self.cache.get(self.namespace, key)
+
+    def set(self, key, value, stored_at):
+        self.cache.set(self.namespace, key, value, stored_at, self.ttl)
+
+    def delete(self, key):
+        self.cache.delete(self.namespace, key)
+
+
+shared_cache = SharedCache(SHARED_CACHE_PATH, SHARED_CACHE_SIZE_MB * 1024 * 1024) if SHARED_CACHE_PATH else None
+if shared_cache is not None:
+    registry.register_cache('shared', shared_cache.stats)
+
+
+def shared_namespace(namespace, ttl=None):
+    """Return the shared store's view for `namespace`, or None when no shared cache is configured."""
+    if shared_cache is None:
+        return None
+    return SharedNamespace(shared_cache, namespace, ttl)
@@ -0,0 +1,62 @@
+import asyncio
+import logging
+
+from app.utils.deadline import SharedDeadline, request_deadline
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    def __init__(self, coroutine_function):
+        self.deadline = SharedDeadline()
+        self.task = asyncio.ensure_future(_detached(coroutine_function, self.deadline))
+        self.waiters = 0
+
+
+async def _detached(coroutine_function, deadline):
+    # Shared work serves every waiter, so only the last of their deadlines may cut it short
+    request_deadline.set(deadline)
+    return await coroutine_function()
+
+
+class AsyncSingleFlight:
+    """
+    Coalesce concurrent calls that share a key: the first caller starts the work and every
+    caller that arrives while it is running awaits, and shares, its result. All callers
+    must run on the same event loop, which is the scraping engine loop for every user of
+    this class. The work runs in a task of its own, under the latest deadline of the
+    callers waiting for it: a caller that is cancelled only stops waiting, and the work
+    is cancelled once no caller is left waiting for it.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.coalesced = 0
+        self._flights = {}
+
+    async def do(self, key, coroutine_function):
+        flight = self._flights.get(key)
+        if flight is None or flight.task.cancelled():
+            flight = _Flight(coroutine_function)
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda task: self._forget(key, flight))
+        else:
+            self.coalesced += 1
+            logger.debug(f"Joining in-flight {self.name} call for {key}")
+
+        flight.deadline.join(request_deadline.get())
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                logger.debug(f"Cancelling {self.name} call for {key}, nobody is waiting for it any more")
+                flight.task.cancel()
+                self._forget(key, flight)
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, key, flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
@@ -0,0 +1,189 @@
+"""
+Upstream transport modes. `live` sends requests to Stack Overflow, `record` does the same
+and archives every response, and `replay` serves responses from the archive without any
+network access. In every mode latency and failures (429, 5xx, timeouts) can be injected
+in front of the upstream, to load test the app or reproduce slow paths deterministically.
+"""
+import os
+import gzip
+import json
+import time
+import random
+import asyncio
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import defaultdict
+
+from app.utils.page_cache import UpstreamResponse
+
+logger = logging.getLogger(__name__)
+
+TRANSPORT_MODE = os.environ.get("STACKOVERFLOW_TRANSPORT", "live")
+TRANSPORT_ARCHIVE = os.environ.get("STACKOVERFLOW_TRANSPORT_ARCHIVE")
+INJECT_LATENCY = os.environ.get("STACKOVERFLOW_INJECT_LATENCY", "0")
+INJECT_ERROR_RATE = float(os.environ.get("STACKOVERFLOW_INJECT_ERROR_RATE", 0))
+INJECT_ERRORS = os.environ.get("STACKOVERFLOW_INJECT_ERRORS", "429,503,timeout")
+INJECT_SEED = os.environ.get("STACKOVERFLOW_INJECT_SEED")
+
+TRANSPORT_MODES = ('live', 'record', 'replay')
+
+# Seconds an injected 429 asks the client to wait.
+INJECTED_RETRY_AFTER = 1
+
+
+class ReplayMiss(LookupError):
+    """Raised in replay mode for a URL the archive has no response for."""
+
+
+class ResponseArchive:
+    """Recorded upstream responses, one gzip-compressed JSON file per URL."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url):
+        return os.path.join(self.directory, hashlib.sha256(url.encode('utf-8')).hexdigest() + '.json.gz')
+
+    def get(self, url):
+        """Return the recorded response for `url`, or None if it was never recorded."""
+        try:
+            with gzip.open(self._path(url), 'rt', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable archived response for {url}: {e}")
+            return None
+        return UpstreamResponse(data['url'], data['status'], data['text'], data.get('headers'))
+
+    def save(self, url, status, headers, text):
+        data = {'url': url, 'status': status, 'headers': dict(headers), 'text': text, 'recorded_at': time.time()}
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb') as f:
+                f.write(json.dumps(data).encode('utf-8'))
+            os.replace(tmp_path, self._path(url))
+            logger.debug(f"Recorded {status} response for {url}")
+        except OSError as e:
+            logger.error(f"Failed to record response for {url}: {e}")
+
+
+def parse_latency(spec):
+    """Parse a latency spec, either fixed seconds ("0.2") or a uniform range ("0.1-0.5")."""
+    low, _, high = spec.partition('-')
+    low = float(low or 0)
+    return low, float(high) if high else low
+
+
+class FaultInjector:
+    """
+    Decides the latency and failure of each upstream call. With a seed, the nth call for
+    a URL always gets the same latency and failure, however concurrent calls interleave.
+    """
+
+    def __init__(self, latency=(0.0, 0.0), error_rate=0.0, errors=('429', '503', 'timeout'), seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.errors = tuple(errors)
+        self.seed = seed
+        self._calls = defaultdict(int)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.latency[1] > 0 or self.error_rate > 0
+
+    def _random(self, url):
+        if self.seed is None:
+            return random.Random()
+        with self._lock:
+            call = self._calls[url]
+            self._calls[url] += 1
+        return random.Random(f"{self.seed}:{url}:{call}")
+
+    def decide(self, url):
+        """Return (latency in seconds, injected failure or None) for the next call to `url`."""
+        rng = self._random(url)
+        latency = rng.uniform(*self.latency)
+        failure = rng.choice(self.errors) if self.errors and rng.random() < self.error_rate else None
+        return latency, failure
+
+
+class UpstreamTransport:
+    """Applies the transport mode and fault injection to upstream calls made by the request handler."""
+
+    def __init__(self, mode='live', archive=None, injector=None):
+        if mode not in TRANSPORT_MODES:
+            raise ValueError(f"Unknown transport mode {mode!r}, expected one of {TRANSPORT_MODES}")
+        if mode != 'live' and archive is None:
+            raise ValueError(f"Transport mode {mode!r} needs an archive")
+        self.mode = mode
+        self.archive = archive
+        self.injector = injector
+
+    def _decide(self, url):
+        if self.injector is None:
+            return 0.0, None
+        return self.injector.decide(url)
+
+    def _respond(self, url, failure):
+        """
+        Return the injected or replayed response for `url`, or None to go to the live upstream.
+        Raises ReplayMiss when replaying a URL that was never recorded.
+        """
+        if failure is not None:
+            logger.debug(f"Injecting {failure} for {url}")
+            headers = {'Retry-After': str(INJECTED_RETRY_AFTER)} if failure == '429' else {}
+            return UpstreamResponse(url, int(failure), '', headers)
+        if self.mode == 'replay':
+            archived = self.archive.get(url)
+            if archived is None:
+                # Not an upstream failure: retrying, or caching it as one, would only hide the gap in the archive
+                raise ReplayMiss(f"No archived response for {url}")
+            return archived
+        return None
+
+    async def async_intercept(self, url, timeout):
+        """
+        Wait out any injected latency, then return the injected or replayed response, or
+        None when the request should go upstream. Injected timeouts raise after `timeout`.
+        """
+        latency, failure = self._decide(url)
+        if latency:
+            await asyncio.sleep(latency)
+        if failure == 'timeout':
+            await asyncio.sleep(_timeout_seconds(timeout))
+            raise asyncio.TimeoutError(f"Injected timeout for {url}")
+        return self._respond(url, failure)
+
+    def record(self, url, status, headers, text):
+        """Archive a live response when recording. 304s carry no page and are not archived."""
+        if self.mode == 'record' and status != 304:
+            self.archive.save(url, status, headers, text)
+
+
+def _timeout_seconds(timeout):
+    if isinstance(timeout, tuple):
+        return sum(t for t in timeout if t)
+    return timeout or 0
+
+
+def _build_transport():
+    injector = FaultInjector(
+        latency=parse_latency(INJECT_LATENCY),
+        error_rate=INJECT_ERROR_RATE,
+        errors=[error.strip() for error in INJECT_ERRORS.split(',') if error.strip()],
+        seed=INJECT_SEED
+    )
+    if TRANSPORT_MODE == 'live' and not injector.enabled:
+        return None
+    archive = ResponseArchive(TRANSPORT_ARCHIVE) if TRANSPORT_ARCHIVE else None
+    logger.debug(f"Upstream transport mode {TRANSPORT_MODE!r}, fault injection {'on' if injector.enabled else 'off'}.")
+    return UpstreamTransport(TRANSPORT_MODE, archive, injector if injector.enabled else None)
+
+
+# None in plain live mode, where requests go straight to the upstream.
+upstream_transport = _build_transport()
@@ -0,0 +1,249 @@
+"""
+HTML fixtures for the parser benchmarks. Each size has one page of every kind the
+scrapers parse, stored as benchmarks/fixtures/<size>/<kind>.html. The small and typical
+pages are checked in; missing pages, such as the huge ones, are generated with the markup
+Stack Overflow serves. `record` replaces a size's pages with live copies.
+
+    python -m benchmarks.fixtures generate
+    python -m benchmarks.fixtures record typical --question 11227809 --tagged python
+"""
+import os
+import sys
+import argparse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+BASE_URL = "https://stackoverflow.com"
+
+KINDS = ('listing', 'question', 'profile', 'timeline', 'collectives', 'collective_tags', 'collective_tags_last', 'collective_links')
+
+# Shape of the generated pages per size. Huge question pages have 150 answers with long
+# code blocks; `iterations` scales the timed calls so huge cases finish in reasonable time.
+SIZES = {
+    'small': {'listing': 15, 'answers': 1, 'code_lines': 3, 'collectives': 2, 'tags_per_page': 5, 'tag_pages': 1, 'iterations': 1.0},
+    'typical': {'listing': 50, 'answers': 8, 'code_lines': 25, 'collectives': 12, 'tags_per_page': 36, 'tag_pages': 3, 'iterations': 1.0},
+    'huge': {'listing': 50, 'answers': 150, 'code_lines': 400, 'collectives': 40, 'tags_per_page': 36, 'tag_pages': 8, 'iterations': 0.25},
+}
+
+
+def _code_block(seed, lines):
+    body = '\n'.join(f"    value_{seed}_{n} = compute(&quot;{n}&quot;) &lt; limit and other[{n}]" for n in range(lines))
+    return f'<pre class="lang-py s-code-block"><code>def block_{seed}():\n{body}\n</code></pre>'
+
+
+def _listing_summary(question_id):
+    user_id = 50 + question_id % 7
+    tags = ''.join(
+        f'<li class="d-inline mr4 js-post-tag-list-item"><a href="/questions/tagged/{tag}" class="post-tag flex--item mt0 js-tagname-{tag} s-tag">{tag}</a></li>'
+        for tag in ('python', 'pandas', f'tag-{question_id % 3}')
+    )
+    return f'''<div id="question-summary-{question_id}" class="s-post-summary js-post-summary" data-post-id="{question_id}" data-post-type-id="1">
+<div class="s-post-summary--stats js-post-summary-stats">
+<div class="s-post-summary--stats-item s-post-summary--stats-item__emphasized" title="Score of {question_id % 11}"><span class="s-post-summary--stats-item-number">{question_id % 11}</span><span class="s-post-summary--stats-item-unit">votes</span></div>
+<div class="s-post-summary--stats-item has-answers" title="{question_id % 4} answers"><span class="s-post-summary--stats-item-number">{question_id % 4}</span><span class="s-post-summary--stats-item-unit">answers</span></div>
+<div class="s-post-summary--stats-item" title="{question_id % 5},{question_id % 1000:03d} views"><span class="s-post-summary--stats-item-number">{question_id % 5}k</span><span class="s-post-summary--stats-item-unit">views</span></div></div>
+<div class="s-post-summary--content"><h3 class="s-post-summary--content-title"><a href="/questions/{question_id}/how-do-i-do-thing-{question_id}" class="s-link">How do I do thing {question_id} with a DataFrame?</a></h3>
+<div class="s-post-summary--content-excerpt">I have a DataFrame with several columns and want to group rows by a key while keeping the original order of question {question_id}&hellip;</div>
+<div class="s-post-summary--meta"><div class="s-post-summary--meta-tags d-inline-block tags js-tags"><ul class="ml0 list-ls-none js-post-tag-list-wrapper d-inline">{tags}</ul></div>
+<div class="s-user-card s-user-card__minimal">
+<a href="/users/{user_id}/user{user_id}" class="s-avatar s-avatar__16 s-user-card--avatar"><div class="gravatar-wrapper-16"><img src="https://i.sstatic.net/{user_id}.png?s=32" class="s-avatar--image" width="16" height="16"></div></a>
+<div class="s-user-card--info"><div class="s-user-card--link d-flex gs4"><a href="/users/{user_id}/user{user_id}" class="flex--item">user{user_id}</a></div>
+<ul class="s-user-card--awards"><li class="s-user-card--rep"><span class="todo-no-class-here" title="reputation score 15,{user_id}3">15.{user_id % 10}k</span></li></ul></div>
+<time class="s-user-card--time">modified <span title="2024-05-0{user_id % 9 + 1} 10:11:12Z" class="relativetime">2 days ago</span></time></div></div></div></div>'''
+
+
+def listing_page(shape):
+    summaries = ''.join(_listing_summary(78000000 + n) for n in range(shape['listing']))
+    return f'''<!DOCTYPE html><html><head><title>Newest Questions - Stack Overflow</title><script>StackExchange.init({{"locale":"en"}});</script></head>
+<body class="questions-page"><header class="s-topbar"><nav><a href="/">Stack Overflow</a><a href="/questions">Questions</a></nav></header>
+<div class="container"><div id="left-sidebar">Home Questions Tags Users</div><div id="content"><div id="mainbar">
+<div class="d-flex ai-center"><div class="flex--item fl1 fs-body3 mr12">24,163,654 questions</div></div>
+<div id="questions" class="flush-left">{summaries}</div>
+<div class="s-pagination pager fl"><a class="s-pagination--item js-pagination-item" href="/questions?tab=newest&amp;page=2" rel="next">Next</a></div>
+</div><div id="sidebar">The Overflow Blog</div></div></div><footer id="footer">Site design / logo</footer></body></html>'''
+
+
+def _answer(answer_id, question_id, accepted, shape):
+    user_id = 60 + answer_id % 5
+    comments = ''.join(
+        f'<li class="comment js-comment"><div class="comment-body"><span class="comment-copy">Comment {n} on answer {answer_id}</span>'
+        f'<span class="comment-date"><span title="2024-07-0{n + 1} 09:10:11Z, License: CC BY-SA 4.0" class="relativetime-clean">Jul {n + 1}</span></span></div></li>'
+        for n in range(3)
+    )
+    accepted_class = ' accepted-answer js-accepted-answer' if accepted else ''
+    return f'''<div id="answer-{answer_id}" class="answer js-answer{accepted_class}" data-answerid="{answer_id}" data-parentid="{question_id}" data-score="{answer_id % 9}" itemprop="{'acceptedAnswer' if accepted else 'suggestedAnswer'}">
+<div class="post-layout"><div class="votecell post-layout--left"><div class="js-voting-container d-flex jc-center fd-column ai-center gs4 fc-black-300">
+<div class="js-vote-count flex--item d-flex fd-column ai-center fc-theme-body-font fw-bold fs-subheading py4" itemprop="upvoteCount" data-value="{answer_id % 9}">{answer_id % 9}</div></div></div>
+<div class="answercell post-layout--right"><div class="s-prose js-post-body" itemprop="text"><p>You can use <code>groupby</code> with <code>sort=False</code> to keep the order, see answer {answer_id}:</p>
+{_code_block(answer_id, shape['code_lines'] // 4 + 1)}<p>This works because<br>the keys are <strong>hashed</strong> once. See <a href="https://docs.python.org/3/">the docs</a>.</p></div>
+<div class="mt24"><div class="d-flex fw-wrap ai-start jc-end gs8 gsy">
+<div class="post-signature flex--item"><div class="user-info "><div class="user-action-time">edited <span title="2024-06-0{answer_id % 9 + 1} 08:00:00Z" class="relativetime">Jun 1</span></div></div></div>
+<div class="post-signature flex--item fl0"><div class="user-info user-hover"><div class="user-action-time">answered <span title="2024-05-01 07:00:00Z" class="relativetime">May 1</span></div>
+<div class="user-gravatar32"><a href="/users/{user_id}/u{user_id}"><div class="gravatar-wrapper-32"><img src="https://i.sstatic.net/a{user_id}.png?s=64" width="32" height="32"></div></a></div>
+<div class="user-details" itemprop="author"><a href="/users/{user_id}/u{user_id}">u{user_id}</a><div class="-flair"><span class="reputation-score" title="reputation score " dir="ltr">2,3{user_id % 10}4</span></div></div></div></div></div></div>
+<time itemprop="dateCreated" datetime="2024-05-01T07:00:00"></time></div></div>
+<div class="post-layout--right js-post-comments-component"><div class="comments js-comments-container"><ul class="comments-list js-comments-list">{comments}</ul></div></div></div>'''
+
+
+def question_page(shape, question_id=78000000):
+    answers = ''.join(_answer(question_id + 1 + n, question_id, n == 0, shape) for n in range(shape['answers']))
+    return f'''<!DOCTYPE html><html><head><title>How do I do thing - Stack Overflow</title><script>StackExchange.ready(function(){{}});</script></head>
+<body class="question-page"><header class="s-topbar"><nav><a href="/">Stack Overflow</a></nav></header><div class="container"><div id="left-sidebar">Home Questions Tags</div>
+<div id="content" class="snippet-hidden"><div itemprop="mainEntity" itemscope itemtype="https://schema.org/Question"><div class="inner-content clearfix">
+<div id="question-header" class="d-flex sm:fd-column"><h1 itemprop="name" class="fs-headline1 ow-break-word mb8 flex--item fl1"><a href="/questions/{question_id}/how-do-i-do-thing" class="question-hyperlink">How do I do thing with a DataFrame?</a></h1></div>
+<div class="d-flex fw-wrap pb8 mb16 bb bc-black-225"><div class="flex--item ws-nowrap mr16 mb8" title="2024-05-01 06:00:00Z"><span class="fc-black-400 mr2">Asked</span><time itemprop="dateCreated" datetime="2024-05-01T06:00:00">May 1</time></div>
+<div class="flex--item ws-nowrap mr16 mb8"><span class="fc-black-400 mr2">Modified</span><a href="?lastactivity" class="s-link s-link__inherit" title="2024-07-03 12:00:00Z">today</a></div>
+<div class="flex--item ws-nowrap mb8" title="Viewed 12,345 times"><span class="fc-black-400 mr2">Viewed</span>
+12k times</div></div>
+<div id="mainbar" role="main"><div class="question js-question" data-questionid="{question_id}" data-position-on-page="0" data-score="42" id="question">
+<div class="post-layout"><div class="votecell post-layout--left"><div class="js-vote-count flex--item d-flex fd-column ai-center fc-theme-body-font fw-bold fs-subheading py4" data-value="42">42</div></div>
+<div class="postcell post-layout--right"><div class="s-prose js-post-body" itemprop="text"><p>I have a DataFrame and want to group rows by <code>key</code> while keeping their order.</p>
+{_code_block(question_id, shape['code_lines'])}<p>What I tried:<br>sorting first, which is <em>slow</em>.</p><ul><li>first attempt</li><li>second attempt</li></ul></div>
+<div class="mt24 mb12"><div class="post-taglist d-flex gs4 gsy fd-column"><div class="d-flex ps-relative fw-wrap"><ul class="ml0 list-ls-none js-post-tag-list-wrapper d-inline">
+<li><a href="/questions/tagged/python" class="post-tag flex--item mt0 js-tagname-python">python</a></li><li><a href="/questions/tagged/pandas" class="post-tag flex--item mt0 js-tagname-pandas">pandas</a></li></ul></div></div></div>
+<div class="post-signature owner flex--item"><div class="user-info user-hover"><div class="user-action-time">asked <span title="2024-05-01 06:00:00Z" class="relativetime">May 1</span></div>
+<div class="user-gravatar32"><a href="/users/51/user51"><div class="gravatar-wrapper-32"><img src="https://i.sstatic.net/51.png?s=64" width="32" height="32"></div></a></div>
+<div class="user-details" itemprop="author"><a href="/users/51/user51">user51</a><div class="-flair"><span class="reputation-score" title="reputation score 15,123" dir="ltr">15.1k</span></div></div></div></div>
+</div></div></div>
+<div id="answers"><a name="tab-top"></a><div id="answers-header"><div class="answers-subheader d-flex ai-center mb8"><div class="flex--item fl1"><h2 class="mb0" data-answercount="{shape['answers']}">{shape['answers']} Answers</h2></div></div></div>
+{answers}</div></div><div id="sidebar">Linked Related Hot Network Questions <a class="s-tag" href="/questions/tagged/python">python</a></div></div></div></div></div>
+<footer id="footer">Site design / logo</footer></body></html>'''
+
+
+def profile_page(shape):
+    activity = ''.join(f'<div class="s-card"><a href="/questions/{n}">Post {n}</a></div>' for n in range(shape['answers'] + 10))
+    return f'''<!DOCTYPE html><html><head><title>User user51 - Stack Overflow</title>
+<script>StackExchange.ready(function () {{ StackExchange.user.init({{ userId: 51, accountId: 51007 }}); }});</script></head>
+<body><div id="content"><div id="main-content">{activity}</div></div></body></html>'''
+
+
+def timeline_page(shape):
+    events = ''.join(
+        f'<tr><td><span title="2024-08-0{n % 9 + 1} 10:00:00Z" class="relativetime">Aug {n % 9 + 1}</span></td><td>comment</td></tr>'
+        for n in range(shape['answers'] // 4 + 3)
+    )
+    return f'<!DOCTYPE html><html><body><div id="content"><table class="s-table">{events}</table></div></body></html>'
+
+
+def collectives_page(shape):
+    cards = ''.join(
+        f'''<div class="s-card bs-sm h:bs-md fc-black-500 js-gps-track"><a class="js-gps-track" href="/collectives/collective-{n}">
+<h1 class="fs-body2 mb0 fc-blue-500">Collective {n}</h1></a><span class="fs-body1 v-truncate2 ow-break-word">A collective for product {n} and its community.</span></div>'''
+        for n in range(shape['collectives'])
+    )
+    return f'<!DOCTYPE html><html><body><header class="s-topbar">nav</header><div id="content">{cards}</div><footer>foot</footer></body></html>'
+
+
+def collective_tags_page(shape, last=False):
+    tags = ''.join(f'<a class="post-tag s-tag" href="/questions/tagged/tag-{n}">tag-{n}</a>' for n in range(shape['tags_per_page']))
+    next_link = '' if last else '<a class="s-pagination--item js-pagination-item" href="?tab=tags&amp;page=2" rel="next">Next</a>'
+    return f'<!DOCTYPE html><html><body><div id="content"><div class="d-grid">{tags}</div><div class="s-pagination">{next_link}</div></div></body></html>'
+
+
+def collective_links_page(shape):
+    return '''<!DOCTYPE html><html><body><div id="content"><div class="s-sidebarwidget">
+<a class="s-link" target="_blank" href="https://cloud.example.com/">Website</a><a class="s-link" target="_blank" href="https://x.com/example">Twitter</a>
+<a class="s-link" target="_blank" href="https://github.com/example">GitHub</a></div></div></body></html>'''
+
+
+GENERATORS = {
+    'listing': listing_page,
+    'question': question_page,
+    'profile': profile_page,
+    'timeline': timeline_page,
+    'collectives': collectives_page,
+    'collective_tags': collective_tags_page,
+    'collective_tags_last': lambda shape: collective_tags_page(shape, last=True),
+    'collective_links': collective_links_page,
+}
+
+
+def fixture_path(size, kind, directory=FIXTURES_DIR):
+    return os.path.join(directory, size, f"{kind}.html")
+
+
+def generate_fixtures(directory=FIXTURES_DIR, overwrite=False):
+    """Write every generated fixture that is not on disk yet."""
+    for size, shape in SIZES.items():
+        os.makedirs(os.path.join(directory, size), exist_ok=True)
+        for kind in KINDS:
+            path = fixture_path(size, kind, directory)
+            if overwrite or not os.path.exists(path):
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(GENERATORS[kind](shape))
+
+
+def load_fixtures(directory=FIXTURES_DIR):
+    """Return {size: {kind: html}}, generating missing fixtures first."""
+    generate_fixtures(directory)
+    fixtures = {}
+    for size in SIZES:
+        fixtures[size] = {}
+        for kind in KINDS:
+            with open(fixture_path(size, kind, directory), encoding='utf-8') as f:
+                fixtures[size][kind] = f.read()
+    return fixtures
+
+
+def record_fixtures(size, question_id, tagged=None, collective=None, directory=FIXTURES_DIR):
+    """Replace the fixtures of `size` with live pages from Stack Overflow."""
+    from app.utils import make_request_with_retries
+    from app.scrapers.questions import listing_url
+    from app.scrapers.question_page import QuestionPage
+    from app.scrapers.collectives import parse_collectives
+
+    urls = {
+        'listing': listing_url(tagged.split(',') if tagged else None, 'last_activity_date', 1, 50),
+        'question': f"{BASE_URL}/questions/{question_id}",
+        'collectives': f"{BASE_URL}/collectives-all",
+    }
+    pages = {kind: make_request_with_retries(url, use_cache=False) for kind, url in urls.items()}
+
+    page = QuestionPage(urls['question'], pages['question'].text) if pages['question'] is not None else None
+    owner_card = page.owner_card() if page is not None else {}
+    answers = page.answer_summaries() if page is not None else []
+    if owner_card.get('link'):
+        pages['profile'] = make_request_with_retries(owner_card['link'], use_cache=False)
+    if answers:
+        pages['timeline'] = make_request_with_retries(f"{BASE_URL}/posts/{answers[0]['data-answerid']}/timeline", use_cache=False)
+
+    if collective is None and pages['collectives'] is not None:
+        listed = parse_collectives(pages['collectives'].text)
+        collective = listed[0]['slug'] if listed else None
+    if collective:
+        pages['collective_links'] = make_request_with_retries(f"{BASE_URL}/collectives/{collective}", use_cache=False)
+        pages['collective_tags'] = make_request_with_retries(f"{BASE_URL}/collectives/{collective}?tab=tags&page=1", use_cache=False)
+
+    os.makedirs(os.path.join(directory, size), exist_ok=True)
+    for kind, response in pages.items():
+        if response is None or response.status_code != 200:
+            print(f"Could not record {kind}, keeping the existing fixture.", file=sys.stderr)
+            continue
+        with open(fixture_path(size, kind, directory), 'w', encoding='utf-8') as f:
+            f.write(response.text)
+        print(f"Recorded {kind} ({len(response.text)} bytes)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate or record HTML fixtures for the parser benchmarks.")
+    parser.add_argument('--dir', default=FIXTURES_DIR, help="fixture directory")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    generate = commands.add_parser('generate', help="write generated fixtures")
+    generate.add_argument('--overwrite', action='store_true', help="replace fixtures that already exist")
+
+    record = commands.add_parser('record', help="replace one size's fixtures with live pages")
+    record.add_argument('size', choices=sorted(SIZES))
+    record.add_argument('--question', required=True, help="question id to record, with its answers")
+    record.add_argument('--tagged', help="tags of the listing to record")
+    record.add_argument('--collective', help="collective slug to record, defaults to the first listed")
+
+    args = parser.parse_args(argv)
+    if args.command == 'generate':
+        generate_fixtures(args.dir, overwrite=args.overwrite)
+    else:
+        record_fixtures(args.size, args.question, args.tagged, args.collective, args.dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,297 @@
+"""
+Offline parser benchmarks. Runs the async scrapers on the scraping engine loop over the
+stored HTML fixtures, with the network replaced by an upstream transport that serves
+those fixtures, and reports throughput, latency percentiles and peak memory per scraper
+and page size.
+
+    python -m benchmarks.parsers
+    python -m benchmarks.parsers --save-baseline benchmarks/baseline.json
+    python -m benchmarks.parsers --baseline benchmarks/baseline.json --max-regression 0.15
+
+With --baseline the run exits non-zero when any case is slower than the baseline by more
+than --max-regression.
+"""
+import os
+
+# Every iteration must parse: no page, profile or entity caching, and no rate limiting.
+os.environ['STACKOVERFLOW_PAGE_CACHE_ENABLED'] = '0'
+os.environ['STACKOVERFLOW_USER_CACHE_SIZE'] = '0'
+os.environ['STACKOVERFLOW_ACTIVITY_CACHE_SIZE'] = '0'
+os.environ['STACKOVERFLOW_REQUESTS_PER_SECOND'] = '1000000'
+os.environ['STACKOVERFLOW_REQUEST_BURST'] = '1000000'
+os.environ.pop('STACKOVERFLOW_STORE_PATH', None)
+os.environ.pop('STACKOVERFLOW_USER_CACHE_PATH', None)
+
+import re
+import sys
+import json
+import time
+import logging
+import argparse
+import tracemalloc
+import asyncio
+from urllib.parse import urlsplit, parse_qs
+
+from app.utils import html_to_markdown, parse_date, parse_reputation, parse_view_count, encode_json
+from app.utils import async_request_handler
+from app.utils.async_request_handler import get_engine_loop
+from app.utils.page_cache import UpstreamResponse
+from app.scrapers import async_scrape_questions, async_scrape_question_by_id, async_scrape_collectives, QuestionPage
+from app.scrapers.async_engine import async_scrape_answers_from_page
+from benchmarks.fixtures import FIXTURES_DIR, SIZES, BASE_URL, load_fixtures
+
+DEFAULT_ITERATIONS = 20
+DEFAULT_MAX_REGRESSION = 0.2
+MIN_ITERATIONS = 3
+
+DATE_TITLE = re.compile(r'^\d{4}-\d{2}-\d{2} ')
+
+
+class FixtureTransport:
+    """
+    Upstream transport that serves the fixtures of the selected size for every Stack
+    Overflow URL, like the live site would, in place of the network.
+    """
+
+    ROUTES = [
+        (re.compile(r'^/users/\d+'), 'profile'),
+        (re.compile(r'^/posts/\d+/timeline'), 'timeline'),
+        (re.compile(r'^/collectives-all$'), 'collectives'),
+        (re.compile(r'^/collectives/[\w-]+$'), 'collective_links'),
+        (re.compile(r'^/(questions|a)/\d+'), 'question'),
+        (re.compile(r'^/questions'), 'listing'),
+    ]
+
+    def __init__(self, fixtures):
+        self.fixtures = fixtures
+        self.size = None
+        self.requests = 0
+
+    def route(self, url):
+        parts = urlsplit(url)
+        query = parse_qs(parts.query)
+        for pattern, kind in self.ROUTES:
+            if not pattern.search(parts.path):
+                continue
+            if kind == 'collective_links' and query.get('tab') == ['tags']:
+                page = int(query.get('page', ['1'])[0])
+                return 'collective_tags' if page < SIZES[self.size]['tag_pages'] else 'collective_tags_last'
+            return kind
+        return None
+
+    async def async_intercept(self, url, timeout):
+        self.requests += 1
+        kind = self.route(url)
+        if kind is None:
+            return UpstreamResponse(url, 404, '')
+        return UpstreamResponse(url, 200, self.fixtures[self.size][kind], {'Content-Type': 'text/html; charset=utf-8'})
+
+    def record(self, url, status, headers, text):
+        pass
+
+
+def _on_engine(coro):
+    """Run `coro` on the scraping engine loop, as the API does, and wait for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, get_engine_loop()).result()
+
+
+def _post_bodies(fixtures):
+    soup = QuestionPage(f"{BASE_URL}/questions/0", fixtures['question']).soup
+    return soup.find_all('div', class_='s-prose js-post-body')
+
+
+def _field_strings(fixtures):
+    """The date, reputation and view count strings the scrapers parse on a listing and a question page."""
+    strings = []
+    for kind in ('listing', 'question'):
+        soup = QuestionPage(f"{BASE_URL}/questions/0", fixtures[kind]).soup
+        strings += [(parse_date, tag['title']) for tag in soup.find_all(title=DATE_TITLE)]
+        strings += [(parse_date, tag['datetime']) for tag in soup.find_all('time', datetime=True)]
+        strings += [(parse_reputation, tag.get_text(strip=True))
+                    for tag in soup.select('.reputation-score, .s-user-card--rep span')]
+        strings += [(parse_view_count, tag.get_text(strip=True))
+                    for tag in soup.select('.s-post-summary--stats-item[title$=" views"] .s-post-summary--stats-item-number')]
+    return strings
+
+
+def benchmark_cases(fixtures):
+    """Return [(name, setup)] where setup(size) builds the zero-argument call to time."""
+
+    def questions_listing(size):
+        html = fixtures[size]['listing']
+        return lambda: _on_engine(async_scrape_questions(html))
+
+    def answers_from_page(size):
+        page = QuestionPage(f"{BASE_URL}/questions/0", fixtures[size]['question'])
+        return lambda: _on_engine(async_scrape_answers_from_page(page, page.question_id))
+
+    def question_by_id(size):
+        return lambda: _on_engine(async_scrape_question_by_id(78000000))
+
+    def collectives(size):
+        return lambda: _on_engine(async_scrape_collectives())
+
+    def post_bodies(size):
+        bodies = _post_bodies(fixtures[size])
+        return lambda: [html_to_markdown(body) for body in bodies]
+
+    def field_parsers(size):
+        strings = _field_strings(fixtures[size])
+
+        def call():
+            # Start cold, so each call pays for parsing a fresh page's values once
+            for parser in (parse_date, parse_reputation, parse_view_count):
+                parser.cache_clear()
+            return [parser(value) for parser, value in strings]
+        return call
+
+    def answers_response(size):
+        page = QuestionPage(f"{BASE_URL}/questions/0", fixtures[size]['question'])
+        answers = _on_engine(async_scrape_answers_from_page(page, page.question_id))
+        # The warm-up call encodes the records; timed calls reuse their cached JSON
+        return lambda: encode_json({'items': answers})
+
+    return [
+        ('async_scrape_questions', questions_listing),
+        ('async_scrape_answers_from_page', answers_from_page),
+        ('async_scrape_question_by_id', question_by_id),
+        ('async_scrape_collectives', collectives),
+        ('html_to_markdown', post_bodies),
+        ('field_parsers', field_parsers),
+        ('encode_json', answers_response),
+    ]
+
+
+def _count_items(result):
+    if result is None:
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    return 1
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, min(len(samples) - 1, int(round(fraction * len(samples) + 0.5)) - 1))
+    return samples[index]
+
+
+def measure(call, iterations):
+    """Time `iterations` calls after a warm-up call, then trace one more for peak memory."""
+    call()
+    latencies = []
+    items = 0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = call()
+        latencies.append(time.perf_counter() - start)
+        items += _count_items(result)
+
+    tracemalloc.start()
+    try:
+        call()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    total = sum(latencies)
+    return {
+        'iterations': iterations,
+        'items': items,
+        'items_per_second': items / total if total else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p90_ms': percentile(latencies, 0.90) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'peak_memory_kib': peak_memory / 1024,
+    }
+
+
+def run_benchmarks(fixtures, sizes, iterations, only=None):
+    """Return {"<case>/<size>": result} for every selected case and size."""
+    transport = FixtureTransport(fixtures)
+    async_request_handler.upstream_transport = transport
+
+    results = {}
+    for name, setup in benchmark_cases(fixtures):
+        if only and name not in only:
+            continue
+        for size in sizes:
+            transport.size = size
+            transport.requests = 0
+            size_iterations = max(MIN_ITERATIONS, int(iterations * SIZES[size]['iterations']))
+            result = measure(setup(size), size_iterations)
+            result['upstream_requests'] = transport.requests / (size_iterations + 2)
+            results[f"{name}/{size}"] = result
+            print(format_row(f"{name}/{size}", result), flush=True)
+    _on_engine(async_request_handler.get_async_session().close())
+    return results
+
+
+HEADER = f"{'case':<48} {'items/s':>10} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'peak KiB':>10} {'reqs':>6}"
+
+
+def format_row(key, result):
+    return (
+        f"{key:<48} {result['items_per_second']:>10.1f} {result['p50_ms']:>9.2f} {result['p90_ms']:>9.2f} "
+        f"{result['p99_ms']:>9.2f} {result['peak_memory_kib']:>10.1f} {result['upstream_requests']:>6.0f}"
+    )
+
+
+def compare_to_baseline(results, baseline, max_regression):
+    """Print the change against `baseline` per case and return the cases that regressed."""
+    regressions = []
+    print(f"\n{'case':<48} {'items/s':>10} {'p50':>9} {'peak':>9}")
+    for key, result in results.items():
+        before = baseline.get(key)
+        if before is None:
+            print(f"{key:<48} {'new':>10}")
+            continue
+        throughput = result['items_per_second'] / before['items_per_second'] - 1 if before['items_per_second'] else 0.0
+        latency = result['p50_ms'] / before['p50_ms'] - 1 if before['p50_ms'] else 0.0
+        memory = result['peak_memory_kib'] / before['peak_memory_kib'] - 1 if before['peak_memory_kib'] else 0.0
+        regressed = throughput < -max_regression or latency > max_regression
+        print(f"{key:<48} {throughput:>+10.1%} {latency:>+9.1%} {memory:>+9.1%}{'  REGRESSION' if regressed else ''}")
+        if regressed:
+            regressions.append(key)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the scrapers over stored HTML fixtures.")
+    parser.add_argument('--fixtures', default=FIXTURES_DIR, help="fixture directory")
+    parser.add_argument('--sizes', default=','.join(SIZES), help="comma-separated page sizes to run")
+    parser.add_argument('--cases', help="comma-separated scrapers to run, default all")
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS, help="timed calls per case")
+    parser.add_argument('--save-baseline', metavar='PATH', help="write the results as a baseline")
+    parser.add_argument('--baseline', metavar='PATH', help="compare the results against a saved baseline")
+    parser.add_argument('--max-regression', type=float, default=DEFAULT_MAX_REGRESSION,
+                        help="allowed slowdown against the baseline, as a fraction")
+    args = parser.parse_args(argv)
+
+    # The fixtures leave out markup some scrapers warn about; keep the report readable
+    logging.disable(logging.WARNING)
+    fixtures = load_fixtures(args.fixtures)
+    sizes = [size for size in args.sizes.split(',') if size]
+    only = set(args.cases.split(',')) if args.cases else None
+
+    print(HEADER)
+    results = run_benchmarks(fixtures, sizes, args.iterations, only)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"\nSaved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.max_regression)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) regressed by more than {args.max_regression:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
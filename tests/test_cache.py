@@ -0,0 +1,43 @@
+import sqlite3
+
+from app.utils.cache import TTLCache, DatasetCache, SQLiteStore
+
+
+class BrokenStore:
+    """A persistence store whose file is locked or corrupt."""
+
+    def __init__(self):
+        self.writes = 0
+
+    def get(self, key):
+        raise sqlite3.OperationalError('database is locked')
+
+    def set(self, key, value, stored_at):
+        self.writes += 1
+        raise sqlite3.OperationalError('database is locked')
+
+
+def test_ttl_cache_read_error_is_a_miss():
+    cache = TTLCache(maxsize=4, ttl=60, persistence=BrokenStore())
+
+    assert cache.get('key') is None
+    assert cache.stats()['misses'] == 1
+
+    cache.set('key', 'value')
+    assert cache.get('key') == 'value'
+
+
+def test_dataset_cache_read_error_is_a_miss():
+    cache = DatasetCache(ttl=60, persistence=BrokenStore())
+
+    assert cache.get() == (None, False)
+
+    cache.set(['dataset'])
+    assert cache.get() == (['dataset'], True)
+
+
+def test_ttl_cache_falls_back_to_persisted_entries(tmp_path):
+    store = SQLiteStore(str(tmp_path / 'cache.db'), 'entries')
+    TTLCache(maxsize=4, ttl=60, persistence=store).set('key', {'a': 1})
+
+    assert TTLCache(maxsize=4, ttl=60, persistence=store).get('key') == {'a': 1}
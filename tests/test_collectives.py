@@ -0,0 +1,105 @@
+import time
+import asyncio
+
+from app import create_app
+from app.scrapers import async_engine
+from app.utils import async_request_handler
+from app.utils.cache import DatasetCache
+from app.utils.page_cache import UpstreamResponse
+from app.utils.deadline import Deadline, request_deadline
+
+LISTING = (
+    '<div class="s-card"><a class="js-gps-track" href="/collectives/aws">'
+    '<h1 class="fs-body2 mb0 fc-blue-500">AWS</h1></a>'
+    '<span class="fs-body1 v-truncate2 ow-break-word">Amazon Web Services</span></div>'
+)
+TAGS = '<a class="s-tag">aws-lambda</a><a class="s-tag">amazon-s3</a>'
+LINKS = '<a class="s-link" target="_blank" href="https://aws.amazon.com">Website</a>'
+
+
+class FakeResponse:
+    def __init__(self, text, status_code=200):
+        self.text = text
+        self.status_code = status_code
+
+
+def fake_upstream(monkeypatch, failing=()):
+    """Serve one collective; URLs containing any of `failing` fail. Returns the deadlines fetches ran under."""
+    deadlines = []
+
+    async def fetch(url, *args, **kwargs):
+        deadlines.append(request_deadline.get())
+        if any(part in url for part in failing):
+            return None
+        if url.endswith('/collectives-all'):
+            return FakeResponse(LISTING)
+        if 'tab=tags' in url:
+            return FakeResponse(TAGS)
+        return FakeResponse(LINKS)
+
+    monkeypatch.setattr(async_engine, 'async_make_request_with_retries', fetch)
+    monkeypatch.setattr(async_engine, 'collectives_cache', DatasetCache(ttl=60))
+    return deadlines
+
+
+def test_complete_crawl_is_cached(monkeypatch):
+    fake_upstream(monkeypatch)
+
+    collectives = asyncio.run(async_engine.async_cached_collectives())
+
+    assert collectives[0]['tags'] == ['aws-lambda', 'amazon-s3']
+    assert collectives[0]['external_links'] == [{'type': 'website', 'link': 'https://aws.amazon.com'}]
+    assert async_engine.collectives_cache.get() == (collectives, True)
+
+
+def test_crawl_with_failed_tags_is_not_cached(monkeypatch):
+    fake_upstream(monkeypatch, failing=('tab=tags',))
+
+    assert asyncio.run(async_engine.async_cached_collectives()) is None
+    assert async_engine.collectives_cache.get() == (None, False)
+
+
+def test_background_refresh_ignores_request_deadline(monkeypatch):
+    deadlines = fake_upstream(monkeypatch)
+    async_engine.collectives_cache.set([{'name': 'stale'}])
+    async_engine.collectives_cache._stored_at -= 120
+
+    async def scenario():
+        request_deadline.set(Deadline(0))
+        stale = await async_engine.async_cached_collectives()
+        await asyncio.gather(*async_engine._background_tasks)
+        return stale
+
+    assert asyncio.run(scenario()) == [{'name': 'stale'}]
+    assert deadlines and all(deadline.remaining() == float('inf') for deadline in deadlines)
+    collectives, is_fresh = async_engine.collectives_cache.get()
+    assert is_fresh
+    assert collectives[0]['tags'] == ['aws-lambda', 'amazon-s3']
+
+
+class SlowTransport:
+    """An upstream that takes `delay` seconds to answer every request."""
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    async def async_intercept(self, url, timeout):
+        await asyncio.sleep(self.delay)
+        return UpstreamResponse(url, 200, LISTING)
+
+    def record(self, url, status, headers, text):
+        pass
+
+
+def test_collectives_route_honors_timeout(monkeypatch):
+    monkeypatch.setattr(async_request_handler, 'upstream_transport', SlowTransport(3))
+    monkeypatch.setattr(async_request_handler, 'page_cache', None)
+    monkeypatch.setattr(async_engine, 'collectives_cache', DatasetCache(ttl=60))
+    client = create_app().test_client()
+
+    start = time.monotonic()
+    response = client.get('/collectives?timeout=0.2')
+
+    assert response.status_code == 504
+    assert time.monotonic() - start < 1
+    assert async_engine.collectives_cache.get() == (None, False)
@@ -0,0 +1,77 @@
+import time
+import asyncio
+
+from app.scrapers import async_engine
+from app.scrapers.answers import activity_cache
+from app.utils import async_request_handler
+from app.utils.deadline import Deadline, SharedDeadline, request_deadline
+from app.utils.page_cache import UpstreamResponse
+from app.utils.single_flight import AsyncSingleFlight
+
+
+class FailingTransport:
+    """An upstream that keeps answering 503."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def async_intercept(self, url, timeout):
+        self.calls += 1
+        return UpstreamResponse(url, 503, '')
+
+    def record(self, url, status, headers, text):
+        pass
+
+
+def test_shared_deadline_is_the_latest_of_its_waiters():
+    shared = SharedDeadline()
+    early, late = Deadline(0.01), Deadline(10)
+    shared.join(early)
+    shared.join(late)
+    assert shared.expires_at == late.expires_at and shared.seconds == 10
+
+    time.sleep(0.02)
+    assert early.expired() and not shared.expired()
+
+    shared.join(None)
+    assert shared.remaining() == float('inf') and shared.seconds is None
+
+
+def test_retries_stop_at_the_callers_deadline(monkeypatch):
+    transport = FailingTransport()
+    monkeypatch.setattr(async_request_handler, 'upstream_transport', transport)
+    monkeypatch.setattr(async_request_handler, 'page_cache', None)
+    monkeypatch.setattr(async_request_handler, 'get_async_session', lambda: None)
+    monkeypatch.setattr(async_request_handler, 'async_request_flights', AsyncSingleFlight('test'))
+
+    async def fetch():
+        request_deadline.set(Deadline(0.1))
+        return await async_request_handler.async_make_request_with_retries(
+            'https://example.com/questions/1', backoff_factor=1.0, delay_between_requests=2
+        )
+
+    start = time.monotonic()
+    assert asyncio.run(fetch()) is None
+    assert time.monotonic() - start < 0.5
+    assert transport.calls >= 1
+
+
+def test_timelines_missing_the_deadline_keep_the_page_date(monkeypatch):
+    async def slow_timeline(answer_id):
+        await asyncio.sleep(0.3 if answer_id == 2 else 0)
+        return 1700000000 + answer_id
+
+    monkeypatch.setattr(async_engine, 'async_fetch_timeline_last_activity_date', slow_timeline)
+    monkeypatch.setattr(activity_cache, 'get', lambda key: None)
+    monkeypatch.setattr(activity_cache, 'set', lambda key, value: None)
+    answers = [{'answer_id': n, 'last_edit_date': None, 'last_activity_date': 5} for n in (1, 2)]
+
+    async def resolve():
+        request_deadline.set(Deadline(0.1))
+        return await async_engine.async_resolve_last_activity_dates(answers)
+
+    start = time.monotonic()
+    resolved = asyncio.run(resolve())
+
+    assert time.monotonic() - start < 0.25
+    assert [answer['last_activity_date'] for answer in resolved] == [1700000001, 5]
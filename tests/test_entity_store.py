@@ -0,0 +1,85 @@
+from app.scrapers import entity_store as store_module
+from app.scrapers.entity_store import EntityStore, store_questions, refresh_from_store
+from app.scrapers.records import Question, Owner
+
+LISTED = 1700000000
+
+
+def summary(question_id=1, last_activity_date=LISTED, score=5):
+    """A question as parsed from a listing, before enrichment."""
+    return Question(
+        question_id=question_id,
+        tags=['python'],
+        owner=Owner(reputation=10, profile_image='img', display_name='ada', link='https://stackoverflow.com/users/7/ada'),
+        is_answered=True,
+        view_count=100,
+        answer_count=1,
+        score=score,
+        last_activity_date=last_activity_date,
+        title='How?',
+        link=f'https://stackoverflow.com/questions/{question_id}'
+    )
+
+
+def enriched(question, page_activity=None):
+    """The question after enrichment; the question page often shows no activity date."""
+    question = Question.from_dict({**question, 'owner': Owner.from_dict(question.owner)})
+    question.owner.user_id = 7
+    question.owner.account_id = 70
+    question.creation_date = LISTED - 1000
+    question.last_activity_date = page_activity
+    question.body = 'body'
+    return question
+
+
+def use_store(monkeypatch, tmp_path, max_age=600):
+    store = EntityStore(str(tmp_path / 'store.db'), max_age=max_age)
+    monkeypatch.setattr(store_module, 'entity_store', store)
+    return store
+
+
+def write_through(listed):
+    store_questions([enriched(listed)], listed_activity={listed.question_id: listed.last_activity_date})
+
+
+def test_store_miss(monkeypatch, tmp_path):
+    store = use_store(monkeypatch, tmp_path)
+
+    assert refresh_from_store(summary()) is None
+    assert store.stats() == {'hits': 0, 'misses': 1}
+
+
+def test_store_hit_without_page_activity(monkeypatch, tmp_path):
+    store = use_store(monkeypatch, tmp_path)
+    write_through(summary())
+
+    refreshed = refresh_from_store(summary(score=9))
+
+    assert refreshed.body == 'body'
+    assert refreshed.score == 9
+    assert refreshed.owner.user_id == 7
+    assert store.stats() == {'hits': 1, 'misses': 0}
+
+
+def test_store_hit_ignores_age(monkeypatch, tmp_path):
+    use_store(monkeypatch, tmp_path, max_age=0)
+    write_through(summary())
+
+    assert refresh_from_store(summary()) is not None
+
+
+def test_newer_activity_is_scraped_again(monkeypatch, tmp_path):
+    store = use_store(monkeypatch, tmp_path)
+    write_through(summary())
+
+    assert refresh_from_store(summary(last_activity_date=LISTED + 60)) is None
+    assert store.stats() == {'hits': 0, 'misses': 1}
+
+
+def test_listing_without_activity_falls_back_to_age(monkeypatch, tmp_path):
+    store = use_store(monkeypatch, tmp_path)
+    write_through(summary(last_activity_date=None))
+
+    assert refresh_from_store(summary(last_activity_date=None)) is not None
+    store.max_age = -1
+    assert refresh_from_store(summary(last_activity_date=None)) is None
@@ -0,0 +1,81 @@
+import pytest
+
+from app.utils import clean_question_body, html_to_markdown, parse_html
+from app.scrapers.question_page import QuestionPage
+from app.scrapers.questions import BASE_URL
+from benchmarks.fixtures import load_fixtures
+
+NOTICE = (
+    '<aside class="s-notice s-notice__info post-notice js-post-notice mb16"><div class="d-flex fd-column fw-nowrap">'
+    '<div class="d-flex fw-nowrap"><div class="flex--item wmn0 fl1 lh-lg"><div class="flex--item fl1 lh-lg">'
+    '<b>Closed.</b> This question needs <a href="/help/closed-questions">details or clarity</a>.'
+    '</div></div></div></div></aside>'
+)
+
+
+def markdown(html):
+    return html_to_markdown(parse_html(html))
+
+
+def fixture_bodies():
+    bodies = []
+    for size, fixtures in sorted(load_fixtures().items()):
+        if size == 'huge':
+            continue
+        soup = QuestionPage(f"{BASE_URL}/questions/0", fixtures['question']).soup
+        bodies += soup.find_all('div', class_='s-prose js-post-body')
+    return bodies
+
+
+def test_fenced_code_block_keeps_language_and_text():
+    html = '<p>Run:</p><pre class="lang-py s-code-block"><code>x = 1\n\nif x &lt; 2:\n    print(x)\n</code></pre><p>done</p>'
+    assert markdown(html) == 'Run:\n\n```py\nx = 1\n\nif x < 2:\n    print(x)\n```\n\ndone'
+    assert markdown('<pre><code>plain</code></pre>') == '```\nplain\n```'
+
+
+@pytest.mark.parametrize('code, expected', [
+    ('plain', '`plain`'),
+    ('a`b', '``a`b``'),
+    ('`tick', '`` `tick ``'),
+])
+def test_inline_code_fence_outlasts_backticks(code, expected):
+    assert markdown(f'<p>Use <code>{code}</code>.</p>') == f'Use {expected}.'
+
+
+def test_nested_lists_are_indented_under_their_item():
+    lines = markdown('<ul><li>one<ul><li>inner</li><li>inner 2</li></ul></li><li>two</li></ul>').split('\n')
+    assert [line for line in lines if line] == ['- one', '    - inner', '    - inner 2', '- two']
+    assert markdown('<ol><li>first</li><li>second</li></ol>') == '1. first\n2. second'
+
+
+def test_blockquote_quotes_every_line():
+    assert markdown('<blockquote><p>quoted</p><p>second<br>line</p></blockquote><p>after</p>') == (
+        '> quoted\n>\n> second\n> line\n\nafter'
+    )
+
+
+def test_line_breaks():
+    assert markdown('<p>line one<br>line two<br/>line three</p>') == 'line one\nline two\nline three'
+
+
+def test_closed_notice_is_removed():
+    assert markdown(f'{NOTICE}<p>Body text</p>') == 'Body text'
+    assert clean_question_body('<p>Closed 2 hours ago.</p><p>Body</p>') == 'Body'
+    assert clean_question_body('<p>Duplicate of another.</p><p>Body</p>', closed_reason='Duplicate') == 'Body'
+
+
+def test_fixture_bodies_keep_code_verbatim():
+    for body in fixture_bodies():
+        converted = html_to_markdown(body)
+        for pre in body.find_all('pre'):
+            code = pre.get_text().rstrip('\n')
+            assert f"\n{code}\n```" in converted
+        for code in body.find_all('code'):
+            if code.find_parent('pre') is None:
+                assert code.get_text() in converted
+
+
+def test_fixture_bodies_keep_their_words():
+    for body in fixture_bodies():
+        converted = html_to_markdown(body)
+        assert [word for word in body.get_text(' ').split() if word not in converted] == []
@@ -0,0 +1,71 @@
+import re
+
+import pytest
+
+from app import create_app
+from app.routes import responses
+from app.scrapers import async_engine
+from app.utils import async_request_handler
+from app.utils.cache import DatasetCache
+from app.utils.page_cache import UpstreamResponse
+from tests.test_collectives import LISTING, TAGS, LINKS
+
+SAMPLE = re.compile(r'^(\S+) (\S+)$')
+
+
+class FixtureTransport:
+    """Serves one collective through the upstream transport hook, so the real request handler runs."""
+
+    async def async_intercept(self, url, timeout):
+        if url.endswith('/collectives-all'):
+            return UpstreamResponse(url, 200, LISTING)
+        if 'tab=tags' in url:
+            return UpstreamResponse(url, 200, TAGS)
+        return UpstreamResponse(url, 200, LINKS)
+
+    def record(self, url, status, headers, text):
+        pass
+
+
+def samples(client):
+    """The samples of the /metrics exposition as {series: value}."""
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    return {match[1]: float(match[2]) for match in map(SAMPLE.match, response.text.splitlines()) if match}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(async_request_handler, 'upstream_transport', FixtureTransport())
+    monkeypatch.setattr(async_request_handler, 'page_cache', None)
+    monkeypatch.setattr(async_engine, 'collectives_cache', DatasetCache(ttl=60))
+    monkeypatch.setattr(responses, 'response_cache', responses.TTLCache(maxsize=16, ttl=60))
+    return create_app().test_client()
+
+
+def test_one_request_shows_up_in_metrics_and_cost_header(client):
+    before = samples(client)
+
+    response = client.get('/collectives')
+
+    assert response.status_code == 200
+    cost = dict(part.split('=') for part in response.headers['X-Upstream-Cost'].split('; '))
+    assert cost['fetches'] == '3'
+    assert cost['cache_hits'] == cost['retries'] == '0'
+
+    after = samples(client)
+
+    def delta(series):
+        return after.get(series, 0) - before.get(series, 0)
+
+    assert delta('stackoverflow_upstream_responses_total{pattern="collectives",status="200"}') == 1
+    assert delta('stackoverflow_upstream_responses_total{pattern="collective_tags",status="200"}') == 1
+    assert delta('stackoverflow_upstream_responses_total{pattern="collective",status="200"}') == 1
+    assert delta('stackoverflow_upstream_request_seconds_count{pattern="collectives"}') == 1
+    for scraper in ('parse_collectives', 'parse_collective_tags_page', 'parse_collective_external_links'):
+        assert delta(f'stackoverflow_parse_seconds_count{{scraper="{scraper}"}}') == 1
+        assert delta(f'stackoverflow_parse_seconds_bucket{{scraper="{scraper}",le="+Inf"}}') == 1
+    assert delta('stackoverflow_api_request_seconds_count{endpoint="collectives.get_collectives",status="200"}') == 1
+    assert delta('stackoverflow_api_upstream_fetches_bucket{endpoint="collectives.get_collectives",le="5"}') == 1
+    assert delta('stackoverflow_api_upstream_fetches_bucket{endpoint="collectives.get_collectives",le="2"}') == 0
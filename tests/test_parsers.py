@@ -0,0 +1,39 @@
+import pytest
+
+from app.utils import parse_date
+from app.utils.parsers import _parse_date_formats
+from benchmarks.fixtures import load_fixtures
+from benchmarks.parsers import _field_strings
+
+EDGE_CASES = [
+    '0001-01-01T23:00:00',
+    '0001-01-01 00:00:00Z',
+    '9999-12-31T23:59:59',
+    '2023-02-30 10:00:00',
+    '2023-01-05T10:00:00Z',
+    '2023-01-05T10:00:00.5',
+    '2023-01-05 10:00:00.123456Z',
+    '2023-01-05 10:00:00 UTC',
+    '2023-01-05 10:00:00Zextra',
+    'Jan 05, 2023 at 10:00',
+    'not a date',
+    '',
+]
+
+
+def fixture_dates():
+    fixtures = load_fixtures()
+    return sorted({value for size in ('small', 'typical') for parser, value in _field_strings(fixtures[size])
+                   if parser is parse_date})
+
+
+def outcome(parser, date_str):
+    try:
+        return parser(date_str)
+    except Exception as e:
+        return type(e)
+
+
+@pytest.mark.parametrize('date_str', fixture_dates() + EDGE_CASES)
+def test_parse_date_matches_strptime_formats(date_str):
+    assert outcome(parse_date, date_str) == outcome(_parse_date_formats, date_str)
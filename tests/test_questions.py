@@ -0,0 +1,41 @@
+from app.scrapers.questions import SKIPPED, merge_question_enrichment, parse_listing_total, parse_listing_window
+
+HEADER = '<div id="mainbar"><div class="d-flex"><div class="flex--item fl1 fs-body3 mr12">{count}</div></div>{summaries}</div>'
+
+
+def test_parse_listing_total():
+    assert parse_listing_total(HEADER.format(count='24,163,654 questions', summaries='')) == 24163654
+    assert parse_listing_total(HEADER.format(count='1 question', summaries='')) == 1
+
+
+def test_parse_listing_total_without_header():
+    assert parse_listing_total('<div id="mainbar"></div>') is None
+
+
+def test_listing_window_reports_the_total_of_its_first_page():
+    first = HEADER.format(count='120 questions', summaries='')
+    assert parse_listing_window([first, None], 0, 15) == ([], 120)
+    assert parse_listing_window([None, first], 0, 15) is None
+
+
+def listed_question():
+    return {'question_id': 1, 'last_activity_date': 1700000000, 'owner': {'link': 'https://stackoverflow.com/users/7/ada'}}
+
+
+def test_skipped_lookups_keep_listing_fields():
+    merged, = merge_question_enrichment([listed_question()], [SKIPPED], [SKIPPED])
+
+    assert merged['last_activity_date'] == 1700000000
+    assert 'body' not in merged and 'user_id' not in merged['owner']
+
+
+def test_fetched_lookups_replace_listing_fields():
+    merged, = merge_question_enrichment([listed_question()], [(7, 70)], [(1690000000, None, 'body')])
+
+    assert merged['last_activity_date'] is None
+    assert merged['creation_date'] == 1690000000
+    assert merged['owner']['user_id'] == 7
+
+
+def test_failed_lookups_drop_the_question():
+    assert merge_question_enrichment([listed_question()], [SKIPPED], [None]) == []
@@ -0,0 +1,21 @@
+from app.utils.rate_limiter import TokenBucket
+
+
+def test_reserve_returns_the_wait_for_a_token():
+    bucket = TokenBucket(rate=20, capacity=1)
+    assert bucket.reserve() == 0.0
+
+    wait = bucket.reserve()
+
+    assert 0.04 < wait <= 0.05
+
+
+def test_reservations_queue_behind_each_other():
+    bucket = TokenBucket(rate=10, capacity=1)
+    bucket.reserve()
+
+    first, second = bucket.reserve(), bucket.reserve()
+
+    assert 0.09 < first <= 0.1
+    assert 0.19 < second <= 0.2
+    assert bucket.available() < -1
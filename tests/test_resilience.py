@@ -0,0 +1,73 @@
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.utils.resilience import (
+    PERMANENT, THROTTLED, TRANSIENT, CircuitBreaker, RetryBudget, classify_status, parse_retry_after
+)
+
+
+@pytest.mark.parametrize('status, expected', [
+    (404, PERMANENT), (410, PERMANENT), (403, PERMANENT),
+    (429, THROTTLED),
+    (408, TRANSIENT), (500, TRANSIENT), (503, TRANSIENT), (302, TRANSIENT),
+])
+def test_classify_status(status, expected):
+    assert classify_status(status) == expected
+
+
+def test_parse_retry_after_seconds():
+    assert parse_retry_after('120') == 120.0
+    assert parse_retry_after(' 3 ') == 3.0
+
+
+def test_parse_retry_after_http_date():
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 25 <= parse_retry_after(format_datetime(retry_at, usegmt=True)) <= 30
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+
+
+@pytest.mark.parametrize('value', [None, '', 'soon', '-5'])
+def test_parse_retry_after_ignores_malformed_values(value):
+    assert parse_retry_after(value) is None
+
+
+def test_breaker_lets_one_probe_through_when_half_open():
+    breaker = CircuitBreaker(threshold=2, cooldown=0.05)
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+    breaker.record_failure()
+    assert breaker.state == 'open' and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == 'half-open'
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.allow()
+
+
+def test_failed_probe_opens_the_breaker_again():
+    breaker = CircuitBreaker(threshold=1, cooldown=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+
+    breaker.record_failure(retry_after=10)
+
+    assert breaker.state == 'open'
+    assert breaker.open_until - time.monotonic() > 9
+
+
+def test_retry_budget_runs_out():
+    budget = RetryBudget(ratio=0.5, min_per_second=0, capacity=2)
+    assert budget.try_withdraw() and budget.try_withdraw()
+    assert not budget.try_withdraw()
+
+    budget.deposit()
+    assert not budget.try_withdraw()
+    budget.deposit()
+    assert budget.try_withdraw()
@@ -0,0 +1,120 @@
+import gzip
+
+import pytest
+from flask import Flask, jsonify
+from werkzeug.exceptions import BadRequest
+
+from app.routes import responses
+from app.routes.responses import cached_response, finish_response
+
+LARGE = {'items': [{'body': 'x' * 40, 'n': n} for n in range(100)]}
+SMALL = {'items': []}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(responses, 'response_cache', responses.TTLCache(maxsize=16, ttl=60))
+    app = Flask(__name__)
+    app.after_request(finish_response)
+
+    @app.route('/large')
+    def large():
+        return jsonify(LARGE)
+
+    @app.route('/small')
+    def small():
+        return jsonify(SMALL)
+
+    @app.route('/cached')
+    @cached_response
+    async def cached():
+        return jsonify(LARGE)
+
+    return app.test_client()
+
+
+def etags(client, path):
+    """The ETags of the identity and gzip representations of `path`."""
+    identity = client.get(path).headers['ETag']
+    gzipped = client.get(path, headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+    return identity, gzipped
+
+
+@pytest.mark.parametrize('path', ['/large', '/cached'])
+def test_representations_have_their_own_etags(client, path):
+    identity, gzipped = etags(client, path)
+    assert identity != gzipped
+
+    response = client.get(path, headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data) == client.get(path).data
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+
+@pytest.mark.parametrize('path', ['/large', '/cached'])
+@pytest.mark.parametrize('accept_gzip, sent, expected', [
+    (False, 'identity', 304),
+    (False, 'gzip', 200),
+    (True, 'gzip', 304),
+    (True, 'identity', 200),
+])
+def test_if_none_match_only_matches_the_selected_representation(client, path, accept_gzip, sent, expected):
+    identity, gzipped = etags(client, path)
+    headers = {'If-None-Match': identity if sent == 'identity' else gzipped}
+    if accept_gzip:
+        headers['Accept-Encoding'] = 'gzip'
+
+    response = client.get(path, headers=headers)
+
+    assert response.status_code == expected
+    assert response.headers['ETag'] == (gzipped if accept_gzip else identity)
+    if expected == 304:
+        assert response.data == b''
+    else:
+        assert response.headers.get('Content-Encoding') == ('gzip' if accept_gzip else None)
+
+
+def test_weak_if_none_match_is_a_match(client):
+    identity, _ = etags(client, '/large')
+
+    response = client.get('/large', headers={'If-None-Match': f'W/{identity}'})
+
+    assert response.status_code == 304
+
+
+def test_small_bodies_are_not_gzipped(client):
+    identity, gzipped = etags(client, '/small')
+    assert identity == gzipped
+
+    response = client.get('/small', headers={'Accept-Encoding': 'gzip', 'If-None-Match': identity})
+    assert response.status_code == 304
+
+
+def test_continuation_round_trip():
+    app = Flask(__name__)
+    ids = ['101', '102', '103', '104']
+    payload = responses.with_continuation({'items': []}, ['102', '104'])
+    token = payload['continuation']
+
+    assert payload['has_more'] is True
+    assert '=' not in token
+    with app.test_request_context(f'/?continuation={token}'):
+        assert responses.continuation_ids(ids) == ['102', '104']
+        assert responses.continuation_ids([int(item_id) for item_id in ids]) == [102, 104]
+
+
+def test_without_continuation_every_id_remains():
+    app = Flask(__name__)
+    payload = responses.with_continuation({'items': []}, [])
+
+    assert payload == {'items': [], 'has_more': False}
+    with app.test_request_context('/'):
+        assert responses.continuation_ids(['1', '2']) == ['1', '2']
+
+
+@pytest.mark.parametrize('token', ['not base64!', responses.encode_continuation([]) + 'x', 'eyJhIjoxfQ'])
+def test_malformed_continuation_is_rejected(token):
+    app = Flask(__name__)
+    with app.test_request_context('/', query_string={'continuation': token}):
+        with pytest.raises(BadRequest):
+            responses.continuation_ids(['1'])
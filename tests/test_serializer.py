@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from app.utils import encode_json, pre_encode
+from app.utils.serializer import Record
+from app.scrapers.answers import parse_answer_summary
+from app.scrapers.question_page import QuestionPage
+from app.scrapers.questions import BASE_URL, parse_question_page, parse_question_summaries
+from benchmarks.fixtures import load_fixtures
+
+FIXTURES = load_fixtures()
+
+
+def plain(value):
+    """`value` with every record turned into the dict it stands for."""
+    if isinstance(value, (Record, dict)):
+        return {key: plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [plain(item) for item in value]
+    return value
+
+
+def jsonify_text(value):
+    """The JSON Flask's jsonify renders for `value`, without the trailing newline."""
+    return json.dumps(plain(value), sort_keys=True, separators=(',', ':'))
+
+
+def fixture_response(size):
+    """A response over every question and answer record the fixture pages of `size` parse into."""
+    fixtures = FIXTURES[size]
+    page = QuestionPage(f"{BASE_URL}/questions/0", fixtures['question'])
+    question = parse_question_page(page.question_id, page)
+    question['answers'] = [
+        parse_answer_summary(summary, page.question_id) for summary in page.soup.find_all('div', class_='answer')
+    ]
+    return {'items': parse_question_summaries(fixtures['listing']) + [question], 'has_more': False, 'total': None}
+
+
+@pytest.mark.parametrize('size', ['small', 'typical'])
+def test_encode_json_matches_jsonify(size):
+    response = fixture_response(size)
+    assert response['items'][-1]['answers']
+
+    assert encode_json(response) == jsonify_text(response)
+    pre_encode(response['items'])
+    assert encode_json(response) == jsonify_text(response)
+
+
+def test_changed_records_are_encoded_again():
+    response = fixture_response('small')
+    pre_encode(response['items'])
+    summary, question = response['items'][0], response['items'][-1]
+    answer = question['answers'][0]
+
+    summary['score'] += 1
+    summary['tags'] = summary['tags'] + ['ünïcode']
+    summary['owner']['reputation'] = 123456
+    question['title'] = 'Changed “title”'
+    question['closed_reason'] = 'Duplicate'
+    answer['body'] = 'changed <b>body</b>'
+    del question['answers'][1:]
+
+    encoded = encode_json(response)
+    assert encoded == jsonify_text(response)
+    assert 'changed <b>body</b>' in json.loads(encoded)['items'][-1]['answers'][0]['body']
+    assert json.loads(encoded)['items'][0]['owner']['reputation'] == 123456
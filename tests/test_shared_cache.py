@@ -0,0 +1,77 @@
+import os
+import time
+
+from app.utils import shared_cache as shared_cache_module
+from app.utils.shared_cache import SharedCache
+
+# Incompressible values, so every entry takes about the same room in the store
+VALUE = os.urandom(300).hex()
+
+
+def stored_bytes(cache):
+    conn = cache._connect()
+    meta = conn.execute("SELECT value FROM meta WHERE name = 'bytes'").fetchone()[0]
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+    return meta, total
+
+
+def keys(cache):
+    return {row[0] for row in cache._connect().execute("SELECT key FROM entries")}
+
+
+def test_meta_bytes_track_the_entries(tmp_path):
+    cache = SharedCache(str(tmp_path / 'shared.db'), max_bytes=10 ** 6)
+    cache.set('page', 'a', VALUE)
+    cache.set('page', 'b', VALUE)
+    cache.set('page', 'a', 'short')
+    cache.delete('page', 'b')
+    cache.delete('page', 'missing')
+
+    meta, total = stored_bytes(cache)
+    assert meta == total > 0
+    assert cache.get('page', 'a')[0] == 'short'
+
+
+def test_eviction_drops_expired_then_least_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(shared_cache_module, 'ACCESS_GRANULARITY', 0)
+    monkeypatch.setattr(shared_cache_module, 'EVICTION_BATCH', 1)
+    cache = SharedCache(str(tmp_path / 'shared.db'), max_bytes=10 ** 6)
+    cache.set('page', 'expired', VALUE, stored_at=time.time() - 100, ttl=10)
+    entry_size = stored_bytes(cache)[0]
+    cache.max_bytes = entry_size * 10 + entry_size // 2
+
+    for n in range(9):
+        time.sleep(0.002)
+        cache.set('page', f'k{n}', VALUE)
+    time.sleep(0.002)
+    assert cache.get('page', 'k0') is not None
+    assert cache.evictions == 0
+
+    time.sleep(0.002)
+    cache.set('page', 'k9', VALUE)
+
+    meta, total = stored_bytes(cache)
+    assert meta == total <= cache.max_bytes * shared_cache_module.EVICTION_TARGET
+    assert keys(cache) == {'k0'} | {f'k{n}' for n in range(2, 10)}
+    assert cache.evictions == 2
+
+
+def test_forked_process_opens_its_own_connection(tmp_path):
+    cache = SharedCache(str(tmp_path / 'shared.db'), max_bytes=10 ** 6)
+    parent_conn = cache._connect()
+    cache.set('page', 'parent', 1)
+
+    pid = os.fork()
+    if pid == 0:
+        ok = False
+        try:
+            conn = cache._connect()
+            ok = conn is not parent_conn and cache.get('page', 'parent')[0] == 1
+            cache.set('page', 'child', 2)
+        finally:
+            os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert cache._connect() is parent_conn
+    assert cache.get('page', 'child')[0] == 2
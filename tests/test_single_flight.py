@@ -0,0 +1,135 @@
+import time
+import asyncio
+
+from app.utils.deadline import Deadline, request_deadline
+from app.utils.enrichment import gather_in_parallel, gather_until_deadline
+from app.utils.single_flight import AsyncSingleFlight
+
+
+def test_cancelled_leader_does_not_fail_follower():
+    async def scenario():
+        flights = AsyncSingleFlight('test')
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return 'page'
+
+        leader = asyncio.ensure_future(flights.do('key', work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flights.do('key', work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return leader, await follower, calls
+
+    leader, result, calls = asyncio.run(scenario())
+    assert leader.cancelled()
+    assert result == 'page'
+    assert len(calls) == 1
+
+
+def test_work_is_cancelled_when_nobody_waits():
+    async def scenario():
+        flights = AsyncSingleFlight('test')
+        cancelled = []
+
+        async def work():
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        caller = asyncio.ensure_future(flights.do('key', work))
+        await asyncio.sleep(0)
+        caller.cancel()
+        await asyncio.sleep(0.01)
+
+        async def fresh():
+            return 'again'
+
+        # A new call after the abandoned one starts over instead of joining the cancelled work
+        return cancelled, await flights.do('key', fresh)
+
+    cancelled, result = asyncio.run(scenario())
+    assert cancelled == [True]
+    assert result == 'again'
+
+
+def test_deadline_of_one_caller_does_not_cut_short_shared_work():
+    async def scenario():
+        flights = AsyncSingleFlight('test')
+        seen_deadlines = []
+
+        async def work():
+            seen_deadlines.append(request_deadline.get())
+            await asyncio.sleep(0.1)
+            return 'question'
+
+        async def with_deadline():
+            request_deadline.set(Deadline(0.02))
+            return await gather_until_deadline([flights.do('key', work)])
+
+        async def without_deadline():
+            await asyncio.sleep(0)
+            return await gather_in_parallel([flights.do('key', work)])
+
+        return await asyncio.gather(with_deadline(), without_deadline()), seen_deadlines
+
+    ((timed_out, unfinished), complete), seen_deadlines = asyncio.run(scenario())
+    assert timed_out == [None] and unfinished == [0]
+    assert complete == ['question']
+    assert seen_deadlines[0].remaining() == float('inf')
+
+
+def test_shared_work_gives_up_at_the_last_callers_deadline():
+    async def scenario():
+        flights = AsyncSingleFlight('test')
+
+        async def work():
+            started = time.monotonic()
+            while not request_deadline.get().expired():
+                await asyncio.sleep(0.005)
+            return time.monotonic() - started
+
+        async def caller(seconds):
+            request_deadline.set(Deadline(seconds))
+            return await flights.do('key', work)
+
+        return await asyncio.gather(caller(0.02), caller(0.06))
+
+    first, second = asyncio.run(scenario())
+    assert first == second
+    assert 0.05 <= first < 0.2
+
+
+def test_gather_in_parallel_treats_cancellation_as_failure():
+    async def cancelled():
+        raise asyncio.CancelledError()
+
+    async def fine():
+        return 1
+
+    assert asyncio.run(gather_in_parallel([fine(), cancelled()])) == [1, None]
+
+
+def test_requests_are_coalesced_per_cache_mode(monkeypatch):
+    from app.utils import async_request_handler
+
+    calls = []
+
+    async def request(url, max_retries, backoff_factor, timeout, delay_between_requests, use_cache):
+        calls.append(use_cache)
+        await asyncio.sleep(0.01)
+        return use_cache
+
+    monkeypatch.setattr(async_request_handler, '_async_request_with_retries', request)
+    monkeypatch.setattr(async_request_handler, 'async_request_flights', AsyncSingleFlight('test'))
+
+    async def scenario():
+        fetch = async_request_handler.async_make_request_with_retries
+        return await asyncio.gather(fetch('u'), fetch('u', use_cache=False), fetch('u'))
+
+    assert asyncio.run(scenario()) == [True, False, True]
+    assert sorted(calls) == [False, True]
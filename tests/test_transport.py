@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from app.utils import async_request_handler, resilience, make_request_with_retries, call_on_engine
+from app.utils.cache import TTLCache
+from app.utils.transport import FaultInjector, ReplayMiss, ResponseArchive, UpstreamTransport, INJECTED_RETRY_AFTER
+
+URL = 'https://stackoverflow.com/questions/1'
+
+
+def test_record_archives_live_responses(tmp_path):
+    archive = ResponseArchive(str(tmp_path))
+    transport = UpstreamTransport('record', archive)
+
+    assert asyncio.run(transport.async_intercept(URL, 5)) is None
+    transport.record(URL, 200, {'Content-Type': 'text/html'}, '<html>q</html>')
+    transport.record(URL + '?page=2', 304, {}, '')
+
+    recorded = archive.get(URL)
+    assert (recorded.status_code, recorded.text) == (200, '<html>q</html>')
+    assert recorded.headers['Content-Type'] == 'text/html'
+    assert archive.get(URL + '?page=2') is None
+
+
+def test_replay_serves_the_archive(tmp_path):
+    archive = ResponseArchive(str(tmp_path))
+    archive.save(URL, 200, {}, '<html>q</html>')
+    transport = UpstreamTransport('replay', archive)
+
+    assert asyncio.run(transport.async_intercept(URL, 5)).text == '<html>q</html>'
+    with pytest.raises(ReplayMiss):
+        asyncio.run(transport.async_intercept(URL + '/missing', 5))
+
+
+def test_blocking_requests_run_on_the_engine(tmp_path, monkeypatch):
+    archive = ResponseArchive(str(tmp_path))
+    archive.save(URL, 200, {}, '<html>q</html>')
+    monkeypatch.setattr(async_request_handler, 'upstream_transport', UpstreamTransport('replay', archive))
+    monkeypatch.setattr(async_request_handler, 'page_cache', None)
+    monkeypatch.setattr(async_request_handler, 'get_async_session', lambda: None)
+
+    assert make_request_with_retries(URL).text == '<html>q</html>'
+
+    async def blocking_on_the_engine():
+        return make_request_with_retries(URL)
+
+    # Blocking the engine loop on its own work would deadlock it
+    with pytest.raises(RuntimeError):
+        call_on_engine(blocking_on_the_engine())
+
+
+def test_replay_miss_is_not_negative_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(async_request_handler, 'upstream_transport', UpstreamTransport('replay', ResponseArchive(str(tmp_path))))
+    monkeypatch.setattr(async_request_handler, 'page_cache', None)
+    monkeypatch.setattr(async_request_handler, 'get_async_session', lambda: None)
+    monkeypatch.setattr(resilience, 'negative_cache', TTLCache(maxsize=16, ttl=60))
+
+    response = asyncio.run(async_request_handler._async_request_with_retries(URL, 3, 0, 5, 0, True))
+
+    assert response is None
+    assert resilience.negative_cache.get(URL) is None
+
+
+def test_injected_failures_are_reproducible_with_a_seed():
+    decisions = [FaultInjector(latency=(0.1, 0.5), error_rate=0.5, seed='s').decide(URL) for _ in range(2)]
+    assert decisions[0] == decisions[1]
+    assert 0.1 <= decisions[0][0] <= 0.5
+
+    injector = FaultInjector(seed='s')
+    assert [injector.decide(URL) for _ in range(3)] == [(0.0, None)] * 3
+
+
+def test_injected_throttling_and_timeouts(tmp_path):
+    throttled = UpstreamTransport('live', injector=FaultInjector(error_rate=1.0, errors=('429',)))
+    response = asyncio.run(throttled.async_intercept(URL, 5))
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == str(INJECTED_RETRY_AFTER)
+
+    timing_out = UpstreamTransport('live', injector=FaultInjector(error_rate=1.0, errors=('timeout',)))
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(timing_out.async_intercept(URL, 0.01))